@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Genera las líneas de pedido_items que falten desde Pedido.productos (JSONB)
+y concilia ProductoCatalogo.total_ventas.
+
+Uso:
+    python backfill_pedido_items.py                      # pedidos sin líneas + conciliación
+    python backfill_pedido_items.py --negocio 12         # concilia solo un negocio
+    python backfill_pedido_items.py --solo-conciliar     # sin backfill
+"""
+import argparse
+import sqlalchemy as sa
+from src import create_app
+from src.models.database import db
+from src.models.compradores.pedido import Pedido, PedidoItem
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill de pedido_items y total_ventas")
+    parser.add_argument('--negocio', type=int, default=None, help="id_negocio a conciliar")
+    parser.add_argument('--lote', type=int, default=5000, help="pedidos por transacción")
+    parser.add_argument('--solo-conciliar', action='store_true', help="solo recalcula total_ventas")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        try:
+            if not args.solo_conciliar:
+                print("⏳ [LOG]: Generando líneas de pedidos sin pedido_items...")
+                maximo = db.session.execute(sa.select(sa.func.max(Pedido.id_pedido))).scalar() or 0
+                insertadas = 0
+                for desde_id in range(0, maximo, args.lote):
+                    insertadas += PedidoItem.backfill(desde_id, desde_id + args.lote)
+                    db.session.commit()
+                print(f"✅ [EXITO]: {insertadas} líneas creadas")
+
+            destino = f"negocio {args.negocio}" if args.negocio else "todos los negocios"
+            print(f"⏳ [LOG]: Conciliando total_ventas para {destino}...")
+            productos = PedidoItem.recalcular_total_ventas(negocio_id=args.negocio)
+            db.session.commit()
+            print(f"✅ [EXITO]: {productos} productos corregidos")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ [ERROR CRÍTICO]: {e}")
+            raise
+
+
+if __name__ == "__main__":
+    main()
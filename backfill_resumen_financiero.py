@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Reconstruye el rollup diario (resumen_financiero_diario) desde transacciones_operativas.
+
+Uso:
+    python backfill_resumen_financiero.py                 # todos los negocios
+    python backfill_resumen_financiero.py --negocio 12    # un solo negocio
+"""
+import argparse
+from src import create_app
+from src.models.database import db
+from src.models.colombia_data.contabilidad.operaciones_y_catalogo import ResumenFinancieroDiario
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill del resumen financiero diario")
+    parser.add_argument('--negocio', type=int, default=None, help="id_negocio a reconstruir")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        try:
+            destino = f"negocio {args.negocio}" if args.negocio else "todos los negocios"
+            print(f"⏳ [LOG]: Reconstruyendo resumen financiero diario para {destino}...")
+            filas = ResumenFinancieroDiario.reconstruir(negocio_id=args.negocio)
+            db.session.commit()
+            print(f"✅ [EXITO]: {filas} filas de resumen generadas")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ [ERROR CRÍTICO]: {e}")
+            raise
+
+
+if __name__ == "__main__":
+    main()
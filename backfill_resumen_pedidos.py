@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Reconstruye el rollup diario de pedidos (pedidos_resumen_diario) desde pedidos.
+
+Uso:
+    python backfill_resumen_pedidos.py                 # todos los negocios
+    python backfill_resumen_pedidos.py --negocio 12    # un solo negocio
+"""
+import argparse
+from src import create_app
+from src.models.database import db
+from src.models.compradores.pedido import PedidoResumenDiario
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill del rollup diario de pedidos")
+    parser.add_argument('--negocio', type=int, default=None, help="id_negocio a reconstruir")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        try:
+            destino = f"negocio {args.negocio}" if args.negocio else "todos los negocios"
+            print(f"⏳ [LOG]: Reconstruyendo rollup diario de pedidos para {destino}...")
+            filas = PedidoResumenDiario.reconstruir(negocio_id=args.negocio)
+            db.session.commit()
+            print(f"✅ [EXITO]: {filas} filas de rollup generadas")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ [ERROR CRÍTICO]: {e}")
+            raise
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de concurrencia de la reserva de stock del checkout.
+
+Crea un producto temporal (inactivo) con stock limitado y lanza muchas
+reservas en paralelo con ProductoCatalogo.reservar_stock, cada una en su
+propia transacción como en un checkout real. Comprueba que no haya
+sobreventa: unidades vendidas == stock inicial - stock final y stock >= 0.
+
+Uso (contra una BD de staging, nunca producción):
+    python benchmark_reserva_stock.py --negocio 4
+    python benchmark_reserva_stock.py --negocio 4 --stock 100 --intentos 1000 --hilos 64
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+import sqlalchemy as sa
+from src import create_app
+from src.models.database import db
+from src.models.colombia_data.negocio import Negocio
+from src.models.colombia_data.contabilidad.operaciones_y_catalogo import ProductoCatalogo
+
+
+def _reservar(app, producto_id, cantidad):
+    """Una reserva en su propia sesión. Devuelve (exito, segundos)."""
+    inicio = time.perf_counter()
+    with app.app_context():
+        try:
+            faltantes = ProductoCatalogo.reservar_stock({producto_id: cantidad}, nota="benchmark")
+            if faltantes:
+                db.session.rollback()
+                return False, time.perf_counter() - inicio
+            db.session.commit()
+            return True, time.perf_counter() - inicio
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            db.session.remove()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de reserva de stock concurrente")
+    parser.add_argument('--negocio', type=int, required=True, help="id_negocio donde crear el producto temporal")
+    parser.add_argument('--stock', type=int, default=100, help="stock inicial del producto")
+    parser.add_argument('--intentos', type=int, default=500, help="reservas a lanzar")
+    parser.add_argument('--cantidad', type=int, default=1, help="unidades por reserva")
+    parser.add_argument('--hilos', type=int, default=50, help="reservas simultáneas")
+    parser.add_argument('--conservar', action='store_true', help="no borrar el producto temporal")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        negocio = Negocio.query.get(args.negocio)
+        if not negocio:
+            print(f"❌ [ERROR CRÍTICO]: Negocio {args.negocio} no encontrado")
+            raise SystemExit(1)
+
+        producto = ProductoCatalogo(
+            nombre="BENCHMARK reserva de stock",
+            precio=1000,
+            negocio_id=negocio.id_negocio,
+            usuario_id=negocio.usuario_id,
+            stock=args.stock,
+            activo=False,
+            estado_publicacion=False
+        )
+        db.session.add(producto)
+        db.session.commit()
+        producto_id = producto.id_producto
+        print(f"⏳ [LOG]: Producto temporal {producto_id} con stock {args.stock}; "
+              f"{args.intentos} reservas de {args.cantidad} con {args.hilos} hilos...")
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.hilos) as pool:
+        resultados = list(pool.map(
+            lambda _: _reservar(app, producto_id, args.cantidad), range(args.intentos)
+        ))
+    duracion = time.perf_counter() - inicio
+
+    with app.app_context():
+        try:
+            stock_final = db.session.execute(
+                sa.select(ProductoCatalogo.stock).where(ProductoCatalogo.id_producto == producto_id)
+            ).scalar()
+            exitos = sum(1 for ok, _ in resultados if ok)
+            latencias = sorted(seg for _, seg in resultados)
+            esperados = min(args.intentos, args.stock // args.cantidad)
+
+            print(f"⏳ [LOG]: {exitos} reservas aceptadas, {len(resultados) - exitos} rechazadas en {duracion:.2f}s "
+                  f"({len(resultados) / duracion:.0f} reservas/s)")
+            print(f"⏳ [LOG]: Latencia p50 {statistics.median(latencias) * 1000:.1f} ms, "
+                  f"p95 {latencias[int(len(latencias) * 0.95) - 1] * 1000:.1f} ms")
+
+            vendido = exitos * args.cantidad
+            if stock_final < 0 or args.stock - stock_final != vendido or exitos != esperados:
+                print(f"❌ [ERROR CRÍTICO]: Sobreventa o pérdida: stock final {stock_final}, "
+                      f"vendido {vendido}, esperado {esperados * args.cantidad}")
+                raise SystemExit(1)
+            print(f"✅ [EXITO]: Sin sobreventa: stock {args.stock} → {stock_final}, {vendido} unidades vendidas")
+        finally:
+            if not args.conservar:
+                # movimientos_stock se borra en cascada desde la BD
+                db.session.execute(
+                    sa.delete(ProductoCatalogo.__table__).where(ProductoCatalogo.id_producto == producto_id)
+                )
+                db.session.commit()
+
+
+if __name__ == "__main__":
+    main()
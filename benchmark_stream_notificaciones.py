@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Prueba de carga del stream de notificaciones (SSE sobre LISTEN/NOTIFY).
+
+Abre N clientes SSE contra /api/notifications/negocio/<id>/stream de una
+instancia en marcha y publica eventos sintéticos con pg_notify (no crea filas
+en `notification`). Reporta cuántos streams sostuvo la instancia, cuántos
+eventos llegaron y la latencia de entrega.
+
+Uso (contra staging; la instancia debe correr con gunicorn gthread):
+    python benchmark_stream_notificaciones.py --negocio 4
+    python benchmark_stream_notificaciones.py --negocio 4 --url https://staging.example.com --clientes 500
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.request
+import sqlalchemy as sa
+from src import create_app
+from src.models.database import db
+from src.models.notification import Notification
+
+MARCA = 'BENCHMARK stream'
+
+
+def _cliente(url, conectados, latencias, lock, detener, timeout):
+    """Un EventSource mínimo: cuenta la conexión y mide cada evento de la prueba."""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as respuesta:
+            with lock:
+                conectados[0] += 1
+            for linea in respuesta:
+                if detener.is_set():
+                    break
+                linea = linea.decode('utf-8').strip()
+                if not linea.startswith('data:'):
+                    continue
+                datos = json.loads(linea[5:])
+                if datos.get('titulo') == MARCA:
+                    with lock:
+                        latencias.append(time.time() - datos['enviado'])
+    except Exception:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del stream de notificaciones")
+    parser.add_argument('--negocio', type=int, required=True, help="id_negocio al que suscribirse")
+    parser.add_argument('--url', default='http://localhost:5000', help="URL base de la instancia")
+    parser.add_argument('--clientes', type=int, default=200, help="streams simultáneos")
+    parser.add_argument('--eventos', type=int, default=20, help="notificaciones a publicar")
+    parser.add_argument('--intervalo', type=float, default=0.5, help="segundos entre eventos")
+    parser.add_argument('--espera-conexion', type=float, default=15, help="segundos para abrir los streams")
+    args = parser.parse_args()
+
+    url = f"{args.url.rstrip('/')}/api/notifications/negocio/{args.negocio}/stream"
+    conectados, latencias = [0], []
+    lock, detener = threading.Lock(), threading.Event()
+
+    print(f"⏳ [LOG]: Abriendo {args.clientes} streams contra {url}...")
+    for _ in range(args.clientes):
+        threading.Thread(
+            target=_cliente,
+            args=(url, conectados, latencias, lock, detener, args.espera_conexion + 60),
+            daemon=True
+        ).start()
+
+    limite = time.monotonic() + args.espera_conexion
+    while conectados[0] < args.clientes and time.monotonic() < limite:
+        time.sleep(0.2)
+    print(f"⏳ [LOG]: {conectados[0]}/{args.clientes} streams abiertos")
+    if not conectados[0]:
+        print("❌ [ERROR CRÍTICO]: La instancia no aceptó ningún stream")
+        raise SystemExit(1)
+
+    app = create_app()
+    with app.app_context():
+        for numero in range(args.eventos):
+            payload = json.dumps({
+                'negocio_id': args.negocio,
+                'user_id': None,
+                'notificacion': {'id': -(numero + 1), 'titulo': MARCA, 'enviado': time.time()}
+            })
+            db.session.execute(sa.select(sa.func.pg_notify(Notification.CANAL_PUSH, payload)))
+            db.session.commit()
+            time.sleep(args.intervalo)
+
+    time.sleep(2)
+    detener.set()
+
+    esperadas = conectados[0] * args.eventos
+    print(f"⏳ [LOG]: {len(latencias)}/{esperadas} entregas")
+    if latencias:
+        latencias.sort()
+        print(f"✅ [EXITO]: {conectados[0]} streams sostenidos; latencia p50 "
+              f"{statistics.median(latencias) * 1000:.1f} ms, "
+              f"p95 {latencias[int(len(latencias) * 0.95) - 1] * 1000:.1f} ms, "
+              f"máx {latencias[-1] * 1000:.1f} ms")
+    if len(latencias) < esperadas:
+        print("❌ [ERROR CRÍTICO]: Hubo entregas perdidas (colas llenas o streams caídos)")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
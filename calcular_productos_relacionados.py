@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Cálculo incremental de productos relacionados ("también compraron").
+
+Lee solo los pedidos creados desde la última ejecución, suma sus pares de
+productos a la matriz dispersa de co-compra y recalcula el top-K de los
+productos afectados.
+
+Uso (programar cada hora o cada noche en el cron de Render):
+    python calcular_productos_relacionados.py
+    python calcular_productos_relacionados.py --lote 2000 --top 8
+    python calcular_productos_relacionados.py --reiniciar     # recalcula desde cero
+"""
+import argparse
+import time
+import sqlalchemy as sa
+from src import create_app
+from src.models.database import db
+from src.models.colombia_data.contabilidad.operaciones_y_catalogo import (
+    EstadoProcesoBatch,
+    ProductoRelacionado
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Productos relacionados por co-compra")
+    parser.add_argument('--lote', type=int, default=5000, help="pedidos por transacción")
+    parser.add_argument('--top', type=int, default=ProductoRelacionado.TOP_K, help="relacionados por producto")
+    parser.add_argument('--reiniciar', action='store_true',
+                        help="borra la matriz y vuelve a procesar todos los pedidos")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        try:
+            if args.reiniciar:
+                print("⏳ [LOG]: Reiniciando matriz de co-compra...")
+                db.session.execute(sa.text("TRUNCATE productos_coocurrencia, productos_relacionados"))
+                EstadoProcesoBatch.obtener_marca(ProductoRelacionado.PROCESO)
+                EstadoProcesoBatch.guardar_marca(ProductoRelacionado.PROCESO, 0)
+                db.session.commit()
+
+            inicio = time.monotonic()
+            print("⏳ [LOG]: Procesando pedidos nuevos...")
+            pedidos, productos = ProductoRelacionado.ejecutar_incremental(
+                tamano_lote=args.lote, k=args.top
+            )
+            print(f"✅ [EXITO]: {pedidos} pedidos procesados, top-{args.top} recalculado "
+                  f"para {productos} productos en {time.monotonic() - inicio:.1f}s")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ [ERROR CRÍTICO]: {e}")
+            raise
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Mantenimiento de las particiones mensuales de transacciones_operativas.
+
+Uso (programar diario/semanal en el cron de Render):
+    python mantener_particiones_transacciones.py                       # crea los meses que falten
+    python mantener_particiones_transacciones.py --meses 6             # con 6 meses de anticipación
+    python mantener_particiones_transacciones.py --archivar-antes 2024-01
+    python mantener_particiones_transacciones.py --verificar           # comprueba la poda de particiones
+"""
+import argparse
+from datetime import datetime, timedelta
+import sqlalchemy as sa
+from src import create_app
+from src.models.database import db
+from src.models.colombia_data.contabilidad.operaciones_y_catalogo import (
+    PARTICIONES_MESES_ADELANTE,
+    asegurar_particiones_transacciones,
+    desprender_particiones_transacciones,
+    nombre_particion_transacciones,
+    transacciones_particionada
+)
+
+
+def _relaciones_del_plan(plan):
+    """Recorre el plan JSON de EXPLAIN y devuelve las tablas que escanea."""
+    relaciones = set()
+    pendientes = [plan]
+    while pendientes:
+        nodo = pendientes.pop()
+        if 'Relation Name' in nodo:
+            relaciones.add(nodo['Relation Name'])
+        pendientes.extend(nodo.get('Plans', []))
+    return relaciones
+
+
+def verificar_poda():
+    """
+    Una consulta del último mes (negocio + rango de fechas) solo debe tocar las
+    particiones de ese rango. Devuelve True si el planner poda el resto.
+    """
+    fin = datetime.utcnow()
+    inicio = fin - timedelta(days=30)
+    esperadas = {
+        nombre_particion_transacciones(inicio.date().replace(day=1)),
+        nombre_particion_transacciones(fin.date().replace(day=1))
+    }
+
+    plan = db.session.execute(sa.text("""
+        EXPLAIN (FORMAT JSON)
+        SELECT id_transaccion FROM transacciones_operativas
+        WHERE negocio_id = :negocio_id AND fecha >= :inicio AND fecha < :fin
+        ORDER BY fecha DESC, id_transaccion DESC
+        LIMIT 100
+    """), {'negocio_id': 0, 'inicio': inicio, 'fin': fin}).scalar()
+
+    escaneadas = _relaciones_del_plan(plan[0]['Plan'])
+    sobrantes = escaneadas - esperadas
+    print(f"⏳ [LOG]: Particiones escaneadas: {', '.join(sorted(escaneadas)) or 'ninguna'}")
+    if sobrantes:
+        print(f"❌ [ERROR CRÍTICO]: La consulta no poda {', '.join(sorted(sobrantes))}")
+        return False
+    print("✅ [EXITO]: La consulta por rango solo toca las particiones del periodo")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Particiones mensuales de transacciones_operativas")
+    parser.add_argument('--meses', type=int, default=PARTICIONES_MESES_ADELANTE,
+                        help="meses futuros a crear por adelantado")
+    parser.add_argument('--archivar-antes', default=None,
+                        help="YYYY-MM: desprende las particiones anteriores a ese mes")
+    parser.add_argument('--verificar', action='store_true',
+                        help="verifica la poda de particiones con EXPLAIN")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        try:
+            if not transacciones_particionada(db.session):
+                print("❌ [ERROR CRÍTICO]: transacciones_operativas no está particionada; ejecuta 'flask db upgrade'")
+                return
+
+            print(f"⏳ [LOG]: Asegurando particiones con {args.meses} meses de anticipación...")
+            creadas = asegurar_particiones_transacciones(meses_adelante=args.meses)
+            print(f"✅ [EXITO]: {len(creadas)} particiones creadas {creadas if creadas else ''}")
+
+            if args.archivar_antes:
+                antes_de = datetime.strptime(args.archivar_antes, '%Y-%m').date()
+                desprendidas = desprender_particiones_transacciones(antes_de)
+                print(f"✅ [EXITO]: {len(desprendidas)} particiones desprendidas para archivo {desprendidas if desprendidas else ''}")
+
+            db.session.commit()
+
+            if args.verificar and not verificar_poda():
+                raise SystemExit(1)
+        except SystemExit:
+            raise
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ [ERROR CRÍTICO]: {e}")
+            raise
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""pedido_items normalizados
+
+Revision ID: 07e472e8827a
+Revises: ada6c357101e
+Create Date: 2026-10-18 10:41:02.466206
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '07e472e8827a'
+down_revision = 'ada6c357101e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('pedido_items',
+        sa.Column('id_item', sa.Integer(), nullable=False),
+        sa.Column('pedido_id', sa.Integer(), nullable=False),
+        sa.Column('negocio_id', sa.Integer(), nullable=False),
+        sa.Column('producto_id', sa.Integer(), nullable=True),
+        sa.Column('nombre', sa.String(length=200), nullable=True),
+        sa.Column('categoria', sa.String(length=100), nullable=True),
+        sa.Column('cantidad', sa.Integer(), nullable=False),
+        sa.Column('precio_unitario', sa.Numeric(precision=12, scale=2), nullable=False),
+        sa.Column('subtotal', sa.Numeric(precision=12, scale=2), nullable=False),
+        sa.Column('fecha', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['pedido_id'], ['pedidos.id_pedido'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id_item')
+    )
+    with op.batch_alter_table('pedido_items', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_pedido_items_pedido_id'), ['pedido_id'], unique=False)
+        batch_op.create_index('ix_pedido_items_negocio_producto_fecha', ['negocio_id', 'producto_id', 'fecha'], unique=False)
+        batch_op.create_index('ix_pedido_items_negocio_fecha', ['negocio_id', 'fecha'], unique=False)
+
+    # Backfill desde el JSONB de pedidos existentes
+    op.execute("""
+        INSERT INTO pedido_items
+            (pedido_id, negocio_id, producto_id, nombre, categoria, cantidad, precio_unitario, subtotal, fecha)
+        SELECT ped.id_pedido, ped.negocio_id,
+               CAST(substring(COALESCE(item->>'producto_id', item->>'id') FROM '^[0-9]+$') AS INTEGER),
+               LEFT(NULLIF(item->>'nombre', ''), 200),
+               LEFT(NULLIF(item->>'categoria', ''), 100),
+               COALESCE(CAST(substring(item->>'cantidad' FROM '^[0-9]+$') AS INTEGER), 1),
+               COALESCE(CAST(substring(COALESCE(item->>'precio_unitario', item->>'precio') FROM '^[0-9]+(?:\\.[0-9]+)?$') AS NUMERIC(12, 2)), 0),
+               COALESCE(
+                   CAST(substring(item->>'subtotal' FROM '^[0-9]+(?:\\.[0-9]+)?$') AS NUMERIC(12, 2)),
+                   COALESCE(CAST(substring(COALESCE(item->>'precio_unitario', item->>'precio') FROM '^[0-9]+(?:\\.[0-9]+)?$') AS NUMERIC(12, 2)), 0)
+                   * COALESCE(CAST(substring(item->>'cantidad' FROM '^[0-9]+$') AS INTEGER), 1)
+               ),
+               COALESCE(ped.fecha_pedido, ped.fecha_creacion, NOW())
+        FROM pedidos ped
+        CROSS JOIN LATERAL jsonb_array_elements(
+            CASE WHEN jsonb_typeof(ped.productos) = 'array' THEN ped.productos ELSE '[]'::jsonb END
+        ) item
+        WHERE jsonb_typeof(item) = 'object'
+    """)
+
+    # total_ventas = unidades de pedidos no cancelados/devueltos
+    op.execute("""
+        UPDATE productos_catalogo p
+        SET total_ventas = COALESCE(v.unidades, 0)
+        FROM productos_catalogo pc
+        LEFT JOIN (
+            SELECT i.producto_id, SUM(i.cantidad) AS unidades
+            FROM pedido_items i
+            JOIN pedidos ped ON ped.id_pedido = i.pedido_id
+            WHERE i.producto_id IS NOT NULL AND ped.estado NOT IN ('cancelado', 'devuelto')
+            GROUP BY i.producto_id
+        ) v ON v.producto_id = pc.id_producto
+        WHERE p.id_producto = pc.id_producto
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('pedido_items', schema=None) as batch_op:
+        batch_op.drop_index('ix_pedido_items_negocio_fecha')
+        batch_op.drop_index('ix_pedido_items_negocio_producto_fecha')
+        batch_op.drop_index(batch_op.f('ix_pedido_items_pedido_id'))
+
+    op.drop_table('pedido_items')
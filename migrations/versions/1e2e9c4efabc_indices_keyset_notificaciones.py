@@ -0,0 +1,41 @@
+"""indices keyset de notificaciones
+
+Revision ID: 1e2e9c4efabc
+Revises: 2c9a6debdfc8
+Create Date: 2026-10-18 11:38:46.304038
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1e2e9c4efabc'
+down_revision = '2c9a6debdfc8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Las consultas separan leídas y no leídas con = true / = false
+    op.execute("UPDATE notification SET is_read = false WHERE is_read IS NULL")
+
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.create_index('ix_notification_negocio_fecha_id', ['negocio_id', 'timestamp', 'id'], unique=False)
+        batch_op.create_index(
+            'ix_notification_negocio_no_leidas', ['negocio_id', 'timestamp', 'id'], unique=False,
+            postgresql_where=sa.text('is_read = false')
+        )
+        batch_op.create_index('ix_notification_usuario_fecha_id', ['user_id', 'timestamp', 'id'], unique=False)
+        batch_op.create_index(
+            'ix_notification_usuario_no_leidas', ['user_id', 'timestamp', 'id'], unique=False,
+            postgresql_where=sa.text('is_read = false')
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.drop_index('ix_notification_usuario_no_leidas')
+        batch_op.drop_index('ix_notification_usuario_fecha_id')
+        batch_op.drop_index('ix_notification_negocio_no_leidas')
+        batch_op.drop_index('ix_notification_negocio_fecha_id')
@@ -0,0 +1,60 @@
+"""hash normalizado de direcciones del comprador
+
+Revision ID: 28f205d45eb0
+Revises: 547a356fff0e
+Create Date: 2026-10-18 11:24:20.094580
+
+"""
+import hashlib
+import re
+import unicodedata
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '28f205d45eb0'
+down_revision = '547a356fff0e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('direcciones_comprador', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('hash_direccion', sa.String(length=64), nullable=True))
+
+    # Backfill con la misma normalización que DireccionComprador.CAMPOS_HASH
+    conn = op.get_bind()
+    filas = conn.execute(sa.text("""
+        SELECT id_direccion, comprador_id, nombre_establecimiento, direccion, complemento,
+               barrio, localidad, ciudad, departamento
+        FROM direcciones_comprador
+        ORDER BY comprador_id, activo DESC, id_direccion
+    """)).all()
+
+    vistos = set()
+    valores = []
+    for fila in filas:
+        texto = unicodedata.normalize('NFKD', ' '.join(p for p in fila[2:] if p))
+        texto = ''.join(c for c in texto if not unicodedata.combining(c))
+        hash_dir = hashlib.sha256(' '.join(re.findall(r'[a-z0-9]+', texto.lower())).encode('utf-8')).hexdigest()
+        # Duplicados previos: se conserva el hash en la primera (activa primero) y el resto queda NULL
+        if (fila.comprador_id, hash_dir) in vistos:
+            continue
+        vistos.add((fila.comprador_id, hash_dir))
+        valores.append({'id': fila.id_direccion, 'hash': hash_dir})
+
+    if valores:
+        conn.execute(
+            sa.text("UPDATE direcciones_comprador SET hash_direccion = :hash WHERE id_direccion = :id"),
+            valores
+        )
+
+    with op.batch_alter_table('direcciones_comprador', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_direcciones_comprador_hash', ['comprador_id', 'hash_direccion'])
+
+
+def downgrade():
+    with op.batch_alter_table('direcciones_comprador', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_direcciones_comprador_hash', type_='unique')
+        batch_op.drop_column('hash_direccion')
@@ -0,0 +1,42 @@
+"""rollup diario de pedidos
+
+Revision ID: 2c8c7c29a705
+Revises: ac0d56486d70
+Create Date: 2026-10-18 11:09:54.885122
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c8c7c29a705'
+down_revision = 'ac0d56486d70'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('pedidos_resumen_diario',
+        sa.Column('negocio_id', sa.Integer(), nullable=False),
+        sa.Column('dia', sa.Date(), nullable=False),
+        sa.Column('estado', sa.String(length=50), nullable=False),
+        sa.Column('cantidad', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Numeric(precision=15, scale=2), nullable=False),
+        sa.PrimaryKeyConstraint('negocio_id', 'dia', 'estado', name='pk_pedidos_resumen_diario')
+    )
+
+    op.execute("""
+        INSERT INTO pedidos_resumen_diario (negocio_id, dia, estado, cantidad, total)
+        SELECT negocio_id,
+               CAST(COALESCE(fecha_pedido, fecha_creacion, NOW()) - INTERVAL '5 hours' AS DATE),
+               COALESCE(estado, 'pendiente'),
+               COUNT(*),
+               COALESCE(SUM(total), 0)
+        FROM pedidos
+        GROUP BY 1, 2, 3
+    """)
+
+
+def downgrade():
+    op.drop_table('pedidos_resumen_diario')
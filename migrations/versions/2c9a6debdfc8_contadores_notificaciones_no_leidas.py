@@ -0,0 +1,118 @@
+"""contadores de notificaciones no leidas
+
+Revision ID: 2c9a6debdfc8
+Revises: 28f205d45eb0
+Create Date: 2026-10-18 11:31:33.199309
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c9a6debdfc8'
+down_revision = '28f205d45eb0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('notificaciones_no_leidas',
+    sa.Column('ambito', sa.String(length=10), nullable=False),
+    sa.Column('ambito_id', sa.Integer(), nullable=False),
+    sa.Column('no_leidas', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('ambito', 'ambito_id')
+    )
+
+    # Triggers por sentencia: un upsert de contadores por cada INSERT/UPDATE/DELETE
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notificaciones_ajustar_no_leidas() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO notificaciones_no_leidas AS c (ambito, ambito_id, no_leidas)
+                SELECT ambito, ambito_id, SUM(delta)
+                FROM (
+                    SELECT 'negocio' AS ambito, negocio_id AS ambito_id, 1 AS delta FROM nuevas
+                    WHERE NOT COALESCE(is_read, FALSE) AND negocio_id IS NOT NULL
+                    UNION ALL
+                    SELECT 'usuario', user_id, 1 FROM nuevas
+                    WHERE NOT COALESCE(is_read, FALSE) AND user_id IS NOT NULL
+                ) d
+                GROUP BY ambito, ambito_id
+                HAVING SUM(delta) <> 0
+                ORDER BY ambito, ambito_id
+                ON CONFLICT (ambito, ambito_id) DO UPDATE SET no_leidas = c.no_leidas + EXCLUDED.no_leidas;
+            ELSIF TG_OP = 'DELETE' THEN
+                INSERT INTO notificaciones_no_leidas AS c (ambito, ambito_id, no_leidas)
+                SELECT ambito, ambito_id, SUM(delta)
+                FROM (
+                    SELECT 'negocio' AS ambito, negocio_id AS ambito_id, -1 AS delta FROM viejas
+                    WHERE NOT COALESCE(is_read, FALSE) AND negocio_id IS NOT NULL
+                    UNION ALL
+                    SELECT 'usuario', user_id, -1 FROM viejas
+                    WHERE NOT COALESCE(is_read, FALSE) AND user_id IS NOT NULL
+                ) d
+                GROUP BY ambito, ambito_id
+                HAVING SUM(delta) <> 0
+                ORDER BY ambito, ambito_id
+                ON CONFLICT (ambito, ambito_id) DO UPDATE SET no_leidas = c.no_leidas + EXCLUDED.no_leidas;
+            ELSE
+                INSERT INTO notificaciones_no_leidas AS c (ambito, ambito_id, no_leidas)
+                SELECT ambito, ambito_id, SUM(delta)
+                FROM (
+                    SELECT 'negocio' AS ambito, negocio_id AS ambito_id, 1 AS delta FROM nuevas
+                    WHERE NOT COALESCE(is_read, FALSE) AND negocio_id IS NOT NULL
+                    UNION ALL
+                    SELECT 'usuario', user_id, 1 FROM nuevas
+                    WHERE NOT COALESCE(is_read, FALSE) AND user_id IS NOT NULL
+                    UNION ALL
+                    SELECT 'negocio' AS ambito, negocio_id AS ambito_id, -1 AS delta FROM viejas
+                    WHERE NOT COALESCE(is_read, FALSE) AND negocio_id IS NOT NULL
+                    UNION ALL
+                    SELECT 'usuario', user_id, -1 FROM viejas
+                    WHERE NOT COALESCE(is_read, FALSE) AND user_id IS NOT NULL
+                ) d
+                GROUP BY ambito, ambito_id
+                HAVING SUM(delta) <> 0
+                ORDER BY ambito, ambito_id
+                ON CONFLICT (ambito, ambito_id) DO UPDATE SET no_leidas = c.no_leidas + EXCLUDED.no_leidas;
+            END IF;
+            RETURN NULL;
+        END;
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER tr_notification_no_leidas_ins AFTER INSERT ON notification
+            REFERENCING NEW TABLE AS nuevas
+            FOR EACH STATEMENT EXECUTE PROCEDURE notificaciones_ajustar_no_leidas();
+        CREATE TRIGGER tr_notification_no_leidas_upd AFTER UPDATE ON notification
+            REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+            FOR EACH STATEMENT EXECUTE PROCEDURE notificaciones_ajustar_no_leidas();
+        CREATE TRIGGER tr_notification_no_leidas_del AFTER DELETE ON notification
+            REFERENCING OLD TABLE AS viejas
+            FOR EACH STATEMENT EXECUTE PROCEDURE notificaciones_ajustar_no_leidas();
+    """)
+
+    # Carga inicial con las escrituras de notificaciones en pausa
+    op.execute("LOCK TABLE notification IN SHARE MODE")
+    op.execute("""
+        INSERT INTO notificaciones_no_leidas (ambito, ambito_id, no_leidas)
+        SELECT 'negocio' AS ambito, negocio_id AS ambito_id, COUNT(*) AS no_leidas
+        FROM notification
+        WHERE NOT COALESCE(is_read, FALSE) AND negocio_id IS NOT NULL
+        GROUP BY negocio_id
+        UNION ALL
+        SELECT 'usuario', user_id, COUNT(*)
+        FROM notification
+        WHERE NOT COALESCE(is_read, FALSE) AND user_id IS NOT NULL
+        GROUP BY user_id
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS tr_notification_no_leidas_del ON notification")
+    op.execute("DROP TRIGGER IF EXISTS tr_notification_no_leidas_upd ON notification")
+    op.execute("DROP TRIGGER IF EXISTS tr_notification_no_leidas_ins ON notification")
+    op.execute("DROP FUNCTION IF EXISTS notificaciones_ajustar_no_leidas()")
+    op.drop_table('notificaciones_no_leidas')
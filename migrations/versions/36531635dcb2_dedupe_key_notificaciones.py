@@ -0,0 +1,31 @@
+"""dedupe_key de notificaciones
+
+Revision ID: 36531635dcb2
+Revises: 1e2e9c4efabc
+Create Date: 2026-10-18 11:45:59.408767
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '36531635dcb2'
+down_revision = '1e2e9c4efabc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('dedupe_key', sa.String(length=64), nullable=True))
+        batch_op.create_index(
+            'uq_notification_dedupe_key', ['dedupe_key'], unique=True,
+            postgresql_where=sa.text('dedupe_key IS NOT NULL')
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.drop_index('uq_notification_dedupe_key')
+        batch_op.drop_column('dedupe_key')
@@ -0,0 +1,34 @@
+"""historial de precios una fila por producto y dia
+
+Revision ID: 3dd54276b06a
+Revises: 6de5392c458c
+Create Date: 2026-10-18 10:19:23.152019
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3dd54276b06a'
+down_revision = '6de5392c458c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Una fila por producto y día: conservar la más reciente de cada día
+    op.execute("""
+        DELETE FROM producto_precios_historico h
+        USING producto_precios_historico d
+        WHERE h.producto_id = d.producto_id
+          AND h.fecha = d.fecha
+          AND h.id < d.id
+    """)
+    with op.batch_alter_table('producto_precios_historico', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_precio_producto_fecha', ['producto_id', 'fecha'])
+
+
+def downgrade():
+    with op.batch_alter_table('producto_precios_historico', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_precio_producto_fecha', type_='unique')
@@ -0,0 +1,67 @@
+"""telefono y correo normalizados para busquedas
+
+Revision ID: 547a356fff0e
+Revises: 2c8c7c29a705
+Create Date: 2026-10-18 11:17:07.989851
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '547a356fff0e'
+down_revision = '2c8c7c29a705'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Columnas generadas: PostgreSQL las calcula (y rellena las filas existentes)
+    op.execute("""
+        ALTER TABLE compradores
+            ADD COLUMN telefono_normalizado VARCHAR(20)
+                GENERATED ALWAYS AS (right(regexp_replace(coalesce(telefono, ''), '[^0-9]', '', 'g'), 10)) STORED,
+            ADD COLUMN correo_normalizado VARCHAR(150)
+                GENERATED ALWAYS AS (lower(btrim(correo))) STORED
+    """)
+    op.execute("""
+        ALTER TABLE pedidos
+            ADD COLUMN telefono_normalizado VARCHAR(20)
+                GENERATED ALWAYS AS (right(regexp_replace(coalesce(datos_comprador->>'telefono', ''), '[^0-9]', '', 'g'), 10)) STORED,
+            ADD COLUMN correo_normalizado VARCHAR(150)
+                GENERATED ALWAYS AS (lower(btrim(datos_comprador->>'correo'))) STORED
+    """)
+
+    with op.batch_alter_table('compradores', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_compradores_telefono_normalizado'), ['telefono_normalizado'], unique=False)
+        batch_op.create_index(batch_op.f('ix_compradores_correo_normalizado'), ['correo_normalizado'], unique=False)
+
+    with op.batch_alter_table('pedidos', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_pedidos_telefono_normalizado'), ['telefono_normalizado'], unique=False)
+        batch_op.create_index(batch_op.f('ix_pedidos_correo_normalizado'), ['correo_normalizado'], unique=False)
+
+    op.execute("""
+        CREATE INDEX ix_pedidos_comprador_nombre_trgm
+        ON pedidos USING gin (lower(datos_comprador->>'nombre') gin_trgm_ops)
+    """)
+    op.execute("CREATE INDEX ix_pedidos_codigo_trgm ON pedidos USING gin (codigo_pedido gin_trgm_ops)")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_pedidos_codigo_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_pedidos_comprador_nombre_trgm")
+
+    with op.batch_alter_table('pedidos', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_pedidos_correo_normalizado'))
+        batch_op.drop_index(batch_op.f('ix_pedidos_telefono_normalizado'))
+        batch_op.drop_column('correo_normalizado')
+        batch_op.drop_column('telefono_normalizado')
+
+    with op.batch_alter_table('compradores', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_compradores_correo_normalizado'))
+        batch_op.drop_index(batch_op.f('ix_compradores_telefono_normalizado'))
+        batch_op.drop_column('correo_normalizado')
+        batch_op.drop_column('telefono_normalizado')
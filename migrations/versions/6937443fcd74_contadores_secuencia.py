@@ -0,0 +1,56 @@
+"""contadores de secuencia por negocio
+
+Revision ID: 6937443fcd74
+Revises: df103108a6ac
+Create Date: 2026-10-18 10:55:28.675664
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6937443fcd74'
+down_revision = 'df103108a6ac'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('contadores_secuencia',
+        sa.Column('negocio_id', sa.Integer(), nullable=False),
+        sa.Column('prefijo', sa.String(length=30), nullable=False),
+        sa.Column('periodo', sa.Integer(), nullable=False),
+        sa.Column('valor', sa.BigInteger(), nullable=False),
+        sa.Column('fecha_actualizacion', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('negocio_id', 'prefijo', 'periodo', name='pk_contadores_secuencia')
+    )
+
+    # Arrancar cada contador en el mayor código ya emitido: PREFIJO-AÑO-NNNN.
+    # El prefijo sale del slug y puede traer '-' ("LA--2026-0042"), así que se
+    # separa con un regex anclado al final en lugar de split_part.
+    op.execute("""
+        INSERT INTO contadores_secuencia (negocio_id, prefijo, periodo, valor, fecha_actualizacion)
+        SELECT negocio_id,
+               partes[1],
+               CAST(partes[2] AS INTEGER),
+               MAX(CAST(partes[3] AS BIGINT)),
+               NOW()
+        FROM (
+            SELECT negocio_id, regexp_match(codigo_pedido, '^(.+)-([0-9]{4})-([0-9]{1,15})$') AS partes
+            FROM pedidos
+        ) c
+        WHERE partes IS NOT NULL
+        GROUP BY 1, 2, 3
+    """)
+
+    # request_id de solicitudes de contratación (contador global)
+    op.execute("""
+        INSERT INTO contadores_secuencia (negocio_id, prefijo, periodo, valor, fecha_actualizacion)
+        SELECT 0, 'SOLICITUD_CONTRATO', 0, COALESCE(MAX(request_id), 0), NOW()
+        FROM notification
+    """)
+
+
+def downgrade():
+    op.drop_table('contadores_secuencia')
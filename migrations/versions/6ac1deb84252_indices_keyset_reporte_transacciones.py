@@ -0,0 +1,28 @@
+"""indices keyset reporte transacciones
+
+Revision ID: 6ac1deb84252
+Revises: 73e0fe0b98f0
+Create Date: 2026-10-18 09:57:44.837832
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6ac1deb84252'
+down_revision = '73e0fe0b98f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transacciones_operativas', schema=None) as batch_op:
+        batch_op.create_index('ix_transacciones_negocio_fecha_id', ['negocio_id', 'fecha', 'id_transaccion'], unique=False)
+        batch_op.create_index('ix_transacciones_negocio_tipo_fecha_id', ['negocio_id', 'tipo', 'fecha', 'id_transaccion'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('transacciones_operativas', schema=None) as batch_op:
+        batch_op.drop_index('ix_transacciones_negocio_tipo_fecha_id')
+        batch_op.drop_index('ix_transacciones_negocio_fecha_id')
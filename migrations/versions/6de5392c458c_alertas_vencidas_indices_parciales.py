@@ -0,0 +1,46 @@
+"""alertas vencidas: fecha_notificada e indices parciales
+
+Revision ID: 6de5392c458c
+Revises: ff844b9a3e02
+Create Date: 2026-10-18 10:12:10.047290
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6de5392c458c'
+down_revision = 'ff844b9a3e02'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('alertas_operativas', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('fecha_notificada', sa.DateTime(), nullable=True))
+        batch_op.create_index(
+            'ix_alertas_negocio_pendientes',
+            ['negocio_id', 'fecha_programada'],
+            unique=False,
+            postgresql_where=sa.text('completada = false')
+        )
+        batch_op.create_index(
+            'ix_alertas_por_notificar',
+            ['fecha_programada'],
+            unique=False,
+            postgresql_where=sa.text('completada = false AND fecha_notificada IS NULL')
+        )
+
+    # Las alertas ya vencidas al desplegar no se notifican de golpe
+    op.execute("""
+        UPDATE alertas_operativas SET fecha_notificada = NOW() AT TIME ZONE 'UTC'
+        WHERE completada = false AND fecha_programada <= NOW() AT TIME ZONE 'UTC'
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('alertas_operativas', schema=None) as batch_op:
+        batch_op.drop_index('ix_alertas_por_notificar')
+        batch_op.drop_index('ix_alertas_negocio_pendientes')
+        batch_op.drop_column('fecha_notificada')
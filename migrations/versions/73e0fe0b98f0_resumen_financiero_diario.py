@@ -0,0 +1,53 @@
+"""rollup diario de transacciones_operativas
+
+Revision ID: 73e0fe0b98f0
+Revises: aef646fa8ef3
+Create Date: 2026-10-18 09:50:31.733103
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '73e0fe0b98f0'
+down_revision = 'aef646fa8ef3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('resumen_financiero_diario',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('negocio_id', sa.Integer(), nullable=False),
+        sa.Column('sucursal_id', sa.Integer(), nullable=False),
+        sa.Column('dia', sa.Date(), nullable=False),
+        sa.Column('tipo', sa.String(length=50), nullable=False),
+        sa.Column('categoria', sa.String(length=100), nullable=False),
+        sa.Column('metodo_pago', sa.String(length=50), nullable=False),
+        sa.Column('cantidad', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Numeric(precision=15, scale=2), nullable=False),
+        sa.ForeignKeyConstraint(['negocio_id'], ['negocios.id_negocio'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('negocio_id', 'dia', 'sucursal_id', 'tipo', 'categoria', 'metodo_pago', name='uq_resumen_financiero_diario')
+    )
+
+    # Carga inicial desde el histórico (día en hora de Colombia, UTC-5)
+    op.execute("""
+        INSERT INTO resumen_financiero_diario
+            (negocio_id, dia, sucursal_id, tipo, categoria, metodo_pago, cantidad, total)
+        SELECT negocio_id,
+               CAST(fecha - INTERVAL '5 hours' AS DATE),
+               COALESCE(sucursal_id, 0),
+               UPPER(tipo),
+               COALESCE(categoria, ''),
+               COALESCE(metodo_pago, ''),
+               COUNT(*),
+               COALESCE(SUM(monto), 0)
+        FROM transacciones_operativas
+        GROUP BY 1, 2, 3, 4, 5, 6
+    """)
+
+
+def downgrade():
+    op.drop_table('resumen_financiero_diario')
@@ -0,0 +1,26 @@
+"""indice compuesto negocio_id nombre en productos_catalogo
+
+Revision ID: a8f9593ec952
+Revises: 7a444204d355
+Create Date: 2026-10-18 09:28:52.418916
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8f9593ec952'
+down_revision = '7a444204d355'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('productos_catalogo', schema=None) as batch_op:
+        batch_op.create_index('ix_productos_catalogo_negocio_nombre', ['negocio_id', 'nombre'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('productos_catalogo', schema=None) as batch_op:
+        batch_op.drop_index('ix_productos_catalogo_negocio_nombre')
@@ -0,0 +1,31 @@
+"""indices keyset bandeja de pedidos
+
+Revision ID: ac0d56486d70
+Revises: 6937443fcd74
+Create Date: 2026-10-18 11:02:41.780393
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ac0d56486d70'
+down_revision = '6937443fcd74'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # El keyset compara (fecha_pedido, id_pedido): no puede haber fechas nulas
+    op.execute("UPDATE pedidos SET fecha_pedido = COALESCE(fecha_creacion, NOW()) WHERE fecha_pedido IS NULL")
+
+    with op.batch_alter_table('pedidos', schema=None) as batch_op:
+        batch_op.create_index('ix_pedidos_negocio_estado_fecha_id', ['negocio_id', 'estado', 'fecha_pedido', 'id_pedido'], unique=False)
+        batch_op.create_index('ix_pedidos_negocio_fecha_id', ['negocio_id', 'fecha_pedido', 'id_pedido'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('pedidos', schema=None) as batch_op:
+        batch_op.drop_index('ix_pedidos_negocio_fecha_id')
+        batch_op.drop_index('ix_pedidos_negocio_estado_fecha_id')
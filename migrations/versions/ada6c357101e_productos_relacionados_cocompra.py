@@ -0,0 +1,48 @@
+"""productos relacionados por co-compra
+
+Revision ID: ada6c357101e
+Revises: d04fc8ca232a
+Create Date: 2026-10-18 10:33:49.361477
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ada6c357101e'
+down_revision = 'd04fc8ca232a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('estado_procesos_batch',
+        sa.Column('nombre', sa.String(length=50), nullable=False),
+        sa.Column('ultimo_id', sa.BigInteger(), nullable=False),
+        sa.Column('fecha_ejecucion', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('nombre')
+    )
+    op.create_table('productos_coocurrencia',
+        sa.Column('producto_a', sa.Integer(), nullable=False),
+        sa.Column('producto_b', sa.Integer(), nullable=False),
+        sa.Column('negocio_id', sa.Integer(), nullable=False),
+        sa.Column('conteo', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('producto_a', 'producto_b')
+    )
+    op.create_table('productos_relacionados',
+        sa.Column('producto_id', sa.Integer(), nullable=False),
+        sa.Column('posicion', sa.SmallInteger(), nullable=False),
+        sa.Column('relacionado_id', sa.Integer(), nullable=False),
+        sa.Column('puntaje', sa.Float(), nullable=False),
+        sa.Column('conteo', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['producto_id'], ['productos_catalogo.id_producto'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['relacionado_id'], ['productos_catalogo.id_producto'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('producto_id', 'posicion')
+    )
+
+
+def downgrade():
+    op.drop_table('productos_relacionados')
+    op.drop_table('productos_coocurrencia')
+    op.drop_table('estado_procesos_batch')
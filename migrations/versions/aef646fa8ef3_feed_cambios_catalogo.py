@@ -0,0 +1,48 @@
+"""feed de cambios del catalogo: tombstones e indice por fecha_actualizacion
+
+Revision ID: aef646fa8ef3
+Revises: b67f46d4716b
+Create Date: 2026-10-18 09:43:18.628374
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'aef646fa8ef3'
+down_revision = 'b67f46d4716b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('productos_eliminados',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('producto_id', sa.Integer(), nullable=False),
+        sa.Column('negocio_id', sa.Integer(), nullable=False),
+        sa.Column('sucursal_id', sa.Integer(), nullable=True),
+        sa.Column('fecha_eliminacion', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['negocio_id'], ['negocios.id_negocio'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('productos_eliminados', schema=None) as batch_op:
+        batch_op.create_index('ix_productos_eliminados_negocio_fecha', ['negocio_id', 'fecha_eliminacion', 'id'], unique=False)
+
+    # El feed recorre por fecha_actualizacion: completar filas antiguas sin valor
+    op.execute(
+        "UPDATE productos_catalogo SET fecha_actualizacion = fecha_creacion "
+        "WHERE fecha_actualizacion IS NULL"
+    )
+    with op.batch_alter_table('productos_catalogo', schema=None) as batch_op:
+        batch_op.create_index('ix_productos_catalogo_negocio_actualizacion', ['negocio_id', 'fecha_actualizacion', 'id_producto'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('productos_catalogo', schema=None) as batch_op:
+        batch_op.drop_index('ix_productos_catalogo_negocio_actualizacion')
+
+    with op.batch_alter_table('productos_eliminados', schema=None) as batch_op:
+        batch_op.drop_index('ix_productos_eliminados_negocio_fecha')
+
+    op.drop_table('productos_eliminados')
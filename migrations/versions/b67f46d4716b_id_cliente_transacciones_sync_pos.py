@@ -0,0 +1,33 @@
+"""id_cliente en transacciones_operativas para sincronizacion POS
+
+Revision ID: b67f46d4716b
+Revises: a8f9593ec952
+Create Date: 2026-10-18 09:36:05.523645
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b67f46d4716b'
+down_revision = 'a8f9593ec952'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transacciones_operativas', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('id_cliente', sa.String(length=64), nullable=True))
+        batch_op.create_index(
+            'uq_transacciones_negocio_id_cliente',
+            ['negocio_id', 'id_cliente'],
+            unique=True,
+            postgresql_where=sa.text('id_cliente IS NOT NULL')
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('transacciones_operativas', schema=None) as batch_op:
+        batch_op.drop_index('uq_transacciones_negocio_id_cliente')
+        batch_op.drop_column('id_cliente')
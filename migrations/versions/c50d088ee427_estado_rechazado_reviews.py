@@ -0,0 +1,38 @@
+"""estado rechazado en reviews
+
+Revision ID: c50d088ee427
+Revises: 36531635dcb2
+Create Date: 2026-10-18 11:53:12.513496
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c50d088ee427'
+down_revision = '36531635dcb2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # aprobado pasa a tres estados: NULL pendiente, true aprobada, false rechazada.
+    # Hasta ahora false era "pendiente" (no existía el rechazo explícito)
+    op.execute("UPDATE producto_reviews SET aprobado = NULL WHERE aprobado = false")
+
+    with op.batch_alter_table('producto_reviews', schema=None) as batch_op:
+        batch_op.alter_column('aprobado', existing_type=sa.Boolean(), nullable=True, server_default=None)
+        batch_op.create_index(
+            'ix_reviews_producto_pendientes',
+            ['producto_id', 'fecha'],
+            unique=False,
+            postgresql_where=sa.text('aprobado IS NULL')
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('producto_reviews', schema=None) as batch_op:
+        batch_op.drop_index('ix_reviews_producto_pendientes')
+
+    op.execute("UPDATE producto_reviews SET aprobado = false WHERE aprobado IS NULL")
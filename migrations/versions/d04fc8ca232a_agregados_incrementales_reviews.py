@@ -0,0 +1,52 @@
+"""agregados incrementales de reviews
+
+Revision ID: d04fc8ca232a
+Revises: 3dd54276b06a
+Create Date: 2026-10-18 10:26:36.256748
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd04fc8ca232a'
+down_revision = '3dd54276b06a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('productos_catalogo', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rating_suma', sa.Integer(), nullable=False, server_default='0'))
+
+    with op.batch_alter_table('producto_reviews', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_reviews_producto_aprobadas',
+            ['producto_id', 'fecha', 'id'],
+            unique=False,
+            postgresql_where=sa.text('aprobado = true')
+        )
+
+    # Punto de partida de los agregados incrementales
+    op.execute("""
+        UPDATE productos_catalogo p
+        SET rating_suma = r.suma,
+            total_reviews = r.total,
+            rating_promedio = ROUND(CAST(r.suma AS NUMERIC) / r.total, 1)
+        FROM (
+            SELECT producto_id, SUM(rating) AS suma, COUNT(*) AS total
+            FROM producto_reviews
+            WHERE aprobado = true
+            GROUP BY producto_id
+        ) r
+        WHERE p.id_producto = r.producto_id
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('producto_reviews', schema=None) as batch_op:
+        batch_op.drop_index('ix_reviews_producto_aprobadas')
+
+    with op.batch_alter_table('productos_catalogo', schema=None) as batch_op:
+        batch_op.drop_column('rating_suma')
@@ -0,0 +1,26 @@
+"""reserva de stock en checkout
+
+Revision ID: df103108a6ac
+Revises: 07e472e8827a
+Create Date: 2026-10-18 10:48:15.570935
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'df103108a6ac'
+down_revision = '07e472e8827a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('pedidos', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('stock_reservado', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade():
+    with op.batch_alter_table('pedidos', schema=None) as batch_op:
+        batch_op.drop_column('stock_reservado')
@@ -0,0 +1,143 @@
+"""particionado mensual de transacciones_operativas
+
+Revision ID: ff844b9a3e02
+Revises: 6ac1deb84252
+Create Date: 2026-10-18 10:04:57.942561
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from datetime import datetime, timedelta
+
+
+# revision identifiers, used by Alembic.
+revision = 'ff844b9a3e02'
+down_revision = '6ac1deb84252'
+branch_labels = None
+depends_on = None
+
+MESES_ADELANTE = 3
+
+INDICES = {
+    'ix_transacciones_operativas_negocio_id': ['negocio_id'],
+    'ix_transacciones_operativas_usuario_id': ['usuario_id'],
+    'ix_transacciones_operativas_tipo': ['tipo'],
+    'ix_transacciones_operativas_categoria': ['categoria'],
+    'ix_transacciones_operativas_fecha': ['fecha'],
+    'ix_transacciones_negocio_fecha_id': ['negocio_id', 'fecha', 'id_transaccion'],
+    'ix_transacciones_negocio_tipo_fecha_id': ['negocio_id', 'tipo', 'fecha', 'id_transaccion'],
+}
+
+
+def _mes_siguiente(mes):
+    return (mes + timedelta(days=32)).replace(day=1)
+
+
+def _crear_indices():
+    for nombre, columnas in INDICES.items():
+        op.create_index(nombre, 'transacciones_operativas', columnas, unique=False)
+
+
+def upgrade():
+    conn = op.get_bind()
+    secuencia = conn.execute(sa.text(
+        "SELECT pg_get_serial_sequence('transacciones_operativas', 'id_transaccion')"
+    )).scalar()
+
+    # 1) Apartar la tabla actual (el índice de la PK tiene nombre global)
+    op.execute("ALTER TABLE transacciones_operativas RENAME TO transacciones_operativas_old")
+    op.execute("ALTER INDEX transacciones_operativas_pkey RENAME TO transacciones_operativas_old_pkey")
+
+    # 2) Tabla padre particionada con las mismas columnas y defaults (incluida la secuencia)
+    op.execute("""
+        CREATE TABLE transacciones_operativas (
+            LIKE transacciones_operativas_old INCLUDING DEFAULTS INCLUDING CONSTRAINTS
+        ) PARTITION BY RANGE (fecha)
+    """)
+    op.execute("CREATE TABLE transacciones_operativas_default PARTITION OF transacciones_operativas DEFAULT")
+
+    # 3) Un mes por partición desde la transacción más antigua hasta MESES_ADELANTE
+    primera = conn.execute(sa.text("SELECT MIN(fecha) FROM transacciones_operativas_old")).scalar()
+    hoy = datetime.utcnow().date().replace(day=1)
+    mes = primera.date().replace(day=1) if primera else hoy
+    ultimo = hoy
+    for _ in range(MESES_ADELANTE):
+        ultimo = _mes_siguiente(ultimo)
+    while mes <= ultimo:
+        siguiente = _mes_siguiente(mes)
+        op.execute(
+            f"CREATE TABLE transacciones_operativas_p{mes.year:04d}_{mes.month:02d} "
+            f"PARTITION OF transacciones_operativas "
+            f"FOR VALUES FROM ('{mes.isoformat()}') TO ('{siguiente.isoformat()}')"
+        )
+        mes = siguiente
+
+    # 4) Copiar datos y traspasar la secuencia antes de borrar la tabla vieja
+    op.execute("INSERT INTO transacciones_operativas SELECT * FROM transacciones_operativas_old")
+    if secuencia:
+        op.execute(f"ALTER SEQUENCE {secuencia} OWNED BY transacciones_operativas.id_transaccion")
+    op.execute("DROP TABLE transacciones_operativas_old")
+
+    # 5) PK con la llave de partición, FKs e índices (se propagan a cada partición)
+    op.create_primary_key('transacciones_operativas_pkey', 'transacciones_operativas', ['id_transaccion', 'fecha'])
+    op.create_foreign_key(None, 'transacciones_operativas', 'negocios', ['negocio_id'], ['id_negocio'], ondelete='CASCADE')
+    op.create_foreign_key(None, 'transacciones_operativas', 'usuarios', ['usuario_id'], ['id_usuario'], ondelete='CASCADE')
+    op.create_foreign_key(None, 'transacciones_operativas', 'sucursales', ['sucursal_id'], ['id_sucursal'], ondelete='SET NULL')
+    _crear_indices()
+
+    # 6) Registro de idempotencia del POS (reemplaza el índice único parcial)
+    op.create_table(
+        'transacciones_id_cliente',
+        sa.Column('negocio_id', sa.Integer(), nullable=False),
+        sa.Column('id_cliente', sa.String(length=64), nullable=False),
+        sa.Column('id_transaccion', sa.Integer(), nullable=True),
+        sa.Column('fecha', sa.DateTime(), nullable=True),
+        sa.Column('fecha_registro', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['negocio_id'], ['negocios.id_negocio'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('negocio_id', 'id_cliente')
+    )
+    op.execute("""
+        INSERT INTO transacciones_id_cliente (negocio_id, id_cliente, id_transaccion, fecha, fecha_registro)
+        SELECT negocio_id, id_cliente, id_transaccion, fecha, fecha
+        FROM transacciones_operativas
+        WHERE id_cliente IS NOT NULL
+        ON CONFLICT DO NOTHING
+    """)
+
+
+def downgrade():
+    conn = op.get_bind()
+    secuencia = conn.execute(sa.text(
+        "SELECT pg_get_serial_sequence('transacciones_operativas', 'id_transaccion')"
+    )).scalar()
+
+    op.drop_table('transacciones_id_cliente')
+
+    op.execute("ALTER TABLE transacciones_operativas RENAME TO transacciones_operativas_old")
+    op.execute("ALTER INDEX transacciones_operativas_pkey RENAME TO transacciones_operativas_old_pkey")
+    for nombre in INDICES:
+        op.execute(f"ALTER INDEX {nombre} RENAME TO {nombre}_old")
+
+    op.execute("""
+        CREATE TABLE transacciones_operativas (
+            LIKE transacciones_operativas_old INCLUDING DEFAULTS INCLUDING CONSTRAINTS
+        )
+    """)
+    op.execute("INSERT INTO transacciones_operativas SELECT * FROM transacciones_operativas_old")
+    if secuencia:
+        op.execute(f"ALTER SEQUENCE {secuencia} OWNED BY transacciones_operativas.id_transaccion")
+    # Borra también todas las particiones
+    op.execute("DROP TABLE transacciones_operativas_old")
+
+    op.create_primary_key('transacciones_operativas_pkey', 'transacciones_operativas', ['id_transaccion'])
+    op.create_foreign_key(None, 'transacciones_operativas', 'negocios', ['negocio_id'], ['id_negocio'], ondelete='CASCADE')
+    op.create_foreign_key(None, 'transacciones_operativas', 'usuarios', ['usuario_id'], ['id_usuario'], ondelete='CASCADE')
+    op.create_foreign_key(None, 'transacciones_operativas', 'sucursales', ['sucursal_id'], ['id_sucursal'], ondelete='SET NULL')
+    _crear_indices()
+    op.create_index(
+        'uq_transacciones_negocio_id_cliente',
+        'transacciones_operativas',
+        ['negocio_id', 'id_cliente'],
+        unique=True,
+        postgresql_where=sa.text('id_cliente IS NOT NULL')
+    )
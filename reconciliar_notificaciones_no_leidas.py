@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+Reconciliación de los contadores de notificaciones no leídas (campanita).
+
+Los triggers sobre `notification` mantienen notificaciones_no_leidas en cada
+escritura; este job recalcula desde la tabla y corrige cualquier desvío
+(triggers deshabilitados durante una carga, restauraciones parciales, etc.).
+
+Uso (programar cada noche en el cron de Render):
+    python reconciliar_notificaciones_no_leidas.py
+"""
+import time
+from src import create_app
+from src.models.database import db
+from src.models.notification import NotificacionNoLeidas
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        try:
+            inicio = time.monotonic()
+            print("⏳ [LOG]: Recalculando contadores de notificaciones no leídas...")
+            corregidos = NotificacionNoLeidas.reconciliar()
+            db.session.commit()
+            print(f"✅ [EXITO]: {corregidos} contadores corregidos en {time.monotonic() - inicio:.1f}s")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ [ERROR CRÍTICO]: {e}")
+            raise
+
+
+if __name__ == "__main__":
+    main()
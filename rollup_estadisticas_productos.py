@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+Recalcula las ventanas móviles de productos_catalogo desde producto_estadisticas:
+visitas_7_dias, ventas_30_dias y velocidad_venta (badges popular / vende_rapido).
+
+Uso (programar cada hora o cada noche):
+    python rollup_estadisticas_productos.py                 # todos los negocios
+    python rollup_estadisticas_productos.py --negocio 12    # un solo negocio
+"""
+import argparse
+from src import create_app
+from src.models.database import db
+from src.models.colombia_data.contabilidad.operaciones_y_catalogo import ProductoEstadisticas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rollup de estadísticas de productos")
+    parser.add_argument('--negocio', type=int, default=None, help="id_negocio a recalcular")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        try:
+            destino = f"negocio {args.negocio}" if args.negocio else "todos los negocios"
+            print(f"⏳ [LOG]: Recalculando ventanas de estadísticas para {destino}...")
+            filas = ProductoEstadisticas.recalcular_ventanas(negocio_id=args.negocio)
+            db.session.commit()
+            print(f"✅ [EXITO]: {filas} productos actualizados")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ [ERROR CRÍTICO]: {e}")
+            raise
+
+
+if __name__ == "__main__":
+    main()
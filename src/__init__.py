@@ -271,6 +271,21 @@ def create_app():
             db.create_all()
             logger.info("✅ Estructura de base de datos verificada en Neon")
             
+            # ==========================================
+            # PARTICIONES MENSUALES DE TRANSACCIONES
+            # ==========================================
+            try:
+                from src.models.colombia_data.contabilidad.operaciones_y_catalogo import (
+                    asegurar_particiones_transacciones
+                )
+                creadas = asegurar_particiones_transacciones()
+                db.session.commit()
+                if creadas:
+                    logger.info(f"🗂️  Particiones de transacciones creadas: {', '.join(creadas)}")
+            except Exception as e:
+                db.session.rollback()
+                logger.warning(f"⚠️  Error asegurando particiones de transacciones: {e}")
+            
             # ==========================================
             # INICIALIZAR BADGES DE TRAYECTORIA (AUTOMÁTICO)
             # ==========================================
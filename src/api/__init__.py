@@ -258,6 +258,12 @@ def register_api(app):
     else:
         fail_count += 1
     
+    # 📊 Eventos de producto (vistas / carrito de la tienda pública)
+    if safe_register('src.api.tiendas.eventos_api', 'eventos_api_bp', 'Eventos de Producto'):
+        success_count += 1
+    else:
+        fail_count += 1
+    
     # ==========================================
     # 💰 CONTABILIDAD E INVENTARIO
     # ==========================================
@@ -270,6 +276,7 @@ def register_api(app):
         ('src.api.contabilidad.control_api', 'control_api_bp', 'Control Operativo'),
         ('src.api.contabilidad.carga_masiva_api', 'carga_masiva_bp', 'Carga Masiva CSV'),
         ('src.api.contabilidad.alertas_api', 'alertas_api_bp', 'Sistema de Alertas'),
+        ('src.api.contabilidad.analitica_api', 'analitica_api_bp', 'Analítica Financiera'),
     ]
     
     for module_path, bp_name, display_name in accounting_modules:
@@ -7,7 +7,10 @@ from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
 from src.models.database import db
 from src.models.colombia_data.contabilidad.operaciones_y_catalogo import AlertaOperativa
+from src.api.contabilidad.control_api import _parse_fecha_cliente
+from src.utils.cursores import codificar_cursor, decodificar_cursor
 from datetime import datetime
+import sqlalchemy as sa
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,18 +18,103 @@ logger = logging.getLogger(__name__)
 alertas_api_bp = Blueprint('alertas_api_bp', __name__)
 
 
+ESTADOS_FILTRO = ('todas', 'pendientes', 'vencidas', 'completadas')
+ALERTAS_LIMITE_DEFAULT = 50
+ALERTAS_LIMITE_MAX = 200
+
+
+def _codificar_cursor_alertas(estado, valores):
+    return codificar_cursor({'estado': estado, 'v': valores})
+
+
+def _decodificar_cursor_alertas(cursor, estado):
+    """
+    Devuelve [fecha_programada, id_alerta] (con completada delante en 'todas').
+    El cursor debe venir del mismo estado: la forma del keyset cambia con él.
+    """
+    datos = decodificar_cursor(cursor)
+    if not isinstance(datos, dict) or datos.get('estado') != estado:
+        raise ValueError("El cursor no corresponde a este estado")
+    valores = datos.get('v')
+    if not isinstance(valores, list) or len(valores) != (3 if estado == 'todas' else 2):
+        raise ValueError("Cursor inválido")
+    if estado == 'todas' and not isinstance(valores[0], bool):
+        raise ValueError("Cursor inválido")
+    if not isinstance(valores[-1], int) or isinstance(valores[-1], bool) or not isinstance(valores[-2], str):
+        raise ValueError("Cursor inválido")
+    valores[-2] = datetime.fromisoformat(valores[-2])
+    return valores
+
+
 @alertas_api_bp.route('/control/alertas/<int:negocio_id>', methods=['GET', 'OPTIONS'])
 @cross_origin(supports_credentials=True)
 def obtener_alertas(negocio_id):
+    """
+    Query params opcionales:
+    - estado: todas | pendientes | vencidas | completadas (default todas)
+    - limite: tamaño de página (default 50, máximo 200)
+    - cursor: valor de cursor_siguiente de la página anterior
+    """
     if request.method == 'OPTIONS':
         return jsonify({"success": True}), 200
     
     try:
-        alertas = AlertaOperativa.query.filter_by(negocio_id=negocio_id)\
-            .order_by(AlertaOperativa.completada.asc(), AlertaOperativa.fecha_programada.asc())\
-            .all()
+        estado = request.args.get('estado', 'todas').lower()
+        if estado not in ESTADOS_FILTRO:
+            return jsonify({"success": False, "message": f"estado debe ser uno de {ESTADOS_FILTRO}"}), 400
+        try:
+            limite = max(1, min(int(request.args.get('limite', ALERTAS_LIMITE_DEFAULT)), ALERTAS_LIMITE_MAX))
+            cursor = request.args.get('cursor')
+            posicion = _decodificar_cursor_alertas(cursor, estado) if cursor else None
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+        
+        ahora = datetime.utcnow()
+        query = AlertaOperativa.query.filter_by(negocio_id=negocio_id)
+        
+        # Pendientes y vencidas se resuelven con el índice parcial (negocio_id, fecha_programada)
+        if estado == 'todas':
+            orden = (AlertaOperativa.completada, AlertaOperativa.fecha_programada, AlertaOperativa.id_alerta)
+        else:
+            if estado == 'completadas':
+                query = query.filter(AlertaOperativa.completada.is_(True))
+            else:
+                query = query.filter(AlertaOperativa.completada.is_(False))
+                if estado == 'vencidas':
+                    query = query.filter(AlertaOperativa.fecha_programada <= ahora)
+            orden = (AlertaOperativa.fecha_programada, AlertaOperativa.id_alerta)
         
-        return jsonify({"success": True, "data": [a.to_dict() for a in alertas]}), 200
+        if posicion:
+            query = query.filter(db.tuple_(*orden) > db.tuple_(*posicion))
+        
+        alertas = query.order_by(*[c.asc() for c in orden]).limit(limite + 1).all()
+        hay_mas = len(alertas) > limite
+        alertas = alertas[:limite]
+        
+        cursor_siguiente = None
+        if hay_mas:
+            ultima = alertas[-1]
+            valores = [ultima.fecha_programada.isoformat(), ultima.id_alerta]
+            if estado == 'todas':
+                valores.insert(0, ultima.completada)
+            cursor_siguiente = _codificar_cursor_alertas(estado, valores)
+        
+        # Contadores para la campanita, también servidos por el índice parcial
+        pendientes, vencidas = db.session.query(
+            sa.func.count(),
+            sa.func.count().filter(AlertaOperativa.fecha_programada <= ahora)
+        ).filter(
+            AlertaOperativa.negocio_id == negocio_id,
+            AlertaOperativa.completada.is_(False)
+        ).one()
+        
+        return jsonify({
+            "success": True,
+            "data": [a.to_dict() for a in alertas],
+            "hay_mas": hay_mas,
+            "cursor_siguiente": cursor_siguiente,
+            "resumen": {"pendientes": pendientes, "vencidas": vencidas}
+        }), 200
     except Exception as e:
         logger.error(f"Error obteniendo alertas: {e}")
         return jsonify({"success": False, "message": str(e)}), 500
@@ -41,12 +129,10 @@ def crear_alerta():
     try:
         data = request.get_json() or {}
         
-        fecha_programada = datetime.utcnow()
-        if data.get('fecha_programada'):
-            try:
-                fecha_programada = datetime.fromisoformat(data['fecha_programada'].replace('Z', '+00:00'))
-            except:
-                fecha_programada = datetime.strptime(data['fecha_programada'], '%Y-%m-%dT%H:%M')
+        try:
+            fecha_programada = _parse_fecha_cliente(data.get('fecha_programada'))
+        except ValueError:
+            return jsonify({"success": False, "message": "fecha_programada inválida"}), 400
         
         nueva = AlertaOperativa(
             negocio_id=int(data['negocio_id']),
@@ -90,6 +176,13 @@ def actualizar_alerta(id_alerta):
             alerta.tarea = data['tarea']
         if 'prioridad' in data:
             alerta.prioridad = data['prioridad'].upper()
+        if data.get('fecha_programada'):
+            # Reprogramar (posponer) vuelve a dejarla lista para el worker de vencimientos
+            try:
+                alerta.fecha_programada = _parse_fecha_cliente(data['fecha_programada'])
+            except ValueError:
+                return jsonify({"success": False, "message": "fecha_programada inválida"}), 400
+            alerta.fecha_notificada = None
         
         db.session.commit()
         return jsonify({"success": True, "data": alerta.to_dict()}), 200
@@ -0,0 +1,249 @@
+"""
+BizFlow Studio - API de Analítica Financiera
+Series por día/semana/mes con margen neto, medias móviles y crecimiento
+frente al periodo anterior, calculadas desde el rollup diario.
+"""
+
+from flask import Blueprint, request, jsonify
+from flask_cors import cross_origin
+from src.models.colombia_data.contabilidad.operaciones_y_catalogo import (
+    ResumenFinancieroDiario,
+    dia_colombia
+)
+from src.api.contabilidad.control_api import get_authenticated_user_id, parse_dia
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+analitica_api_bp = Blueprint('analitica_api_bp', __name__)
+
+GRANULARIDADES = ('dia', 'semana', 'mes')
+MAX_DIAS_RANGO = 731
+TIPOS = ('VENTA', 'COMPRA', 'GASTO', 'INGRESO')
+
+# ==========================================
+# CACHÉ EN MEMORIA (por proceso)
+# ==========================================
+# Rangos que incluyen el día actual cambian con cada venta: TTL corto.
+# Rangos cerrados solo cambian con sincronizaciones tardías o backfills.
+CACHE_TTL_ABIERTO = 60
+CACHE_TTL_CERRADO = 3600
+CACHE_MAX_ENTRADAS = 512
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_get(clave):
+    with _cache_lock:
+        entrada = _cache.get(clave)
+        if not entrada:
+            return None
+        expira, valor = entrada
+        if expira < time.monotonic():
+            del _cache[clave]
+            return None
+        _cache.move_to_end(clave)
+        return valor
+
+
+def _cache_set(clave, valor, ttl):
+    with _cache_lock:
+        _cache[clave] = (time.monotonic() + ttl, valor)
+        _cache.move_to_end(clave)
+        while len(_cache) > CACHE_MAX_ENTRADAS:
+            _cache.popitem(last=False)
+
+
+# ==========================================
+# CÁLCULO SOBRE ARREGLOS DE BUCKETS
+# ==========================================
+def _inicio_bucket(dia, granularidad):
+    if granularidad == 'semana':
+        return dia - timedelta(days=dia.weekday())
+    if granularidad == 'mes':
+        return dia.replace(day=1)
+    return dia
+
+
+def _series_por_bucket(filas, desde, hasta, granularidad):
+    """
+    Convierte las filas (dia, tipo, cantidad, total) del rollup en arreglos
+    densos por bucket: {'buckets': [...], 'VENTA': [...], ...}.
+    """
+    n_dias = (hasta - desde).days + 1
+    diarios = {tipo: [0.0] * n_dias for tipo in TIPOS}
+    for dia, tipo, _cantidad, total in filas:
+        if tipo in diarios and desde <= dia <= hasta:
+            diarios[tipo][(dia - desde).days] += float(total or 0)
+
+    # Índice de bucket para cada día del rango
+    buckets = []
+    indice_dia = []
+    for i in range(n_dias):
+        inicio = _inicio_bucket(desde + timedelta(days=i), granularidad)
+        if not buckets or buckets[-1] != inicio:
+            buckets.append(inicio)
+        indice_dia.append(len(buckets) - 1)
+
+    series = {'buckets': buckets}
+    for tipo in TIPOS:
+        arr = [0.0] * len(buckets)
+        for i, valor in enumerate(diarios[tipo]):
+            arr[indice_dia[i]] += valor
+        series[tipo] = arr
+    return series
+
+
+def _media_movil(valores, ventana):
+    """Media móvil simple con sumas prefijas (O(n)); None hasta completar la ventana."""
+    prefijo = [0.0]
+    for v in valores:
+        prefijo.append(prefijo[-1] + v)
+    return [
+        round((prefijo[i + 1] - prefijo[i + 1 - ventana]) / ventana, 2) if i + 1 >= ventana else None
+        for i in range(len(valores))
+    ]
+
+
+def _crecimiento(actual, anterior):
+    """Crecimiento porcentual elemento a elemento (None si la base es 0 o no existe)."""
+    return [
+        round((a - b) / abs(b) * 100, 2) if b not in (None, 0) else None
+        for a, b in zip(actual, anterior)
+    ]
+
+
+def _redondear(valores):
+    return [round(v, 2) for v in valores]
+
+
+def _calcular_analitica(negocio_id, desde, hasta, granularidad, ventana, sucursal_id):
+    n_dias = (hasta - desde).days + 1
+    desde_anterior = desde - timedelta(days=n_dias)
+    hasta_anterior = desde - timedelta(days=1)
+
+    # Una sola lectura del rollup cubre el periodo actual y el anterior
+    filas = ResumenFinancieroDiario.serie_diaria(
+        negocio_id, desde=desde_anterior, hasta=hasta, sucursal_id=sucursal_id
+    )
+
+    actual = _series_por_bucket(filas, desde, hasta, granularidad)
+    anterior = _series_por_bucket(filas, desde_anterior, hasta_anterior, granularidad)
+
+    def derivar(s):
+        entradas = [v + i for v, i in zip(s['VENTA'], s['INGRESO'])]
+        salidas = [c + g for c, g in zip(s['COMPRA'], s['GASTO'])]
+        neto = [e - x for e, x in zip(entradas, salidas)]
+        margen = [round(n / e * 100, 2) if e else None for n, e in zip(neto, entradas)]
+        return entradas, salidas, neto, margen
+
+    entradas, salidas, neto, margen = derivar(actual)
+    entradas_ant, salidas_ant, neto_ant, _ = derivar(anterior)
+
+    # Alinear el periodo anterior bucket a bucket (puede tener distinto número de buckets)
+    n = len(actual['buckets'])
+    ventas_ant_alineadas = (anterior['VENTA'] + [None] * n)[:n]
+    neto_ant_alineado = (neto_ant + [None] * n)[:n]
+
+    total_ventas, total_ventas_ant = sum(actual['VENTA']), sum(anterior['VENTA'])
+    total_neto, total_neto_ant = sum(neto), sum(neto_ant)
+    total_entradas = sum(entradas)
+
+    return {
+        "negocio_id": negocio_id,
+        "granularidad": granularidad,
+        "ventana_media_movil": ventana,
+        "periodo": {"desde": desde.isoformat(), "hasta": hasta.isoformat()},
+        "periodo_anterior": {"desde": desde_anterior.isoformat(), "hasta": hasta_anterior.isoformat()},
+        "buckets": [b.isoformat() for b in actual['buckets']],
+        "series": {
+            "ventas": _redondear(actual['VENTA']),
+            "ingresos": _redondear(actual['INGRESO']),
+            "compras": _redondear(actual['COMPRA']),
+            "gastos": _redondear(actual['GASTO']),
+            "entradas": _redondear(entradas),
+            "salidas": _redondear(salidas),
+            "neto": _redondear(neto),
+            "margen_neto": margen,
+            "media_movil_ventas": _media_movil(actual['VENTA'], ventana),
+            "media_movil_neto": _media_movil(neto, ventana),
+            "crecimiento_ventas_vs_bucket_anterior": [None] + _crecimiento(actual['VENTA'][1:], actual['VENTA'][:-1]),
+            "crecimiento_ventas_vs_periodo_anterior": _crecimiento(actual['VENTA'], ventas_ant_alineadas),
+            "crecimiento_neto_vs_periodo_anterior": _crecimiento(neto, neto_ant_alineado)
+        },
+        "totales": {
+            "ventas": round(total_ventas, 2),
+            "entradas": round(total_entradas, 2),
+            "salidas": round(sum(salidas), 2),
+            "neto": round(total_neto, 2),
+            "margen_neto": round(total_neto / total_entradas * 100, 2) if total_entradas else None,
+            "ventas_periodo_anterior": round(total_ventas_ant, 2),
+            "neto_periodo_anterior": round(total_neto_ant, 2),
+            "crecimiento_ventas": _crecimiento([total_ventas], [total_ventas_ant])[0],
+            "crecimiento_neto": _crecimiento([total_neto], [total_neto_ant])[0]
+        }
+    }
+
+
+# ==========================================
+# ENDPOINT: ANALÍTICA FINANCIERA
+# ==========================================
+@analitica_api_bp.route('/control/analitica/<int:negocio_id>', methods=['GET', 'OPTIONS'])
+@cross_origin(supports_credentials=True)
+def obtener_analitica(negocio_id):
+    """
+    GET /api/control/analitica/{negocio_id}
+
+    Query params:
+    - desde, hasta: YYYY-MM-DD (hora Colombia). Por defecto los últimos 30 días.
+    - granularidad: dia | semana | mes (default dia)
+    - ventana: buckets de la media móvil (default 7)
+    - sucursal_id: opcional
+    """
+    if request.method == 'OPTIONS':
+        return jsonify({"success": True}), 200
+
+    user_id = get_authenticated_user_id()
+    if not user_id:
+        return jsonify({"success": False, "message": "Debes iniciar sesión"}), 401
+
+    try:
+        hoy = dia_colombia(datetime.utcnow())
+        hasta = parse_dia(request.args.get('hasta')) or hoy
+        desde = parse_dia(request.args.get('desde')) or (hasta - timedelta(days=29))
+        granularidad = request.args.get('granularidad', 'dia')
+        ventana = int(request.args.get('ventana', 7))
+        sucursal_id = request.args.get('sucursal_id', type=int)
+    except ValueError:
+        return jsonify({"success": False, "message": "Parámetros inválidos"}), 400
+
+    if granularidad not in GRANULARIDADES:
+        return jsonify({"success": False, "message": f"granularidad debe ser una de {GRANULARIDADES}"}), 400
+    if desde > hasta:
+        return jsonify({"success": False, "message": "desde no puede ser posterior a hasta"}), 400
+    if (hasta - desde).days + 1 > MAX_DIAS_RANGO:
+        return jsonify({"success": False, "message": f"El rango máximo es de {MAX_DIAS_RANGO} días"}), 400
+    if ventana < 1:
+        return jsonify({"success": False, "message": "ventana debe ser mayor a 0"}), 400
+
+    try:
+        clave = (negocio_id, desde, hasta, granularidad, ventana, sucursal_id)
+        resultado = _cache_get(clave)
+        desde_cache = resultado is not None
+
+        if resultado is None:
+            resultado = _calcular_analitica(negocio_id, desde, hasta, granularidad, ventana, sucursal_id)
+            _cache_set(clave, resultado, CACHE_TTL_ABIERTO if hasta >= hoy else CACHE_TTL_CERRADO)
+
+        logger.info(f"📈 Analítica negocio {negocio_id} {desde}→{hasta} ({granularidad}) cache={desde_cache}")
+
+        return jsonify({"success": True, "cache": desde_cache, **resultado}), 200
+
+    except Exception as e:
+        logger.error(f"❌ Error en analítica financiera:", exc_info=True)
+        return jsonify({"success": False, "error": str(e)}), 500
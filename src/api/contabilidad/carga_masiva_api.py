@@ -9,7 +9,10 @@ from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
 from flask_login import current_user
 from src.models.database import db
-from src.models.colombia_data.contabilidad.operaciones_y_catalogo import ProductoCatalogo
+from src.models.colombia_data.contabilidad.operaciones_y_catalogo import (
+    ProductoCatalogo,
+    ProductoPreciosHistorico
+)
 
 carga_masiva_bp = Blueprint('carga_masiva_service', __name__)
 logger = logging.getLogger(__name__)
@@ -129,6 +132,7 @@ def carga_masiva_productos():
         conteo_exitoso = 0
         conteo_actualizados = 0
         conteo_creados = 0
+        productos_precio = []
         errores = []
 
         for index, p in enumerate(productos):
@@ -241,7 +245,8 @@ def carga_masiva_productos():
                     # ==========================================
                     # ACTUALIZAR PRODUCTO EXISTENTE
                     # ==========================================
-                    producto_existente.precio = precio_val
+                    if producto_existente.actualizar_precio(precio_val):
+                        productos_precio.append(producto_existente)
                     producto_existente.stock = stock_val
                     producto_existente.costo = costo_val
                     producto_existente.categoria = str(categoria_val).strip()
@@ -273,6 +278,7 @@ def carga_masiva_productos():
                         estado_publicacion=True
                     )
                     db.session.add(nuevo_prod)
+                    productos_precio.append(nuevo_prod)
                     conteo_creados += 1
                     logger.debug(f"📦 Creado: {nombre_prod}")
                 
@@ -289,6 +295,9 @@ def carga_masiva_productos():
         # ==========================================
         # COMMIT A LA BASE DE DATOS
         # ==========================================
+        # Historial de precios: nuevos y cambiados en un solo upsert
+        db.session.flush()
+        ProductoPreciosHistorico.registrar_lote(productos_precio)
         db.session.commit()
 
         logger.info(f"✅ Carga masiva completada: {conteo_creados} creados, {conteo_actualizados} actualizados")
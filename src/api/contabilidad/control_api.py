@@ -3,14 +3,29 @@ BizFlow Studio - API de Control Operativo
 Gestión de transacciones e inventario
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_cors import cross_origin
 from flask_login import current_user
 from src.models.database import db
 # CORREGIDO: Import desde la ubicación correcta
-from src.models.colombia_data.contabilidad.operaciones_y_catalogo import TransaccionOperativa, ProductoCatalogo
+from src.models.colombia_data.contabilidad.operaciones_y_catalogo import (
+    TransaccionOperativa,
+    ProductoCatalogo,
+    ProductoPreciosHistorico,
+    ResumenFinancieroDiario,
+    TransaccionIdCliente,
+    rango_utc_dias
+)
+from src.utils.cursores import codificar_cursor, decodificar_cursor
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 import traceback
 import logging
+import json
+import csv
+import io
 
 # Configuración de logs
 logger = logging.getLogger(__name__)
@@ -105,6 +120,8 @@ def registrar_operacion_maestra():
         )
         
         db.session.add(nueva_transaccion)
+        ResumenFinancieroDiario.acumular([nueva_transaccion])
+        resultado_items = None
         logger.info(f"📝 Transacción registrada: {tipo_op} - ${monto_final}")
         
         # CASO A: Actualización manual desde formulario
@@ -121,8 +138,9 @@ def registrar_operacion_maestra():
                         producto.stock = int(data.get('stock'))
                     if data.get('costo'):
                         producto.costo = float(data.get('costo'))
-                    if data.get('precio'):
-                        producto.precio = float(data.get('precio'))
+                    if data.get('precio') and producto.actualizar_precio(data.get('precio')):
+                        db.session.flush()
+                        ProductoPreciosHistorico.registrar_lote([producto])
                     
                     logger.info(f"📦 Producto actualizado: {producto.nombre}")
                 else:
@@ -136,42 +154,23 @@ def registrar_operacion_maestra():
                         sucursal_id=sucursal_id
                     )
                     db.session.add(nuevo_producto)
+                    db.session.flush()
+                    ProductoPreciosHistorico.registrar_lote([nuevo_producto])
                     logger.info(f"📦 Producto creado: {nombre_producto}")
         
-        # CASO B: Procesamiento de items
+        # CASO B: Procesamiento de items (en lote, acotado al negocio)
         elif 'items' in data and isinstance(data['items'], list):
-            for item in data['items']:
-                id_producto = item.get('id') or item.get('id_producto')
-                if not id_producto:
-                    logger.warning(f"⚠️ Item sin id_producto: {item}")
-                    continue
-                
-                producto = ProductoCatalogo.query.filter_by(
-                    id_producto=int(id_producto)
-                ).first()
-                
-                if not producto:
-                    logger.warning(f"⚠️ Producto {id_producto} no encontrado")
-                    continue
-                
-                cantidad = int(item.get('cantidad') or item.get('qty') or 0)
-                if cantidad == 0:
-                    continue
-                
-                stock_previo = producto.stock or 0
-                
-                if tipo_op in ['COMPRA', 'INGRESO']:
-                    producto.stock = stock_previo + cantidad
-                    if item.get('costo'):
-                        producto.costo = float(item['costo'])
-                    logger.info(f"📈 {producto.nombre}: Stock {stock_previo} → {producto.stock} (+{cantidad})")
-                
-                elif tipo_op in ['VENTA', 'GASTO']:
-                    nuevo_stock = stock_previo - cantidad
-                    if nuevo_stock < 0:
-                        logger.warning(f"⚠️ {producto.nombre}: Stock insuficiente ({stock_previo} < {cantidad})")
-                    producto.stock = max(0, nuevo_stock)
-                    logger.info(f"📉 {producto.nombre}: Stock {stock_previo} → {producto.stock} (-{cantidad})")
+            resultado_items = ProductoCatalogo.aplicar_items_lote(
+                negocio_id=negocio_id,
+                usuario_id=user_id,
+                sucursal_id=sucursal_id,
+                items=data['items'],
+                tipo_op=tipo_op,
+                nota=nueva_transaccion.concepto
+            )
+            for omitido in resultado_items['omitidos']:
+                logger.warning(f"⚠️ Item omitido: {omitido}")
+            logger.info(f"📦 Stock actualizado en lote: {len(resultado_items['procesados'])} productos")
         
         db.session.commit()
         
@@ -182,7 +181,9 @@ def registrar_operacion_maestra():
             "message": "Transacción y stock actualizados correctamente",
             "transaccion_id": nueva_transaccion.id_transaccion,
             "tipo": tipo_op,
-            "monto": monto_final
+            "monto": monto_final,
+            "items_procesados": len(resultado_items['procesados']) if resultado_items else 0,
+            "items_omitidos": resultado_items['omitidos'] if resultado_items else []
         }), 201
     
     except ValueError as e:
@@ -202,14 +203,294 @@ def registrar_operacion_maestra():
             "error": str(e)
         }), 500
 
+# ==========================================
+# ENDPOINT 1B: SINCRONIZACIÓN POS OFFLINE (LOTE)
+# ==========================================
+MAX_OPERACIONES_SYNC = 1000
+TAMANO_LOTE_SYNC = 100
+
+
+def _parse_fecha_cliente(valor):
+    """Convierte la fecha ISO enviada por el POS a datetime UTC naive."""
+    if not valor:
+        return datetime.utcnow()
+    fecha = datetime.fromisoformat(str(valor).replace('Z', '+00:00'))
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+    return fecha
+
+
+def parse_dia(valor):
+    """Convierte 'YYYY-MM-DD' a date (None si no viene)."""
+    if not valor:
+        return None
+    return datetime.strptime(valor, '%Y-%m-%d').date()
+
+
+def _aplicar_lote_sync(negocio_id, user_id, sucursal_id, lote):
+    """
+    Aplica un lote de operaciones en la transacción actual.
+
+    Reserva los id_cliente con un único INSERT ... ON CONFLICT DO NOTHING en
+    transacciones_id_cliente e inserta en bloque solo las transacciones nuevas;
+    las que ya existían se reportan como duplicadas y no vuelven a tocar el stock.
+    """
+    filas = []
+    for op in lote:
+        tipo_op = op['tipo']
+        filas.append({
+            'negocio_id': negocio_id,
+            'usuario_id': user_id,
+            'sucursal_id': op['sucursal_id'] or sucursal_id,
+            'tipo': tipo_op,
+            'concepto': (op['data'].get('concepto') or f"Movimiento: {tipo_op}")[:255],
+            'monto': op['monto'],
+            'categoria': op['data'].get('categoria', 'General'),
+            'metodo_pago': op['data'].get('metodo_pago', 'Efectivo'),
+            'referencia_guia': op['data'].get('referencia_guia'),
+            'notas': op['data'].get('notas'),
+            'fecha': op['fecha'],
+            'id_cliente': op['id_cliente']
+        })
+
+    # 1) Reservar los id_cliente en el registro de idempotencia: solo los que
+    #    se insertan aquí son nuevos (una operación concurrente con el mismo
+    #    id_cliente espera a este commit y luego no hace nada)
+    registro = TransaccionIdCliente.__table__
+    nuevos = set(db.session.execute(
+        pg_insert(registro).values([
+            {'negocio_id': negocio_id, 'id_cliente': f['id_cliente']} for f in filas
+        ]).on_conflict_do_nothing(
+            index_elements=['negocio_id', 'id_cliente']
+        ).returning(registro.c.id_cliente)
+    ).scalars())
+
+    # 2) Insertar de una vez solo las transacciones nuevas
+    tabla = TransaccionOperativa.__table__
+    filas_nuevas = [f for f in filas if f['id_cliente'] in nuevos]
+    insertadas = {}
+    if filas_nuevas:
+        stmt = sa.insert(tabla).values(filas_nuevas).returning(tabla.c.id_transaccion, tabla.c.id_cliente)
+        insertadas = {fila.id_cliente: fila.id_transaccion for fila in db.session.execute(stmt)}
+        db.session.execute(sa.text("""
+            UPDATE transacciones_id_cliente r
+            SET id_transaccion = v.id_transaccion,
+                fecha = v.fecha
+            FROM unnest(
+                CAST(:ids_cliente AS VARCHAR[]),
+                CAST(:ids_transaccion AS INTEGER[]),
+                CAST(:fechas AS TIMESTAMP[])
+            ) AS v(id_cliente, id_transaccion, fecha)
+            WHERE r.negocio_id = :negocio_id
+              AND r.id_cliente = v.id_cliente
+        """), {
+            'negocio_id': negocio_id,
+            'ids_cliente': [f['id_cliente'] for f in filas_nuevas],
+            'ids_transaccion': [insertadas[f['id_cliente']] for f in filas_nuevas],
+            'fechas': [f['fecha'] for f in filas_nuevas]
+        })
+        ResumenFinancieroDiario.acumular(filas_nuevas)
+
+    duplicadas = {}
+    faltantes = [op['id_cliente'] for op in lote if op['id_cliente'] not in insertadas]
+    if faltantes:
+        duplicadas = dict(db.session.execute(
+            sa.select(registro.c.id_cliente, registro.c.id_transaccion).where(
+                registro.c.negocio_id == negocio_id,
+                registro.c.id_cliente.in_(faltantes)
+            )
+        ).all())
+
+    # Stock: agrupar operaciones nuevas consecutivas del mismo tipo en una sola
+    # llamada al camino en lote, respetando el orden enviado por el dispositivo
+    grupo_tipo, grupo_items, grupo_sucursal = None, [], None
+    for op in lote:
+        if op['id_cliente'] not in insertadas or not op['items']:
+            continue
+        op_sucursal = op['sucursal_id'] or sucursal_id
+        if (op['tipo'], op_sucursal) != (grupo_tipo, grupo_sucursal) and grupo_items:
+            ProductoCatalogo.aplicar_items_lote(
+                negocio_id, user_id, grupo_sucursal, grupo_items, grupo_tipo, nota="Sincronización POS"
+            )
+            grupo_items = []
+        grupo_tipo, grupo_sucursal = op['tipo'], op_sucursal
+        grupo_items.extend(op['items'])
+    if grupo_items:
+        ProductoCatalogo.aplicar_items_lote(
+            negocio_id, user_id, grupo_sucursal, grupo_items, grupo_tipo, nota="Sincronización POS"
+        )
+
+    resultados = []
+    for op in lote:
+        if op['id_cliente'] in insertadas:
+            resultados.append({
+                "id_cliente": op['id_cliente'],
+                "estado": "aplicada",
+                "transaccion_id": insertadas[op['id_cliente']]
+            })
+        else:
+            resultados.append({
+                "id_cliente": op['id_cliente'],
+                "estado": "duplicada",
+                "transaccion_id": duplicadas.get(op['id_cliente'])
+            })
+    return resultados
+
+
+@control_api_bp.route('/control/operacion/sincronizar', methods=['POST', 'OPTIONS'])
+@cross_origin(supports_credentials=True)
+def sincronizar_operaciones():
+    """
+    Sincroniza en una sola llamada las operaciones registradas offline por un POS.
+
+    Body JSON:
+    - negocio_id, sucursal_id (opcional)
+    - operaciones: lista ordenada de {id_cliente, tipo, monto, concepto, categoria,
+      metodo_pago, fecha (ISO), items: [{id_producto, cantidad, costo}]}
+
+    Cada operación se aplica una sola vez por (negocio_id, id_cliente), así que el
+    dispositivo puede reintentar el envío completo sin duplicar ventas ni stock.
+    Se confirma una transacción por lote; si un lote falla, se detiene y las
+    operaciones restantes se devuelven como 'pendiente' para reintentar.
+    """
+    if request.method == 'OPTIONS':
+        return jsonify({"success": True}), 200
+
+    user_id = get_authenticated_user_id()
+    if not user_id:
+        return jsonify({
+            "success": False,
+            "message": "Debes iniciar sesión"
+        }), 401
+
+    data = request.get_json(silent=True) or {}
+    operaciones = data.get('operaciones')
+
+    try:
+        negocio_id = int(data.get('negocio_id') or 0)
+        sucursal_id = int(data.get('sucursal_id') or 1)
+    except (ValueError, TypeError):
+        return jsonify({"success": False, "message": "negocio_id inválido"}), 400
+
+    if not negocio_id:
+        return jsonify({"success": False, "message": "negocio_id es requerido"}), 400
+    if not isinstance(operaciones, list) or not operaciones:
+        return jsonify({"success": False, "message": "operaciones debe ser una lista no vacía"}), 400
+    if len(operaciones) > MAX_OPERACIONES_SYNC:
+        return jsonify({
+            "success": False,
+            "message": f"Máximo {MAX_OPERACIONES_SYNC} operaciones por sincronización"
+        }), 400
+
+    # Validación previa: las operaciones inválidas se rechazan sin bloquear al resto
+    resultados = []
+    validas = []
+    vistos = set()
+    for op in operaciones:
+        op = op if isinstance(op, dict) else {}
+        id_cliente = str(op.get('id_cliente') or '').strip()[:64]
+        try:
+            if not id_cliente:
+                raise ValueError("id_cliente es requerido")
+            if id_cliente in vistos:
+                raise ValueError("id_cliente repetido en el envío")
+            items = op.get('items') or []
+            if not isinstance(items, list):
+                raise ValueError("items debe ser una lista")
+            validas.append({
+                'id_cliente': id_cliente,
+                'tipo': str(op.get('tipo') or 'VENTA').upper(),
+                'monto': float(op.get('monto') or 0),
+                'fecha': _parse_fecha_cliente(op.get('fecha')),
+                'sucursal_id': int(op['sucursal_id']) if op.get('sucursal_id') else None,
+                'items': items,
+                'data': op
+            })
+            vistos.add(id_cliente)
+        except (ValueError, TypeError) as e:
+            resultados.append({"id_cliente": id_cliente or None, "estado": "rechazada", "error": str(e)})
+
+    aplicadas = duplicadas = 0
+    cursor = None
+    error_lote = None
+
+    for inicio in range(0, len(validas), TAMANO_LOTE_SYNC):
+        lote = validas[inicio:inicio + TAMANO_LOTE_SYNC]
+
+        if error_lote:
+            resultados.extend(
+                {"id_cliente": op['id_cliente'], "estado": "pendiente"} for op in lote
+            )
+            continue
+
+        try:
+            resultados_lote = _aplicar_lote_sync(negocio_id, user_id, sucursal_id, lote)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"❌ Error sincronizando lote desde posición {inicio}:", exc_info=True)
+            error_lote = str(e)
+            resultados.extend(
+                {"id_cliente": op['id_cliente'], "estado": "error", "error": error_lote} for op in lote
+            )
+            continue
+
+        for r in resultados_lote:
+            if r['estado'] == 'aplicada':
+                aplicadas += 1
+            else:
+                duplicadas += 1
+            if r['transaccion_id'] and (cursor is None or r['transaccion_id'] > cursor):
+                cursor = r['transaccion_id']
+        resultados.extend(resultados_lote)
+
+    logger.info(
+        f"🔄 Sincronización POS negocio {negocio_id}: {aplicadas} aplicadas, "
+        f"{duplicadas} duplicadas, {len(operaciones) - aplicadas - duplicadas} sin aplicar"
+    )
+
+    return jsonify({
+        "success": error_lote is None,
+        "message": "Sincronización completada" if error_lote is None else "Sincronización parcial",
+        "resultados": resultados,
+        "aplicadas": aplicadas,
+        "duplicadas": duplicadas,
+        "cursor": cursor,
+        "servidor_fecha": datetime.utcnow().isoformat()
+    }), 200 if error_lote is None else 207
+
 # ==========================================
 # ENDPOINT 2: OBTENER REPORTE
 # ==========================================
+REPORTE_LIMITE_DEFAULT = 100
+REPORTE_LIMITE_MAX = 500
+
+
+def _codificar_cursor_reporte(fecha, id_transaccion):
+    """Cursor opaco con la última posición (fecha, id_transaccion) entregada."""
+    return codificar_cursor([fecha.isoformat(), id_transaccion])
+
+
+def _decodificar_cursor_reporte(cursor):
+    """Devuelve (fecha, id_transaccion) o lanza ValueError."""
+    try:
+        fecha, id_transaccion = decodificar_cursor(cursor)
+        return datetime.fromisoformat(fecha), int(id_transaccion)
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+
 @control_api_bp.route('/control/reporte/<int:negocio_id>', methods=['GET', 'OPTIONS'])
 @cross_origin(supports_credentials=True)
 def obtener_reporte(negocio_id):
     """
-    Obtiene el reporte de transacciones de un negocio.
+    Obtiene el reporte de transacciones de un negocio, de la más reciente a la más antigua.
+    
+    Query params opcionales:
+    - tipo: VENTA | COMPRA | GASTO | INGRESO
+    - desde, hasta: días YYYY-MM-DD (hora Colombia, inclusive)
+    - limite: tamaño de página (default 100, máximo 500)
+    - cursor: valor de cursor_siguiente de la página anterior
     """
     if request.method == 'OPTIONS':
         return jsonify({"success": True}), 200
@@ -219,17 +500,48 @@ def obtener_reporte(negocio_id):
         if not user_id:
             logger.warning("⚠️ Acceso a reporte sin autenticación")
         
-        tipo_filtro = request.args.get('tipo')
-        limite = int(request.args.get('limite', 100))
+        try:
+            tipo_filtro = request.args.get('tipo')
+            desde = parse_dia(request.args.get('desde'))
+            hasta = parse_dia(request.args.get('hasta'))
+            limite = int(request.args.get('limite', REPORTE_LIMITE_DEFAULT))
+            cursor = request.args.get('cursor')
+            posicion = _decodificar_cursor_reporte(cursor) if cursor else None
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "message": "Parámetros inválidos",
+                "error": str(e)
+            }), 400
+        
+        limite = max(1, min(limite, REPORTE_LIMITE_MAX))
         
         query = TransaccionOperativa.query.filter_by(negocio_id=negocio_id)
         
         if tipo_filtro:
             query = query.filter_by(tipo=tipo_filtro.upper())
         
+        inicio, fin = rango_utc_dias(desde, hasta)
+        if inicio:
+            query = query.filter(TransaccionOperativa.fecha >= inicio)
+        if fin:
+            query = query.filter(TransaccionOperativa.fecha < fin)
+        
+        # Keyset: continuar estrictamente después de la última fila entregada
+        if posicion:
+            query = query.filter(
+                db.tuple_(TransaccionOperativa.fecha, TransaccionOperativa.id_transaccion)
+                < db.tuple_(*posicion)
+            )
+        
+        # Se pide una fila extra para saber si hay otra página sin hacer COUNT
         operaciones = query.order_by(
-            TransaccionOperativa.fecha.desc()
-        ).limit(limite).all()
+            TransaccionOperativa.fecha.desc(),
+            TransaccionOperativa.id_transaccion.desc()
+        ).limit(limite + 1).all()
+        
+        hay_mas = len(operaciones) > limite
+        operaciones = operaciones[:limite]
         
         resultado = []
         for op in operaciones:
@@ -243,12 +555,19 @@ def obtener_reporte(negocio_id):
                 "metodo_pago": op.metodo_pago or "No especificado"
             })
         
-        logger.info(f"✅ Reporte generado: {len(resultado)} operaciones")
+        cursor_siguiente = None
+        if hay_mas:
+            ultima = operaciones[-1]
+            cursor_siguiente = _codificar_cursor_reporte(ultima.fecha, ultima.id_transaccion)
+        
+        logger.info(f"✅ Reporte generado: {len(resultado)} operaciones (hay_mas={hay_mas})")
         
         return jsonify({
             "success": True,
             "operaciones": resultado,
-            "total": len(resultado)
+            "total": len(resultado),
+            "hay_mas": hay_mas,
+            "cursor_siguiente": cursor_siguiente
         }), 200
     
     except Exception as e:
@@ -259,6 +578,166 @@ def obtener_reporte(negocio_id):
             "error": str(e)
         }), 500
 
+# ==========================================
+# ENDPOINT 2B: EXPORTACIÓN KARDEX (STREAMING)
+# ==========================================
+FORMATOS_EXPORTACION = ('csv', 'ndjson')
+TAMANO_BLOQUE_EXPORTACION = 2000
+TIPOS_ENTRADA = ('VENTA', 'INGRESO')
+COLUMNAS_KARDEX = (
+    'id', 'fecha', 'tipo', 'concepto', 'categoria', 'metodo_pago',
+    'sucursal_id', 'referencia', 'entrada', 'salida', 'saldo'
+)
+
+
+def _saldo_inicial_kardex(negocio_id, desde, tipo, sucursal_id):
+    """Saldo acumulado antes de `desde`, leído del rollup diario (no de las transacciones)."""
+    if not desde:
+        return Decimal('0')
+    saldo = Decimal('0')
+    filas = ResumenFinancieroDiario.totales_por_tipo(
+        negocio_id, hasta=desde - timedelta(days=1), sucursal_id=sucursal_id
+    )
+    for tipo_fila, _cantidad, total in filas:
+        if tipo and tipo_fila != tipo:
+            continue
+        total = Decimal(total or 0)
+        saldo += total if tipo_fila in TIPOS_ENTRADA else -total
+    return saldo
+
+
+def _generar_kardex(negocio_id, formato, inicio, fin, tipo, sucursal_id, saldo):
+    """
+    Genera el kardex por bloques desde un cursor del lado del servidor.
+    Trabaja en modo core (tuplas, sin objetos ORM) para mantener memoria constante.
+    """
+    t = TransaccionOperativa.__table__
+    query = sa.select(
+        t.c.id_transaccion, t.c.fecha, t.c.tipo, t.c.concepto, t.c.categoria,
+        t.c.metodo_pago, t.c.sucursal_id, t.c.referencia_guia, t.c.monto
+    ).where(t.c.negocio_id == negocio_id)
+    if inicio:
+        query = query.where(t.c.fecha >= inicio)
+    if fin:
+        query = query.where(t.c.fecha < fin)
+    if tipo:
+        query = query.where(t.c.tipo == tipo)
+    if sucursal_id:
+        query = query.where(t.c.sucursal_id == sucursal_id)
+    query = query.order_by(t.c.fecha.asc(), t.c.id_transaccion.asc())
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if formato == 'csv':
+        writer.writerow(COLUMNAS_KARDEX)
+
+    filas_exportadas = 0
+    with db.engine.connect() as conn:
+        resultado = conn.execution_options(
+            stream_results=True, yield_per=TAMANO_BLOQUE_EXPORTACION
+        ).execute(query)
+
+        for bloque in resultado.partitions():
+            for (id_transaccion, fecha, tipo_fila, concepto, categoria,
+                 metodo_pago, sucursal, referencia, monto) in bloque:
+                monto = monto or Decimal('0')
+                es_entrada = tipo_fila in TIPOS_ENTRADA
+                saldo += monto if es_entrada else -monto
+                fila = (
+                    id_transaccion,
+                    fecha.isoformat() if fecha else None,
+                    tipo_fila,
+                    concepto,
+                    categoria,
+                    metodo_pago,
+                    sucursal,
+                    referencia,
+                    str(monto) if es_entrada else '0.00',
+                    '0.00' if es_entrada else str(monto),
+                    str(saldo)
+                )
+                if formato == 'csv':
+                    writer.writerow(fila)
+                else:
+                    buffer.write(json.dumps(dict(zip(COLUMNAS_KARDEX, fila)), ensure_ascii=False))
+                    buffer.write('\n')
+
+            filas_exportadas += len(bloque)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+    logger.info(f"📤 Kardex exportado negocio {negocio_id}: {filas_exportadas} filas, saldo final {saldo}")
+
+
+@control_api_bp.route('/control/reporte/<int:negocio_id>/exportar', methods=['GET', 'OPTIONS'])
+@cross_origin(supports_credentials=True)
+def exportar_kardex(negocio_id):
+    """
+    Exporta el kardex completo en streaming con saldo acumulado por fila.
+    
+    Query params opcionales:
+    - formato: csv | ndjson (default csv)
+    - desde, hasta: días YYYY-MM-DD (hora Colombia, inclusive)
+    - tipo: VENTA | COMPRA | GASTO | INGRESO
+    - sucursal_id: filtrar por sucursal
+    """
+    if request.method == 'OPTIONS':
+        return jsonify({"success": True}), 200
+    
+    user_id = get_authenticated_user_id()
+    if not user_id:
+        return jsonify({"success": False, "message": "Debes iniciar sesión"}), 401
+    
+    try:
+        formato = request.args.get('formato', 'csv').lower()
+        desde = parse_dia(request.args.get('desde'))
+        hasta = parse_dia(request.args.get('hasta'))
+        tipo = request.args.get('tipo', '').upper() or None
+        sucursal_id = request.args.get('sucursal_id', type=int)
+    except ValueError:
+        return jsonify({
+            "success": False,
+            "message": "Fechas inválidas, usa el formato YYYY-MM-DD"
+        }), 400
+    
+    if formato not in FORMATOS_EXPORTACION:
+        return jsonify({
+            "success": False,
+            "message": f"formato debe ser uno de {FORMATOS_EXPORTACION}"
+        }), 400
+    
+    try:
+        saldo_inicial = _saldo_inicial_kardex(negocio_id, desde, tipo, sucursal_id)
+        inicio, fin = rango_utc_dias(desde, hasta)
+        
+        nombre = f"kardex_{negocio_id}_{desde or 'inicio'}_{hasta or 'hoy'}.{formato}"
+        mimetype = 'text/csv' if formato == 'csv' else 'application/x-ndjson'
+        
+        logger.info(f"📤 Exportando kardex negocio {negocio_id} ({formato}) saldo inicial {saldo_inicial}")
+        
+        return Response(
+            stream_with_context(_generar_kardex(
+                negocio_id, formato, inicio, fin, tipo, sucursal_id, saldo_inicial
+            )),
+            mimetype=mimetype,
+            headers={
+                "Content-Disposition": f"attachment; filename={nombre}",
+                "X-Saldo-Inicial": str(saldo_inicial)
+            }
+        )
+    
+    except Exception as e:
+        logger.error(f"❌ Error exportando kardex:", exc_info=True)
+        return jsonify({
+            "success": False,
+            "message": "Error al exportar kardex",
+            "error": str(e)
+        }), 500
+
 # ==========================================
 # ENDPOINT 3: RESUMEN FINANCIERO
 # ==========================================
@@ -266,22 +745,30 @@ def obtener_reporte(negocio_id):
 @cross_origin(supports_credentials=True)
 def obtener_resumen_financiero(negocio_id):
     """
-    Obtiene un resumen financiero del negocio.
+    Obtiene un resumen financiero del negocio desde el rollup diario.
+    
+    Query params opcionales:
+    - desde, hasta: días YYYY-MM-DD (hora Colombia, inclusive)
+    - sucursal_id: filtrar por sucursal
+    - serie=dia: incluir la serie diaria del periodo
     """
     if request.method == 'OPTIONS':
         return jsonify({"success": True}), 200
     
     try:
-        from sqlalchemy import func
+        try:
+            desde = parse_dia(request.args.get('desde'))
+            hasta = parse_dia(request.args.get('hasta'))
+            sucursal_id = request.args.get('sucursal_id', type=int)
+        except ValueError:
+            return jsonify({
+                "success": False,
+                "error": "Fechas inválidas, usa el formato YYYY-MM-DD"
+            }), 400
         
-        resumen = db.session.query(
-            TransaccionOperativa.tipo,
-            func.sum(TransaccionOperativa.monto).label('total')
-        ).filter_by(
-            negocio_id=negocio_id
-        ).group_by(
-            TransaccionOperativa.tipo
-        ).all()
+        resumen = ResumenFinancieroDiario.totales_por_tipo(
+            negocio_id, desde=desde, hasta=hasta, sucursal_id=sucursal_id
+        )
         
         totales = {
             "ventas": 0,
@@ -289,8 +776,10 @@ def obtener_resumen_financiero(negocio_id):
             "gastos": 0,
             "ingresos": 0
         }
+        conteos = {}
         
-        for tipo, total in resumen:
+        for tipo, cantidad, total in resumen:
+            conteos[tipo] = int(cantidad or 0)
             if tipo == 'VENTA':
                 totales['ventas'] = float(total)
             elif tipo == 'COMPRA':
@@ -302,16 +791,33 @@ def obtener_resumen_financiero(negocio_id):
         
         balance = (totales['ventas'] + totales['ingresos']) - (totales['compras'] + totales['gastos'])
         
-        return jsonify({
+        respuesta = {
             "success": True,
             "resumen": {
                 "total_ventas": totales['ventas'],
                 "total_compras": totales['compras'],
                 "total_gastos": totales['gastos'],
                 "total_ingresos": totales['ingresos'],
-                "balance": balance
+                "balance": balance,
+                "num_operaciones": conteos
+            },
+            "periodo": {
+                "desde": desde.isoformat() if desde else None,
+                "hasta": hasta.isoformat() if hasta else None,
+                "sucursal_id": sucursal_id
             }
-        }), 200
+        }
+        
+        if request.args.get('serie') == 'dia':
+            serie = {}
+            for dia, tipo, cantidad, total in ResumenFinancieroDiario.serie_diaria(
+                negocio_id, desde=desde, hasta=hasta, sucursal_id=sucursal_id
+            ):
+                punto = serie.setdefault(dia.isoformat(), {"dia": dia.isoformat()})
+                punto[tipo.lower()] = float(total)
+            respuesta["serie"] = list(serie.values())
+        
+        return jsonify(respuesta), 200
     
     except Exception as e:
         logger.error(f"❌ Error en resumen financiero:", exc_info=True)
@@ -1,5 +1,7 @@
 from src.models.database import db
 from src.models.usuarios import Usuario
+from src.models.contador_secuencia import ContadorSecuencia
+from src.models.notification import Notification
 import logging
 from flask import Blueprint, jsonify, request
 from flask_login import login_required
@@ -66,29 +68,29 @@ def send_contract_request(candidato_id):
 
     logger.debug(f"Mensaje de notificación generado: {notification_message}")
 
-    # Verificar notificaciones duplicadas
-    if Notification.query.filter_by(user_id=candidato.id_usuario, message=notification_message).first():
-        logger.warning("Notificación duplicada detectada.")
-        return jsonify({"warning": "Ya existe una solicitud para este candidato."}), 400
-
-    # Generar un nuevo request_id
+    # Generar un nuevo request_id (si la solicitud resulta duplicada el número se pierde; la secuencia admite huecos)
     try:
-        request_id = db.session.query(func.coalesce(func.max(Notification.request_id), 0) + 1).scalar()
+        request_id = ContadorSecuencia.siguiente(ContadorSecuencia.GLOBAL, 'SOLICITUD_CONTRATO')
         logger.debug(f"Nuevo request_id generado: {request_id}")
     except SQLAlchemyError:
         logger.exception("Error al generar request_id.")
         return jsonify({"error": "Error interno al generar el request_id."}), 500
 
-    # Crear la notificación y registrar el mensaje
+    # Crear la notificación y registrar el mensaje. Como antes, es duplicada la
+    # misma solicitud (remitente + mensaje) al mismo candidato; lo resuelve ON CONFLICT.
     try:
-        new_notification = Notification.create_notification(
+        new_notification = Notification.crear_si_no_existe(
+            f"{current_user.id_usuario}:{notification_message}",
             user_id=candidato.id_usuario,
             sender_id=current_user.id_usuario,
             request_id=request_id,
             message=notification_message,
-            params={'type': 'contract_request'},
+            type='contract_request',
             extra_data={"sender_id": current_user.id_usuario}
         )
+        if new_notification is None:
+            logger.warning("Notificación duplicada detectada.")
+            return jsonify({"warning": "Ya existe una solicitud para este candidato."}), 400
 
         new_message = Message(
             notification_id=new_notification.id,
@@ -100,7 +102,6 @@ def send_contract_request(candidato_id):
         db.session.commit()
 
         logger.info(f"Notificación creada con ID {new_notification.id}")
-        send_contract_request_notification(candidato.id_usuario, notification_message)
 
         return jsonify({
             "message": "Solicitud de contratación enviada exitosamente.",
@@ -13,7 +13,7 @@ import sys
 import re
 import time
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
 from flask_login import current_user
@@ -24,8 +24,14 @@ from src.models.colombia_data.contabilidad.operaciones_y_catalogo import (
     ProductoCatalogo, 
     TransaccionOperativa,
     MovimientoStock,
-    CategoriaProducto
+    CategoriaProducto,
+    ProductoEliminado,
+    ProductoPreciosHistorico,
+    ProductoReview,
+    ProductoRelacionado,
+    dia_colombia
 )
+from src.utils.cursores import codificar_cursor, decodificar_cursor
 
 # --- CONFIGURACIÓN DE LOGS ---
 logger = logging.getLogger(__name__)
@@ -313,6 +319,51 @@ def safe_to_dict(obj, fallback_fields=None):
         return {}
 
 
+def producto_publico_dict(p):
+    """Campos públicos de un producto para la tienda (sin costos ni datos internos)."""
+    campos_publicos = {
+        "id": p.id_producto,
+        "id_producto": p.id_producto,
+        "nombre": p.nombre,
+        "descripcion": p.descripcion,
+        "precio": p.precio,
+        "precio_original": getattr(p, 'precio_original', None),
+        "categoria": p.categoria,
+        "imagen_url": p.imagen_url,
+        "imagenes": parse_json_field(p.imagenes, []),
+        "videos": parse_json_field(p.videos, []),
+        "sku": p.referencia_sku,
+        "stock": p.stock,
+        "en_stock": (p.stock or 0) > 0,
+        "activo": True
+    }
+
+    # Badges
+    if hasattr(p, 'badges_data') and p.badges_data:
+        try:
+            badges = json.loads(p.badges_data) if isinstance(p.badges_data, str) else p.badges_data
+            campos_publicos['badges'] = badges
+        except:
+            campos_publicos['badges'] = {}
+    else:
+        campos_publicos['badges'] = {}
+
+    # Badges legacy
+    campos_publicos['destacado'] = getattr(p, 'badge_destacado', False)
+    campos_publicos['envio_gratis'] = getattr(p, 'badge_envio_gratis', False)
+
+    # Calcular si tiene descuento
+    precio_original = getattr(p, 'precio_original', None)
+    if precio_original and precio_original > p.precio:
+        campos_publicos['tiene_descuento'] = True
+        campos_publicos['descuento_porcentaje'] = round(((precio_original - p.precio) / precio_original) * 100)
+    else:
+        campos_publicos['tiene_descuento'] = False
+        campos_publicos['descuento_porcentaje'] = 0
+
+    return campos_publicos
+
+
 # ============================================
 # HEALTH CHECK
 # ============================================
@@ -1081,6 +1132,8 @@ def guardar_producto_catalogo():
                 pass
         
         db.session.add(nuevo_prod)
+        db.session.flush()
+        ProductoPreciosHistorico.registrar_lote([nuevo_prod])
         db.session.commit()
 
         producto_dict = safe_to_dict(nuevo_prod, ['id_producto', 'nombre', 'precio', 'stock', 'categoria'])
@@ -1137,9 +1190,10 @@ def actualizar_producto(id_producto):
             producto.descripcion = data['descripcion']
         if 'categoria' in data:
             producto.categoria = data['categoria']
+        precio_cambio = False
         if 'precio' in data:
             try:
-                producto.precio = float(data['precio'])
+                precio_cambio = producto.actualizar_precio(data['precio'])
             except:
                 pass
         if 'costo' in data:
@@ -1218,6 +1272,8 @@ def actualizar_producto(id_producto):
         if galeria_actual:
             producto.imagen_url = galeria_actual[0]
 
+        if precio_cambio:
+            ProductoPreciosHistorico.registrar_lote([producto])
         db.session.commit()
 
         producto_dict = safe_to_dict(producto, ['id_producto', 'nombre', 'precio', 'stock', 'categoria'])
@@ -1256,6 +1312,7 @@ def eliminar_producto(id_producto):
             return jsonify({"success": False, "message": "Producto no encontrado"}), 404
         
         nombre = producto.nombre
+        ProductoEliminado.registrar(producto)
         db.session.delete(producto)
         db.session.commit()
         
@@ -1337,7 +1394,8 @@ def edicion_rapida(id_producto):
                 pass
         if 'precio' in data:
             try:
-                producto.precio = float(data['precio'])
+                if producto.actualizar_precio(data['precio']):
+                    ProductoPreciosHistorico.registrar_lote([producto])
             except:
                 pass
         if 'costo' in data:
@@ -1414,6 +1472,8 @@ def duplicar_producto(id_producto):
             duplicado.badge_envio_gratis = original.badge_envio_gratis
         
         db.session.add(duplicado)
+        db.session.flush()
+        ProductoPreciosHistorico.registrar_lote([duplicado])
         db.session.commit()
 
         producto_dict = safe_to_dict(duplicado, ['id_producto', 'nombre', 'precio', 'stock', 'categoria'])
@@ -1603,6 +1663,62 @@ def obtener_movimientos(id_producto):
         return jsonify({"success": False, "message": str(e)}), 500
 
 
+# ============================================
+# 10B. HISTORIAL DE PRECIOS (GRÁFICAS)
+# ============================================
+HISTORIAL_PRECIOS_DIAS_MAX = 1825
+
+
+@catalogo_api_bp.route('/producto/<int:id_producto>/precios', methods=['GET', 'OPTIONS'])
+@cross_origin(supports_credentials=True)
+def historial_precios(id_producto):
+    """
+    GET /api/producto/{id}/precios?dias=365
+    Respuesta compacta para gráficas: arreglos paralelos fechas/precios.
+    """
+    if request.method == 'OPTIONS':
+        return jsonify({"success": True}), 200
+
+    try:
+        dias = max(1, min(int(request.args.get('dias', 365)), HISTORIAL_PRECIOS_DIAS_MAX))
+    except ValueError:
+        return jsonify({"success": False, "message": "dias inválido"}), 400
+
+    try:
+        producto = db.session.query(
+            ProductoCatalogo.id_producto,
+            ProductoCatalogo.precio,
+            ProductoCatalogo.precio_historico_min
+        ).filter(
+            ProductoCatalogo.id_producto == id_producto,
+            ProductoCatalogo.activo == True
+        ).first()
+        if not producto:
+            return jsonify({"success": False, "message": "Producto no encontrado"}), 404
+
+        desde = dia_colombia(datetime.utcnow()) - timedelta(days=dias)
+        filas = db.session.query(
+            ProductoPreciosHistorico.fecha,
+            ProductoPreciosHistorico.precio
+        ).filter(
+            ProductoPreciosHistorico.producto_id == id_producto,
+            ProductoPreciosHistorico.fecha >= desde
+        ).order_by(ProductoPreciosHistorico.fecha.asc()).all()
+
+        return jsonify({
+            "success": True,
+            "producto_id": id_producto,
+            "precio_actual": float(producto.precio or 0),
+            "precio_historico_min": float(producto.precio_historico_min) if producto.precio_historico_min is not None else None,
+            "fechas": [f.isoformat() for f, _ in filas],
+            "precios": [float(precio) for _, precio in filas]
+        }), 200
+
+    except Exception as e:
+        logger.error(f"❌ Error historial de precios: {str(e)}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
 # ============================================
 # 11. ALERTAS DE STOCK
 # ============================================
@@ -2062,6 +2178,7 @@ def importar_productos():
 
         importados = 0
         errores = []
+        nuevos = []
 
         for idx, prod in enumerate(productos_data):
             try:
@@ -2087,11 +2204,15 @@ def importar_productos():
                 )
                 
                 db.session.add(nuevo)
+                nuevos.append(nuevo)
                 importados += 1
                 
             except Exception as e:
                 errores.append({"fila": idx + 1, "error": str(e)})
 
+        # Precio inicial de cada producto importado en el historial (un solo upsert)
+        db.session.flush()
+        ProductoPreciosHistorico.registrar_lote(nuevos)
         db.session.commit()
 
         return jsonify({
@@ -2233,48 +2354,7 @@ def catalogo_publico(negocio_id):
         datos_publicos = []
         for p in productos:
             try:
-                producto_dict = safe_to_dict(p, ['id_producto', 'nombre', 'descripcion', 'precio', 'categoria', 'imagen_url', 'stock', 'referencia_sku'])
-                
-                campos_publicos = {
-                    "id": p.id_producto,
-                    "id_producto": p.id_producto,
-                    "nombre": p.nombre,
-                    "descripcion": p.descripcion,
-                    "precio": p.precio,
-                    "precio_original": getattr(p, 'precio_original', None),
-                    "categoria": p.categoria,
-                    "imagen_url": p.imagen_url,
-                    "imagenes": parse_json_field(p.imagenes, []),
-                    "videos": parse_json_field(p.videos, []),
-                    "sku": p.referencia_sku,
-                    "stock": p.stock,
-                    "en_stock": (p.stock or 0) > 0,
-                    "activo": True
-                }
-                
-                # Badges
-                if hasattr(p, 'badges_data') and p.badges_data:
-                    try:
-                        badges = json.loads(p.badges_data) if isinstance(p.badges_data, str) else p.badges_data
-                        campos_publicos['badges'] = badges
-                    except:
-                        campos_publicos['badges'] = {}
-                else:
-                    campos_publicos['badges'] = {}
-                
-                # Badges legacy
-                campos_publicos['destacado'] = getattr(p, 'badge_destacado', False)
-                campos_publicos['envio_gratis'] = getattr(p, 'badge_envio_gratis', False)
-                
-                # Calcular si tiene descuento
-                precio_original = getattr(p, 'precio_original', None)
-                if precio_original and precio_original > p.precio:
-                    campos_publicos['tiene_descuento'] = True
-                    campos_publicos['descuento_porcentaje'] = round(((precio_original - p.precio) / precio_original) * 100)
-                else:
-                    campos_publicos['tiene_descuento'] = False
-                    campos_publicos['descuento_porcentaje'] = 0
-                
+                campos_publicos = producto_publico_dict(p)
                 datos_publicos.append(campos_publicos)
             except Exception as e:
                 logger.warning(f"⚠️ Error procesando producto público {getattr(p, 'id_producto', '?')}: {e}")
@@ -2464,6 +2544,460 @@ def actualizar_badges_masivo():
         return jsonify({"success": False, "message": str(e)}), 500
 
 
+# ============================================
+# 28. FEED DE CAMBIOS (SYNC DELTA)
+# ============================================
+
+# Margen para no entregar filas de transacciones aún sin confirmar
+# (fecha_actualizacion se asigna en el flush, antes del commit)
+FEED_CAMBIOS_MARGEN_SEG = 5
+# Una transacción larga (checkout esperando bloqueos, lote grande) puede
+# confirmar después del margen con una fecha ya superada por el cursor: cada
+# ronda de sincronización vuelve a leer esta ventana y el cliente deduplica por id
+FEED_CAMBIOS_REESCANEO_SEG = 300
+FEED_CAMBIOS_LIMITE_MAX = 500
+
+CAMPOS_COMPACTOS = (
+    'id_producto', 'nombre', 'precio', 'precio_original', 'stock',
+    'categoria', 'imagen_url', 'activo', 'estado_publicacion'
+)
+
+
+def _decodificar_cursor_feed(cursor):
+    """Devuelve {'p': [iso, id], 'e': [iso, id], 'r': 0|1} o lanza ValueError."""
+    if not cursor:
+        return {'p': None, 'e': None}
+    posiciones = decodificar_cursor(cursor)
+    try:
+        for clave in ('p', 'e'):
+            pos = posiciones.get(clave)
+            if pos is not None:
+                posiciones[clave] = [datetime.fromisoformat(pos[0]), int(pos[1])]
+        return posiciones
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+
+def _producto_compacto(p):
+    d = {campo: getattr(p, campo) for campo in CAMPOS_COMPACTOS}
+    d['id'] = p.id_producto
+    d['precio_original'] = float(p.precio_original) if p.precio_original else None
+    d['fecha_actualizacion'] = p.fecha_actualizacion.isoformat() if p.fecha_actualizacion else None
+    return d
+
+
+def _feed_cambios(negocio_id, cursor, limite, perfil, publico, usuario_id=None):
+    """
+    Devuelve los productos creados/actualizados y los eliminados desde el cursor.
+
+    Recorre por keyset (fecha_actualizacion, id_producto) y (fecha_eliminacion, id)
+    usando los índices por negocio. Sin cursor entrega el snapshot completo paginado.
+    El cursor con que termina una ronda (hay_mas false) lleva 'r': la ronda
+    siguiente arranca FEED_CAMBIOS_REESCANEO_SEG antes de la posición guardada
+    para recoger lo que confirmó tarde; las páginas intermedias siguen el keyset.
+    En el feed público, los productos inactivos o despublicados se informan como
+    eliminados para que la réplica local de la tienda los quite.
+    """
+    posiciones = _decodificar_cursor_feed(cursor)
+    hasta = datetime.utcnow() - timedelta(seconds=FEED_CAMBIOS_MARGEN_SEG)
+    reescaneo = timedelta(seconds=FEED_CAMBIOS_REESCANEO_SEG) if posiciones.get('r') else None
+
+    # --- Productos creados/actualizados ---
+    query = ProductoCatalogo.query.filter(
+        ProductoCatalogo.negocio_id == negocio_id,
+        ProductoCatalogo.fecha_actualizacion <= hasta
+    )
+    if usuario_id:
+        query = query.filter(ProductoCatalogo.usuario_id == int(usuario_id))
+    if posiciones.get('p') and reescaneo:
+        query = query.filter(ProductoCatalogo.fecha_actualizacion > posiciones['p'][0] - reescaneo)
+    elif posiciones.get('p'):
+        query = query.filter(
+            db.tuple_(ProductoCatalogo.fecha_actualizacion, ProductoCatalogo.id_producto)
+            > db.tuple_(*posiciones['p'])
+        )
+    productos = query.order_by(
+        ProductoCatalogo.fecha_actualizacion.asc(),
+        ProductoCatalogo.id_producto.asc()
+    ).limit(limite + 1).all()
+
+    hay_mas = len(productos) > limite
+    productos = productos[:limite]
+
+    # --- Tombstones ---
+    query_elim = ProductoEliminado.query.filter(
+        ProductoEliminado.negocio_id == negocio_id,
+        ProductoEliminado.fecha_eliminacion <= hasta
+    )
+    if posiciones.get('e') and reescaneo:
+        query_elim = query_elim.filter(ProductoEliminado.fecha_eliminacion > posiciones['e'][0] - reescaneo)
+    elif posiciones.get('e'):
+        query_elim = query_elim.filter(
+            db.tuple_(ProductoEliminado.fecha_eliminacion, ProductoEliminado.id)
+            > db.tuple_(*posiciones['e'])
+        )
+    eliminados = query_elim.order_by(
+        ProductoEliminado.fecha_eliminacion.asc(),
+        ProductoEliminado.id.asc()
+    ).limit(limite + 1).all()
+
+    hay_mas = hay_mas or len(eliminados) > limite
+    eliminados = eliminados[:limite]
+
+    actualizados = []
+    eliminados_ids = [e.to_dict() for e in eliminados]
+    for p in productos:
+        if publico and not (p.activo and p.estado_publicacion):
+            eliminados_ids.append({
+                "id": p.id_producto,
+                "id_producto": p.id_producto,
+                "sucursal_id": p.sucursal_id,
+                "fecha_eliminacion": p.fecha_actualizacion.isoformat() if p.fecha_actualizacion else None
+            })
+            continue
+        if perfil == 'compacto':
+            actualizados.append(_producto_compacto(p))
+        elif publico:
+            actualizados.append(producto_publico_dict(p))
+        else:
+            actualizados.append(safe_to_dict(p, ['id_producto', 'nombre', 'precio', 'stock', 'categoria']))
+
+    nuevas_posiciones = {
+        'p': [productos[-1].fecha_actualizacion.isoformat(), productos[-1].id_producto] if productos
+             else (posiciones['p'] and [posiciones['p'][0].isoformat(), posiciones['p'][1]]),
+        'e': [eliminados[-1].fecha_eliminacion.isoformat(), eliminados[-1].id] if eliminados
+             else (posiciones['e'] and [posiciones['e'][0].isoformat(), posiciones['e'][1]]),
+        'r': 0 if hay_mas else 1
+    }
+
+    return {
+        "success": True,
+        "negocio_id": negocio_id,
+        "perfil": perfil,
+        "actualizados": actualizados,
+        "eliminados": eliminados_ids,
+        "cursor": codificar_cursor(nuevas_posiciones),
+        "hay_mas": hay_mas
+    }
+
+
+def _parametros_feed():
+    limite = min(max(int(request.args.get('limite', 200)), 1), FEED_CAMBIOS_LIMITE_MAX)
+    perfil = 'compacto' if request.args.get('perfil') == 'compacto' else 'completo'
+    return request.args.get('cursor'), limite, perfil
+
+
+@catalogo_api_bp.route('/catalogo/cambios', methods=['GET', 'OPTIONS'])
+@cross_origin(supports_credentials=True)
+def feed_cambios_catalogo():
+    """
+    GET /api/catalogo/cambios?negocio_id=&cursor=&limite=&perfil=compacto
+    
+    Cambios del inventario del negocio desde el cursor (POS / Inventario PRO).
+    El cliente guarda el cursor devuelto y repite mientras hay_mas sea true.
+    """
+    if request.method == 'OPTIONS':
+        return jsonify({"success": True}), 200
+
+    user_id = get_authorized_user_id()
+    if not user_id:
+        return jsonify({"success": False, "message": "No autorizado"}), 401
+
+    try:
+        ctx = get_biz_context()
+        if not ctx['negocio_id']:
+            return jsonify({"success": False, "message": "negocio_id es requerido"}), 400
+
+        cursor, limite, perfil = _parametros_feed()
+        resultado = _feed_cambios(ctx['negocio_id'], cursor, limite, perfil, publico=False, usuario_id=user_id)
+
+        logger.info(
+            f"🔄 Feed cambios negocio {ctx['negocio_id']}: "
+            f"{len(resultado['actualizados'])} actualizados, {len(resultado['eliminados'])} eliminados"
+        )
+        return jsonify(resultado), 200
+
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"❌ Error feed cambios: {traceback.format_exc()}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@catalogo_api_bp.route('/productos/publicos/<int:negocio_id>/cambios', methods=['GET', 'OPTIONS'])
+@cross_origin(supports_credentials=True)
+def feed_cambios_publico(negocio_id):
+    """
+    GET /api/productos/publicos/{negocio_id}/cambios?cursor=&limite=&perfil=compacto
+    
+    Feed de cambios de la tienda pública (sin auth).
+    """
+    if request.method == 'OPTIONS':
+        return jsonify({"success": True}), 200
+
+    try:
+        cursor, limite, perfil = _parametros_feed()
+        return jsonify(_feed_cambios(negocio_id, cursor, limite, perfil, publico=True)), 200
+
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"❌ Error feed cambios público: {traceback.format_exc()}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+# ============================================
+# 29. RESEÑAS DE PRODUCTO
+# ============================================
+REVIEWS_LIMITE_DEFAULT = 10
+REVIEWS_LIMITE_MAX = 50
+
+
+def _decodificar_cursor_reviews(cursor):
+    """Devuelve (fecha, id) de la última review entregada o lanza ValueError."""
+    try:
+        fecha, id_review = decodificar_cursor(cursor)
+        return datetime.fromisoformat(fecha), int(id_review)
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+
+def _review_del_dueno(id_review, user_id):
+    """Review cuyo producto pertenece al usuario, o None."""
+    return ProductoReview.query.join(
+        ProductoCatalogo, ProductoCatalogo.id_producto == ProductoReview.producto_id
+    ).filter(
+        ProductoReview.id == id_review,
+        ProductoCatalogo.usuario_id == int(user_id)
+    ).first()
+
+
+@catalogo_api_bp.route('/productos/<int:id_producto>/reviews', methods=['GET', 'OPTIONS'])
+@cross_origin(supports_credentials=True)
+def listar_reviews(id_producto):
+    """
+    GET /api/productos/{id}/reviews?limite=10&cursor=
+    
+    Reviews aprobadas (más recientes primero) por keyset sobre (fecha, id).
+    El promedio y el total salen de las columnas agregadas del producto.
+    """
+    if request.method == 'OPTIONS':
+        return jsonify({"success": True}), 200
+
+    try:
+        limite = max(1, min(int(request.args.get('limite', REVIEWS_LIMITE_DEFAULT)), REVIEWS_LIMITE_MAX))
+        cursor = request.args.get('cursor')
+        posicion = _decodificar_cursor_reviews(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    try:
+        producto = db.session.query(
+            ProductoCatalogo.rating_promedio,
+            ProductoCatalogo.total_reviews
+        ).filter(ProductoCatalogo.id_producto == id_producto).first()
+        if not producto:
+            return jsonify({"success": False, "message": "Producto no encontrado"}), 404
+
+        query = ProductoReview.query.filter(
+            ProductoReview.producto_id == id_producto,
+            ProductoReview.aprobado == True
+        )
+        if posicion:
+            query = query.filter(db.tuple_(ProductoReview.fecha, ProductoReview.id) < db.tuple_(*posicion))
+
+        reviews = query.order_by(ProductoReview.fecha.desc(), ProductoReview.id.desc()).limit(limite + 1).all()
+        hay_mas = len(reviews) > limite
+        reviews = reviews[:limite]
+
+        return jsonify({
+            "success": True,
+            "rating_promedio": float(producto.rating_promedio or 0),
+            "total_reviews": producto.total_reviews or 0,
+            "reviews": [r.to_dict() for r in reviews],
+            "hay_mas": hay_mas,
+            "cursor_siguiente": codificar_cursor([reviews[-1].fecha.isoformat(), reviews[-1].id]) if hay_mas else None
+        }), 200
+
+    except Exception as e:
+        logger.error(f"❌ Error listando reviews: {str(e)}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@catalogo_api_bp.route('/productos/<int:id_producto>/reviews', methods=['POST'])
+@cross_origin(supports_credentials=True)
+def crear_review(id_producto):
+    """POST /api/productos/{id}/reviews - queda pendiente de aprobación del dueño."""
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            rating = int(data.get('rating'))
+        except (TypeError, ValueError):
+            rating = 0
+        if not 1 <= rating <= 5:
+            return jsonify({"success": False, "message": "rating debe estar entre 1 y 5"}), 400
+
+        producto = ProductoCatalogo.query.filter_by(id_producto=id_producto, activo=True).first()
+        if not producto:
+            return jsonify({"success": False, "message": "Producto no encontrado"}), 404
+
+        review = ProductoReview(
+            producto_id=producto.id_producto,
+            negocio_id=producto.negocio_id,
+            cliente_nombre=str(data.get('cliente_nombre') or 'Anónimo')[:100],
+            cliente_email=(data.get('cliente_email') or '')[:150] or None,
+            rating=rating,
+            titulo=(data.get('titulo') or '')[:150] or None,
+            comentario=data.get('comentario'),
+            aprobado=None
+        )
+        db.session.add(review)
+        db.session.commit()
+
+        return jsonify({"success": True, "message": "Reseña enviada para aprobación", "review": review.to_dict()}), 201
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"❌ Error creando review: {str(e)}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@catalogo_api_bp.route('/producto/<int:id_producto>/reviews/moderacion', methods=['GET', 'OPTIONS'])
+@cross_origin(supports_credentials=True)
+def reviews_moderacion(id_producto):
+    """GET /api/producto/{id}/reviews/moderacion?estado=pendientes|aprobadas|rechazadas"""
+    if request.method == 'OPTIONS':
+        return jsonify({"success": True}), 200
+
+    user_id = get_authorized_user_id()
+    if not user_id:
+        return jsonify({"success": False, "message": "No autorizado"}), 401
+
+    try:
+        producto = ProductoCatalogo.query.filter_by(id_producto=id_producto, usuario_id=int(user_id)).first()
+        if not producto:
+            return jsonify({"success": False, "message": "Producto no encontrado"}), 404
+
+        estado = request.args.get('estado', 'pendientes')
+        if estado not in ProductoReview.ESTADOS_MODERACION:
+            return jsonify({
+                "success": False,
+                "message": f"estado debe ser uno de {list(ProductoReview.ESTADOS_MODERACION)}"
+            }), 400
+        reviews = ProductoReview.query.filter(
+            ProductoReview.producto_id == id_producto,
+            ProductoReview.aprobado.is_(ProductoReview.ESTADOS_MODERACION[estado])
+        ).order_by(ProductoReview.fecha.desc()).limit(100).all()
+
+        return jsonify({"success": True, "reviews": [r.to_dict() for r in reviews]}), 200
+
+    except Exception as e:
+        logger.error(f"❌ Error moderación reviews: {str(e)}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@catalogo_api_bp.route('/producto/reviews/<int:id_review>/<accion>', methods=['PATCH', 'POST', 'OPTIONS'])
+@cross_origin(supports_credentials=True)
+def moderar_review(id_review, accion):
+    """PATCH /api/producto/reviews/{id}/aprobar | /rechazar"""
+    if request.method == 'OPTIONS':
+        return jsonify({"success": True}), 200
+    if accion not in ('aprobar', 'rechazar'):
+        return jsonify({"success": False, "message": "Acción inválida"}), 400
+
+    user_id = get_authorized_user_id()
+    if not user_id:
+        return jsonify({"success": False, "message": "No autorizado"}), 401
+
+    try:
+        if not _review_del_dueno(id_review, user_id):
+            return jsonify({"success": False, "message": "Reseña no encontrada"}), 404
+
+        cambio = ProductoReview.aprobar(id_review) if accion == 'aprobar' else ProductoReview.rechazar(id_review)
+        db.session.commit()
+
+        return jsonify({"success": True, "cambio": cambio}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"❌ Error moderando review: {str(e)}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@catalogo_api_bp.route('/producto/reviews/<int:id_review>', methods=['DELETE', 'OPTIONS'])
+@cross_origin(supports_credentials=True)
+def eliminar_review(id_review):
+    """DELETE /api/producto/reviews/{id}"""
+    if request.method == 'OPTIONS':
+        return jsonify({"success": True}), 200
+
+    user_id = get_authorized_user_id()
+    if not user_id:
+        return jsonify({"success": False, "message": "No autorizado"}), 401
+
+    try:
+        if not _review_del_dueno(id_review, user_id):
+            return jsonify({"success": False, "message": "Reseña no encontrada"}), 404
+
+        ProductoReview.eliminar(id_review)
+        db.session.commit()
+
+        return jsonify({"success": True}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"❌ Error eliminando review: {str(e)}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+# ============================================
+# 30. PRODUCTOS RELACIONADOS (CO-COMPRAS)
+# ============================================
+
+@catalogo_api_bp.route('/productos/<int:id_producto>/relacionados', methods=['GET', 'OPTIONS'])
+@cross_origin()
+def productos_relacionados(id_producto):
+    """
+    GET /api/productos/{id}/relacionados?limite=6
+    
+    "Quienes compraron esto también compraron". El top-K lo precalcula
+    calcular_productos_relacionados.py; aquí es una sola lectura por PK.
+    """
+    if request.method == 'OPTIONS':
+        return jsonify({"success": True}), 200
+
+    try:
+        limite = max(1, min(int(request.args.get('limite', 6)), ProductoRelacionado.TOP_K))
+    except ValueError:
+        return jsonify({"success": False, "message": "limite inválido"}), 400
+
+    try:
+        filas = db.session.query(ProductoCatalogo, ProductoRelacionado.puntaje).join(
+            ProductoRelacionado, ProductoRelacionado.relacionado_id == ProductoCatalogo.id_producto
+        ).filter(
+            ProductoRelacionado.producto_id == id_producto,
+            ProductoCatalogo.activo == True,
+            ProductoCatalogo.estado_publicacion == True
+        ).order_by(ProductoRelacionado.posicion).limit(limite).all()
+
+        relacionados = []
+        for producto, puntaje in filas:
+            d = producto_publico_dict(producto)
+            d['puntaje'] = round(puntaje, 4)
+            relacionados.append(d)
+
+        return jsonify({
+            "success": True,
+            "producto_id": id_producto,
+            "relacionados": relacionados,
+            "total": len(relacionados)
+        }), 200
+
+    except Exception as e:
+        logger.error(f"❌ Error obteniendo relacionados: {str(e)}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
 # ============================================
 # FIN DEL ARCHIVO - catalogo_api.py v3.4
 # Soporte completo para badges_data JSON
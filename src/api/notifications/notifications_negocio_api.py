@@ -5,16 +5,27 @@ Endpoints para la campanita de BizFlow Studio
 Ubicación: src/api/notifications/notifications_negocio_api.py
 """
 
+import json
 import logging
-from flask import Blueprint, jsonify, request
+import queue
+import time
+from flask import Blueprint, Response, current_app, jsonify, request
 from flask_cors import cross_origin
 from src.models.database import db
 from src.models.notification import Notification
+from src.services.notificaciones_push_services import (
+    AMBITO_NEGOCIO,
+    AMBITO_USUARIO,
+    central_notificaciones
+)
 from src.models.compradores.pedido import Pedido
 
 # Importar modelo de transacciones para registrar ventas
 try:
-    from src.models.colombia_data.contabilidad.operaciones_y_catalogo import TransaccionOperativa
+    from src.models.colombia_data.contabilidad.operaciones_y_catalogo import (
+        TransaccionOperativa,
+        ResumenFinancieroDiario
+    )
     TIENE_TRANSACCIONES = True
 except ImportError:
     TIENE_TRANSACCIONES = False
@@ -24,6 +35,11 @@ logger = logging.getLogger(__name__)
 
 notifications_negocio_bp = Blueprint('notifications_negocio_bp', __name__, url_prefix='/api/notifications')
 
+DURACION_MAX_STREAM_SEG = 300  # EventSource reconecta solo; libera el hilo cada 5 min
+HEARTBEAT_STREAM_SEG = 15      # comentario SSE para que el proxy no corte la conexión
+ESPERA_MAX_SEG = 25
+LIMITE_MAX_NOTIFICACIONES = 100
+
 
 # ==========================================
 # HELPER: Obtener User ID
@@ -47,7 +63,8 @@ def get_user_id():
 def get_count_no_leidas(negocio_id):
     """
     GET /api/notifications/negocio/{id}/count
-    Retorna cantidad de notificaciones no leídas.
+    Retorna cantidad de notificaciones no leídas (lectura por llave del
+    contador mantenido por triggers, no un COUNT por cada sondeo).
     """
     try:
         count = Notification.contar_no_leidas(negocio_id=negocio_id)
@@ -60,6 +77,123 @@ def get_count_no_leidas(negocio_id):
         return jsonify({"success": False, "count": 0}), 200
 
 
+# ==========================================
+# PUSH: STREAM SSE Y LONG-POLL
+# ==========================================
+def _respuesta_stream(ambito, ambito_id):
+    """
+    Stream SSE con los to_dict_mini de las notificaciones nuevas.
+    
+    La suscripción se hace dentro del generador: si el cliente se va antes de
+    que empiece la respuesta, el generador nunca arranca y no queda una cola
+    registrada; una vez dentro, el finally la retira siempre.
+    """
+    app = current_app._get_current_object()
+    # El stream no usa la BD: devolver la conexión al pool antes de quedarse abierto
+    db.session.remove()
+    
+    def generar():
+        with app.app_context():
+            cola = central_notificaciones.suscribir(ambito, ambito_id)
+        try:
+            yield "retry: 3000\n\n"
+            fin = time.monotonic() + DURACION_MAX_STREAM_SEG
+            while time.monotonic() < fin:
+                try:
+                    notificacion = cola.get(timeout=HEARTBEAT_STREAM_SEG)
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: notificacion\ndata: {json.dumps(notificacion, default=str)}\n\n"
+        finally:
+            central_notificaciones.desuscribir(ambito, ambito_id, cola)
+    
+    return Response(generar(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+def _esperar_notificaciones(ambito, ambito_id):
+    """
+    Long-poll: responde apenas llegue una notificación o al vencer el timeout.
+    Con ?ultimo_id= primero devuelve las que el cliente no alcanzó a ver
+    entre una espera y la siguiente.
+    """
+    timeout = max(1, min(request.args.get('timeout', ESPERA_MAX_SEG, type=int), ESPERA_MAX_SEG))
+    ultimo_id = request.args.get('ultimo_id', type=int)
+    
+    # Suscribirse antes de consultar: lo que llegue en medio queda en la cola
+    cola = central_notificaciones.suscribir(ambito, ambito_id)
+    try:
+        if ultimo_id is not None:
+            filtro = (Notification.negocio_id == ambito_id) if ambito == AMBITO_NEGOCIO \
+                else (Notification.user_id == ambito_id)
+            pendientes = Notification.query.filter(
+                filtro, Notification.id > ultimo_id
+            ).order_by(Notification.id).limit(50).all()
+            if pendientes:
+                return jsonify({
+                    "success": True,
+                    "notificaciones": [n.to_dict_mini() for n in pendientes]
+                }), 200
+        db.session.remove()
+        
+        notificaciones = []
+        try:
+            notificaciones.append(cola.get(timeout=timeout))
+            while True:
+                notificaciones.append(cola.get_nowait())
+        except queue.Empty:
+            pass
+        
+        return jsonify({"success": True, "notificaciones": notificaciones}), 200
+    finally:
+        central_notificaciones.desuscribir(ambito, ambito_id, cola)
+
+
+@notifications_negocio_bp.route('/negocio/<int:negocio_id>/stream', methods=['GET'])
+@cross_origin()
+def stream_notificaciones_negocio(negocio_id):
+    """
+    GET /api/notifications/negocio/{id}/stream
+    Server-Sent Events: `event: notificacion` con el to_dict_mini de cada nueva.
+    """
+    return _respuesta_stream(AMBITO_NEGOCIO, negocio_id)
+
+
+@notifications_negocio_bp.route('/usuario/<int:user_id>/stream', methods=['GET'])
+@cross_origin()
+def stream_notificaciones_usuario(user_id):
+    """GET /api/notifications/usuario/{id}/stream (igual que el del negocio)."""
+    return _respuesta_stream(AMBITO_USUARIO, user_id)
+
+
+@notifications_negocio_bp.route('/negocio/<int:negocio_id>/esperar', methods=['GET'])
+@cross_origin()
+def esperar_notificaciones_negocio(negocio_id):
+    """
+    GET /api/notifications/negocio/{id}/esperar?ultimo_id=120&timeout=25
+    Long-poll para clientes sin EventSource.
+    """
+    try:
+        return _esperar_notificaciones(AMBITO_NEGOCIO, negocio_id)
+    except Exception as e:
+        logger.error(f"Error en long-poll de notificaciones: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@notifications_negocio_bp.route('/usuario/<int:user_id>/esperar', methods=['GET'])
+@cross_origin()
+def esperar_notificaciones_usuario(user_id):
+    """GET /api/notifications/usuario/{id}/esperar?ultimo_id=120&timeout=25"""
+    try:
+        return _esperar_notificaciones(AMBITO_USUARIO, user_id)
+    except Exception as e:
+        logger.error(f"Error en long-poll de notificaciones: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
 # ==========================================
 # LISTAR NOTIFICACIONES
 # ==========================================
@@ -68,25 +202,34 @@ def get_count_no_leidas(negocio_id):
 def get_notificaciones_negocio(negocio_id):
     """
     GET /api/notifications/negocio/{id}?limit=20
-    Lista notificaciones del negocio.
+    GET /api/notifications/negocio/{id}?limit=20&cursor=<cursor_siguiente>
+    Lista notificaciones del negocio con paginación por cursor.
     """
     try:
         limite = request.args.get('limit', 20, type=int)
-        limite = request.args.get('limite', limite, type=int)
+        limite = max(1, min(request.args.get('limite', limite, type=int), LIMITE_MAX_NOTIFICACIONES))
         solo_no_leidas = request.args.get('solo_no_leidas', 'false').lower() == 'true'
         categoria = request.args.get('categoria', None)
+        cursor = request.args.get('cursor')
+        
+        try:
+            posicion = Notification.decodificar_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
         
         if categoria:
-            notificaciones = Notification.obtener_por_categoria(
+            notificaciones, hay_mas = Notification.obtener_por_categoria(
                 negocio_id=negocio_id,
                 categoria=categoria,
-                limite=limite
+                limite=limite,
+                cursor=posicion
             )
         else:
-            notificaciones = Notification.obtener_recientes(
+            notificaciones, hay_mas = Notification.obtener_recientes(
                 negocio_id=negocio_id,
                 limite=limite,
-                solo_no_leidas=solo_no_leidas
+                solo_no_leidas=solo_no_leidas,
+                cursor=posicion
             )
         
         count_no_leidas = Notification.contar_no_leidas(negocio_id=negocio_id)
@@ -112,7 +255,9 @@ def get_notificaciones_negocio(negocio_id):
             "notifications": notifs_list,
             "notificaciones": notifs_list,
             "count_no_leidas": count_no_leidas,
-            "total": len(notifs_list)
+            "total": len(notifs_list),
+            "hay_mas": hay_mas,
+            "cursor_siguiente": Notification.codificar_cursor(notificaciones[-1]) if hay_mas else None
         }), 200
         
     except Exception as e:
@@ -320,6 +465,7 @@ def aprobar_pedido(negocio_id, pedido_id):
                 )
                 db.session.add(transaccion)
                 db.session.flush()
+                ResumenFinancieroDiario.acumular([transaccion])
                 transaccion_id = transaccion.id_transaccion
                 
                 logger.info(f"💰 Transacción registrada: ${pedido.total}")
@@ -470,21 +616,28 @@ def rechazar_pedido(negocio_id, pedido_id):
 @cross_origin()
 def listar_pedidos_pendientes(negocio_id):
     """
-    GET /api/notifications/negocio/{id}/pedidos-pendientes
-    Lista todos los pedidos pendientes.
+    GET /api/notifications/negocio/{id}/pedidos-pendientes?limite=50&cursor=
+    Lista los pedidos pendientes (más recientes primero) por cursor.
     """
     try:
-        pedidos = Pedido.query.filter_by(
-            negocio_id=negocio_id,
-            estado='pendiente'
-        ).order_by(
-            Pedido.fecha_pedido.desc()
-        ).limit(50).all()
+        limite = max(1, min(request.args.get('limite', 50, type=int), 100))
+        cursor = request.args.get('cursor')
+        try:
+            posicion = Pedido.decodificar_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        
+        pedidos, hay_mas = Pedido.listar_keyset(
+            negocio_id, estado='pendiente', limite=limite, cursor=posicion
+        )
         
         return jsonify({
             "success": True,
             "pedidos": [p.to_dict_lista() for p in pedidos],
-            "total": len(pedidos)
+            "total": len(pedidos),
+            "total_pendientes": Pedido.contar_bandeja(negocio_id, 'pendiente') if not posicion else None,
+            "hay_mas": hay_mas,
+            "cursor_siguiente": Pedido.codificar_cursor(pedidos[-1]) if hay_mas else None
         }), 200
         
     except Exception as e:
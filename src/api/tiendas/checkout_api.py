@@ -1,19 +1,27 @@
 """
-Checkout API - TuKomercio v3.1
+Checkout API - TuKomercio v3.2
 Usa modelos SQLAlchemy existentes (Comprador, DireccionComprador, Pedido)
 ★ NUEVO: Crea notificación automática para la campanita
+★ v3.2: Precios y totales calculados en el servidor y reserva atómica de stock
 Ruta: /api/tiendas/<slug>/checkout
 """
 
 from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
+from decimal import Decimal, InvalidOperation
 import datetime
 
 # Importar modelos existentes
 from src.models import Comprador
 from src.models import DireccionComprador
 from src.models import Pedido 
+from src.models import PedidoItem
 from src.models.database import db
+from src.models.colombia_data.contabilidad.operaciones_y_catalogo import (
+    ProductoCatalogo,
+    ProductoEstadisticas,
+    dia_colombia
+)
 
 # ★ NUEVO: Importar modelo de notificaciones
 try:
@@ -25,7 +33,9 @@ except ImportError:
 
 checkout_api_bp = Blueprint('checkout_api', __name__)
 
-print("🏪 Módulo checkout_api v3.1 iniciando (con notificaciones)...")
+MAX_CANTIDAD_ITEM = 1000
+
+print("🏪 Módulo checkout_api v3.2 iniciando (con notificaciones)...")
 
 
 @checkout_api_bp.route('/tiendas/<slug>/checkout', methods=['POST', 'OPTIONS'])
@@ -59,12 +69,14 @@ def procesar_checkout(slug):
                 "precio_unitario": 50000
             }
         ],
-        "subtotal": 100000,
         "costo_envio": 8000,
-        "total": 108000,
         "metodo_pago": "efectivo",
         "notas": "Llamar antes de entregar"
     }
+    
+    precio_unitario, subtotal y total del cliente se ignoran: se recalculan con
+    los precios del catálogo. El stock se descuenta en la misma transacción del
+    pedido y se devuelve al cancelarlo.
     """
     
     # Manejar preflight CORS
@@ -100,6 +112,72 @@ def procesar_checkout(slug):
         if not productos:
             return jsonify({'success': False, 'error': 'Agrega al menos un producto'}), 400
         
+        # ==========================================
+        # 0. VALIDAR PRODUCTOS Y PRECIOS EN EL SERVIDOR
+        # ==========================================
+        try:
+            negocio_id = int(negocio_id)
+            costo_envio = Decimal(str(data.get('costo_envio') or 0))
+            cantidades = {}
+            for p in productos:
+                producto_id = int(p.get('producto_id') or p.get('id'))
+                cantidad = int(p.get('cantidad', 1))
+                if cantidad <= 0 or cantidad > MAX_CANTIDAD_ITEM:
+                    raise ValueError
+                cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad
+        except (AttributeError, TypeError, ValueError, InvalidOperation):
+            return jsonify({'success': False, 'error': 'Productos inválidos'}), 400
+        
+        if costo_envio < 0:
+            return jsonify({'success': False, 'error': 'costo_envio inválido'}), 400
+        
+        # El código sale de ContadorSecuencia en su propia conexión: se reserva
+        # antes de bloquear productos para no esperar un slot del pool con
+        # los FOR UPDATE tomados (un rechazo posterior solo deja un hueco)
+        codigo_pedido = Pedido.generar_codigo(negocio_id, Pedido.prefijo_codigo(slug))
+        
+        # Una sola consulta; las filas quedan bloqueadas hasta el commit
+        catalogo = {
+            p.id_producto: p
+            for p in ProductoCatalogo.obtener_para_checkout(negocio_id, list(cantidades))
+        }
+        
+        no_disponibles = [pid for pid in cantidades if pid not in catalogo]
+        sin_stock = [
+            {'producto_id': pid, 'nombre': catalogo[pid].nombre, 'disponible': catalogo[pid].stock}
+            for pid, cantidad in cantidades.items()
+            if pid in catalogo and (catalogo[pid].stock or 0) < cantidad
+        ]
+        if no_disponibles or sin_stock:
+            db.session.rollback()
+            return jsonify({
+                'success': False,
+                'error': 'Algunos productos no están disponibles o no tienen stock suficiente',
+                'productos_no_disponibles': no_disponibles,
+                'productos_sin_stock': sin_stock
+            }), 409
+        
+        subtotal = Decimal('0')
+        lineas = []
+        for pid, cantidad in cantidades.items():
+            producto = catalogo[pid]
+            precio = Decimal(str(producto.precio)).quantize(Decimal('0.01'))
+            subtotal += precio * cantidad
+            lineas.append({
+                'producto_id': pid,
+                'nombre': producto.nombre,
+                'cantidad': cantidad,
+                'precio_unitario': float(precio),
+                'subtotal': float(precio * cantidad),
+                'imagen_url': producto.imagen_url,
+                'categoria': producto.categoria
+            })
+        total = subtotal + costo_envio
+        
+        if data.get('total') not in (None, float(total)):
+            print(f"⚠️ Total del cliente ({data.get('total')}) difiere del calculado ({total}); se usa el del servidor")
+        productos = lineas
+        
         # ==========================================
         # 1. BUSCAR O CREAR COMPRADOR
         # ==========================================
@@ -149,24 +227,19 @@ def procesar_checkout(slug):
         if direccion_data and direccion_data.get('direccion_completa'):
             print("📍 Procesando dirección...")
             
-            # Buscar si existe una dirección similar
-            direcciones_existentes = comprador.direcciones.filter_by(activo=True).all()
-            
-            for d in direcciones_existentes:
-                if (d.direccion_completa.lower().strip() == 
-                    direccion_data.get('direccion_completa', '').lower().strip()):
-                    direccion = d
-                    print(f"✅ Dirección existente encontrada: {direccion.id_direccion}")
-                    break
+            # El comprador nuevo necesita id antes del upsert
+            if comprador.id_comprador is None:
+                db.session.flush()
             
-            if not direccion:
-                # Crear nueva dirección usando el factory method del modelo
-                direccion = DireccionComprador.crear_desde_checkout(
-                    comprador_id=comprador.id_comprador,
-                    direccion_data=direccion_data
-                )
-                db.session.add(direccion)
-                print(f"✅ Nueva dirección creada")
+            # Reusar (mismo hash normalizado) o crear en un solo INSERT ... ON CONFLICT
+            direccion, creada = DireccionComprador.obtener_o_crear_desde_checkout(
+                comprador_id=comprador.id_comprador,
+                direccion_data=direccion_data
+            )
+            if creada:
+                print(f"✅ Nueva dirección creada: {direccion.id_direccion}")
+            else:
+                print(f"✅ Dirección existente encontrada: {direccion.id_direccion}")
         
         # ==========================================
         # 3. CREAR PEDIDO
@@ -186,17 +259,35 @@ def procesar_checkout(slug):
             direccion=direccion,
             negocio_data=negocio_data,
             productos=productos,
-            subtotal=data.get('subtotal', 0),
-            costo_envio=data.get('costo_envio', 0),
-            total=data.get('total', 0),
+            subtotal=subtotal,
+            costo_envio=costo_envio,
+            total=total,
             metodo_pago=data.get('metodo_pago', 'efectivo'),
             notas_cliente=data.get('notas'),
             metodo_contacto='whatsapp',
-            origen='web'
+            origen='web',
+            codigo=codigo_pedido
         )
         
         print(f"✅ Pedido creado: {pedido.codigo_pedido}")
         
+        # Unidades vendidas por producto (desde las líneas normalizadas)
+        db.session.flush()
+        PedidoItem.ajustar_total_ventas(pedido.id_pedido)
+        
+        # ==========================================
+        # 3B. RESERVAR STOCK (UPDATE ... WHERE stock >= cantidad)
+        # ==========================================
+        sin_stock = ProductoCatalogo.reservar_stock(cantidades, nota=f"Pedido {pedido.codigo_pedido}")
+        if sin_stock:
+            db.session.rollback()
+            return jsonify({
+                'success': False,
+                'error': 'Stock insuficiente',
+                'productos_sin_stock': [{'producto_id': pid} for pid in sin_stock]
+            }), 409
+        pedido.stock_reservado = True
+        
         # ==========================================
         # ★ 4. CREAR NOTIFICACIÓN PARA LA CAMPANITA
         # ==========================================
@@ -213,6 +304,25 @@ def procesar_checkout(slug):
                 print(f"⚠️ Error creando notificación (no crítico): {notif_error}")
                 # No fallar el pedido por esto
         
+        # ==========================================
+        # 4B. ESTADÍSTICAS DIARIAS DE COMPRA (badges vende_rapido)
+        # ==========================================
+        try:
+            hoy = dia_colombia(datetime.datetime.utcnow())
+            with db.session.begin_nested():
+                ProductoEstadisticas.acumular([
+                    {
+                        'producto_id': int(p['producto_id']),
+                        'negocio_id': int(negocio_id),
+                        'fecha': hoy,
+                        'compras': int(p.get('cantidad', 1)),
+                        'ingresos': float(p.get('precio_unitario', 0)) * int(p.get('cantidad', 1))
+                    }
+                    for p in productos if p.get('producto_id')
+                ])
+        except Exception as stats_error:
+            print(f"⚠️ Error registrando estadísticas de compra (no crítico): {stats_error}")
+        
         # ==========================================
         # 5. GUARDAR TODO EN LA BASE DE DATOS
         # ==========================================
@@ -236,7 +346,9 @@ def procesar_checkout(slug):
                 'numero_pedido': pedido.codigo_pedido,
                 'codigo_pedido': pedido.codigo_pedido,
                 'negocio_id': negocio_id,
-                'total': float(data.get('total', 0)),
+                'subtotal': float(subtotal),
+                'costo_envio': float(costo_envio),
+                'total': float(total),
                 'estado': pedido.estado,
                 'fecha_creacion': pedido.fecha_pedido.isoformat()
             },
@@ -247,7 +359,7 @@ def procesar_checkout(slug):
         print(f"✅ Checkout completado: {pedido.codigo_pedido}")
         print(f"   Comprador: {comprador.nombre} (ID: {comprador.id_comprador})")
         print(f"   Token: {comprador.token_acceso}")
-        print(f"   Total: ${data.get('total', 0):,}")
+        print(f"   Total: ${total:,}")
         print(f"   🔔 Notificación: {'Sí' if notificacion_creada else 'No'}\n")
         
         return jsonify(response_data), 201
@@ -284,7 +396,7 @@ def test_checkout(slug):
         'success': True,
         'message': f'✅ Checkout funcionando para: {slug}',
         'endpoint': f'/api/tiendas/{slug}/checkout',
-        'version': '3.1',
+        'version': '3.2',
         'models': 'SQLAlchemy (Comprador, DireccionComprador, Pedido)',
         'notificaciones': TIENE_NOTIFICACIONES
     }), 200
@@ -296,13 +408,13 @@ def health():
     return jsonify({
         'status': 'online',
         'module': 'checkout_api',
-        'version': '3.1',
+        'version': '3.2',
         'database': 'SQLAlchemy',
         'notificaciones': TIENE_NOTIFICACIONES
     }), 200
 
 
-print("✅ Módulo checkout_api v3.1 cargado correctamente")
+print("✅ Módulo checkout_api v3.2 cargado correctamente")
 print("   Modelos utilizados:")
 print("   - Comprador (con token_acceso)")
 print("   - DireccionComprador")
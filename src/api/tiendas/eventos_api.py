@@ -0,0 +1,67 @@
+"""
+Eventos de Producto API - TuKomercio
+Recibe en lote las vistas y agregados al carrito de la tienda pública.
+Ruta: /api/tiendas/eventos
+"""
+
+from flask import Blueprint, request, jsonify
+from flask_cors import cross_origin
+from src.services.estadisticas_productos_services import TIPOS_EVENTO, buffer_eventos
+import logging
+
+logger = logging.getLogger(__name__)
+
+eventos_api_bp = Blueprint('eventos_api', __name__)
+
+MAX_EVENTOS_LOTE = 200
+MAX_CANTIDAD_EVENTO = 100
+
+
+@eventos_api_bp.route('/tiendas/eventos', methods=['POST', 'OPTIONS'])
+@cross_origin()
+def registrar_eventos():
+    """
+    POST /api/tiendas/eventos
+
+    Body:
+    {
+        "eventos": [
+            {"tipo": "vista", "producto_id": 40},
+            {"tipo": "carrito", "producto_id": 40, "cantidad": 2}
+        ]
+    }
+
+    Los eventos se acumulan en memoria y se escriben por lotes, así que la
+    respuesta no espera a la base de datos (salvo cuando toca vaciar).
+    """
+    if request.method == 'OPTIONS':
+        return '', 204
+
+    data = request.get_json(silent=True) or {}
+    eventos = data.get('eventos')
+    if not isinstance(eventos, list) or not eventos:
+        return jsonify({'success': False, 'error': 'eventos debe ser una lista no vacía'}), 400
+    if len(eventos) > MAX_EVENTOS_LOTE:
+        return jsonify({'success': False, 'error': f'Máximo {MAX_EVENTOS_LOTE} eventos por envío'}), 400
+
+    validos = []
+    for evento in eventos:
+        try:
+            campo = TIPOS_EVENTO[evento['tipo']]
+            producto_id = int(evento['producto_id'])
+            cantidad = max(1, min(int(evento.get('cantidad', 1)), MAX_CANTIDAD_EVENTO))
+            validos.append((producto_id, campo, cantidad))
+        except (KeyError, TypeError, ValueError):
+            continue
+
+    try:
+        buffer_eventos.agregar(validos)
+    except Exception as e:
+        logger.error(f"❌ Error registrando eventos de producto: {e}")
+        return jsonify({'success': False, 'error': 'No se pudieron registrar los eventos'}), 500
+
+    return jsonify({
+        'success': True,
+        'aceptados': len(validos),
+        'descartados': len(eventos) - len(validos)
+    }), 202
@@ -8,14 +8,22 @@ import logging
 from datetime import datetime
 from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
-from sqlalchemy import func
 from src.models.database import db
-from src.models.compradores.pedido import Pedido, PedidoHistorial
+from src.models.compradores.pedido import Pedido, PedidoHistorial, PedidoItem, PedidoResumenDiario
+from src.models.compradores.comprador import normalizar_correo, normalizar_telefono
+from src.models.colombia_data.contabilidad.operaciones_y_catalogo import dia_colombia, rango_utc_dias
+from src.models.notification import Notification
 
 logger = logging.getLogger(__name__)
 
 pedidos_api_bp = Blueprint('pedidos_api_bp', __name__, url_prefix='/api')
 
+LIMITE_MAX_PEDIDOS = 200
+ESTADOS_SIN_VENTA = ('cancelado', 'devuelto')
+ESTADOS_VENTA_CONFIRMADA = ('confirmado', 'preparando', 'enviado', 'entregado')
+MIN_CARACTERES_BUSQUEDA = 3
+MAX_PEDIDOS_MASIVO = 500
+
 
 # ==========================================
 # HELPER: Obtener User ID
@@ -38,42 +46,64 @@ def get_user_id():
 @cross_origin()
 def listar_pedidos(negocio_id):
     """
-    Lista todos los pedidos de un negocio.
+    Lista los pedidos de un negocio con paginación por cursor.
     
     GET /api/pedidos/negocio/{id}
     GET /api/pedidos/negocio/{id}?estado=pendiente
-    GET /api/pedidos/negocio/{id}?limit=50&offset=0
+    GET /api/pedidos/negocio/{id}?limit=50&cursor=<cursor_siguiente>
+    GET /api/pedidos/negocio/{id}?conteo=estimado   (exacto | estimado | ninguno)
+    
+    El total se calcula por defecto solo en la primera página. offset se
+    mantiene por compatibilidad, pero las páginas profundas deben usar cursor.
     """
     try:
         # Parámetros de filtro
         estado = request.args.get('estado')
-        limit = request.args.get('limit', 100, type=int)
+        limit = max(1, min(request.args.get('limit', 100, type=int), LIMITE_MAX_PEDIDOS))
         offset = request.args.get('offset', 0, type=int)
         orden = request.args.get('orden', 'desc')  # asc o desc
-        
-        # Query base
-        query = Pedido.query.filter_by(negocio_id=negocio_id)
-        
-        # Filtrar por estado
-        if estado and estado != 'todos':
-            query = query.filter_by(estado=estado)
-        
-        # Ordenar
-        if orden == 'asc':
-            query = query.order_by(Pedido.fecha_pedido.asc())
+        cursor = request.args.get('cursor')
+        conteo = request.args.get('conteo', 'ninguno' if cursor else 'exacto')
+        
+        if estado == 'todos':
+            estado = None
+        if estado and estado not in Pedido.ESTADOS:
+            return jsonify({"success": False, "error": f"Estado inválido. Válidos: {list(Pedido.ESTADOS.keys())}"}), 400
+        if conteo not in ('exacto', 'estimado', 'ninguno'):
+            return jsonify({"success": False, "error": "conteo debe ser exacto, estimado o ninguno"}), 400
+        try:
+            posicion = Pedido.decodificar_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        
+        if offset and not posicion:
+            # Compatibilidad: paginación por offset
+            query = Pedido.consulta_bandeja(negocio_id, estado)
+            if orden == 'asc':
+                query = query.order_by(Pedido.fecha_pedido.asc(), Pedido.id_pedido.asc())
+            else:
+                query = query.order_by(Pedido.fecha_pedido.desc(), Pedido.id_pedido.desc())
+            pedidos = query.offset(offset).limit(limit + 1).all()
+            hay_mas = len(pedidos) > limit
+            pedidos = pedidos[:limit]
         else:
-            query = query.order_by(Pedido.fecha_pedido.desc())
+            pedidos, hay_mas = Pedido.listar_keyset(
+                negocio_id, estado=estado, limite=limit, cursor=posicion, orden=orden
+            )
         
-        # Paginación
-        total = query.count()
-        pedidos = query.offset(offset).limit(limit).all()
+        total = None
+        if conteo != 'ninguno':
+            total = Pedido.contar_bandeja(negocio_id, estado, estimado=(conteo == 'estimado'))
         
         return jsonify({
             "success": True,
             "pedidos": [p.to_dict_lista() for p in pedidos],
             "total": total,
+            "total_estimado": conteo == 'estimado',
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "hay_mas": hay_mas,
+            "cursor_siguiente": Pedido.codificar_cursor(pedidos[-1]) if hay_mas else None
         }), 200
         
     except Exception as e:
@@ -170,6 +200,97 @@ def cambiar_estado_pedido(pedido_id):
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+# ==========================================
+# CAMBIAR ESTADO DE VARIOS PEDIDOS
+# ==========================================
+@pedidos_api_bp.route('/pedidos/negocio/<int:negocio_id>/estado-masivo', methods=['POST'])
+@cross_origin()
+def cambiar_estado_masivo(negocio_id):
+    """
+    Mueve varios pedidos a un estado en una sola transacción.
+    
+    POST /api/pedidos/negocio/{id}/estado-masivo
+    Body: { "pedidos": [101, 102, 103], "estado": "entregado", "comentario": "Ruta de la mañana" }
+    
+    La transición se valida por pedido (Pedido.TRANSICIONES); los que no
+    pueden moverse se reportan en resultados sin frenar a los demás.
+    """
+    try:
+        user_id = get_user_id()
+        data = request.get_json() or {}
+        
+        nuevo_estado = data.get('estado')
+        comentario = data.get('comentario')
+        pedido_ids = data.get('pedidos')
+        
+        if not nuevo_estado:
+            return jsonify({"success": False, "error": "Estado requerido"}), 400
+        if nuevo_estado not in Pedido.ESTADOS:
+            return jsonify({
+                "success": False,
+                "error": f"Estado inválido. Válidos: {list(Pedido.ESTADOS.keys())}"
+            }), 400
+        if not isinstance(pedido_ids, list) or not pedido_ids:
+            return jsonify({"success": False, "error": "pedidos debe ser una lista no vacía"}), 400
+        if len(pedido_ids) > MAX_PEDIDOS_MASIVO:
+            return jsonify({"success": False, "error": f"Máximo {MAX_PEDIDOS_MASIVO} pedidos por envío"}), 400
+        try:
+            pedido_ids = [int(pedido_id) for pedido_id in pedido_ids]
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "error": "Los ids de pedido deben ser enteros"}), 400
+        
+        movidos, rechazados = Pedido.cambiar_estado_masivo(
+            negocio_id, pedido_ids, nuevo_estado,
+            usuario_id=user_id, comentario=comentario
+        )
+        
+        if movidos:
+            Notification.crear_notificaciones_cambio_estado_lote(
+                negocio_id, movidos, nuevo_estado,
+                estado_label=Pedido.ESTADOS[nuevo_estado]['label']
+            )
+        
+        db.session.commit()
+        
+        resultados = [
+            {
+                "id": m['id'],
+                "codigo": m['codigo'],
+                "success": True,
+                "estado_anterior": m['estado_anterior'],
+                "estado": nuevo_estado
+            }
+            for m in movidos
+        ]
+        for pedido_id, estado_actual in rechazados.items():
+            resultados.append({
+                "id": pedido_id,
+                "success": False,
+                "estado": estado_actual,
+                "error": "Pedido no encontrado" if estado_actual is None
+                         else f"No se puede pasar de {estado_actual} a {nuevo_estado}"
+            })
+        
+        logger.info(f"Cambio masivo negocio {negocio_id} → {nuevo_estado}: "
+                    f"{len(movidos)} movidos, {len(rechazados)} rechazados")
+        
+        return jsonify({
+            "success": True,
+            "message": f"{len(movidos)} pedidos actualizados a: {nuevo_estado}",
+            "actualizados": len(movidos),
+            "rechazados": len(rechazados),
+            "resultados": resultados
+        }), 200
+        
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error en cambio masivo de estado: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
 # ==========================================
 # CANCELAR PEDIDO
 # ==========================================
@@ -313,66 +434,122 @@ def agregar_nota(pedido_id):
 @cross_origin()
 def estadisticas_pedidos(negocio_id):
     """
-    Obtiene estadísticas de pedidos del negocio.
+    Obtiene estadísticas de pedidos del negocio desde el rollup diario.
     
     GET /api/pedidos/negocio/{id}/stats
+    GET /api/pedidos/negocio/{id}/stats?desde=2026-01-01&hasta=2026-01-31
+    
+    desde/hasta son días en hora Colombia (inclusive) según la fecha del pedido;
+    sin rango se suman todos los pedidos. Con rango se incluye la serie diaria.
     """
     try:
-        # Contar por estado
-        stats_estado = db.session.query(
-            Pedido.estado,
-            func.count(Pedido.id_pedido).label('cantidad'),
-            func.sum(Pedido.total).label('total')
-        ).filter_by(
-            negocio_id=negocio_id
-        ).group_by(
-            Pedido.estado
-        ).all()
+        desde_str = request.args.get('desde')
+        hasta_str = request.args.get('hasta')
+        desde = datetime.strptime(desde_str, '%Y-%m-%d').date() if desde_str else None
+        hasta = datetime.strptime(hasta_str, '%Y-%m-%d').date() if hasta_str else None
+    except ValueError:
+        return jsonify({"success": False, "error": "Fechas inválidas (YYYY-MM-DD)"}), 400
+    if desde and hasta and desde > hasta:
+        return jsonify({"success": False, "error": "desde no puede ser posterior a hasta"}), 400
+    
+    try:
+        hoy = dia_colombia(datetime.utcnow())
+        filas = PedidoResumenDiario.filas(negocio_id, desde=desde, hasta=hasta)
         
         por_estado = {}
+        serie = {}
         total_pedidos = 0
         total_ventas = 0
         
-        for estado, cantidad, total in stats_estado:
-            por_estado[estado] = {
-                'cantidad': cantidad,
-                'total': float(total or 0)
-            }
+        for dia, estado, cantidad, total in filas:
+            acumulado = por_estado.setdefault(estado, {'cantidad': 0, 'total': 0.0})
+            acumulado['cantidad'] += cantidad
+            acumulado['total'] += float(total or 0)
             total_pedidos += cantidad
-            if estado not in ['cancelado', 'devuelto']:
+            
+            dia_serie = serie.setdefault(dia, {'pedidos': 0, 'ventas': 0.0})
+            dia_serie['pedidos'] += cantidad
+            if estado not in ESTADOS_SIN_VENTA:
                 total_ventas += float(total or 0)
+                dia_serie['ventas'] += float(total or 0)
+        
+        # Pedidos y ventas de hoy (solo confirmados en adelante)
+        if (desde is None or desde <= hoy) and (hasta is None or hasta >= hoy):
+            filas_hoy = [f for f in filas if f.dia == hoy]
+        else:
+            filas_hoy = PedidoResumenDiario.filas(negocio_id, desde=hoy, hasta=hoy)
+        pedidos_hoy = sum(f.cantidad for f in filas_hoy)
+        ventas_hoy = sum(float(f.total or 0) for f in filas_hoy if f.estado in ESTADOS_VENTA_CONFIRMADA)
+        
+        stats = {
+            "total_pedidos": total_pedidos,
+            "total_ventas": total_ventas,
+            "por_estado": por_estado,
+            "hoy": {
+                "pedidos": pedidos_hoy,
+                "ventas": ventas_hoy
+            }
+        }
+        if desde or hasta:
+            stats["desde"] = desde_str
+            stats["hasta"] = hasta_str
+            stats["serie"] = [
+                {"dia": dia.isoformat(), **valores} for dia, valores in sorted(serie.items())
+            ]
         
-        # Pedidos de hoy
-        hoy = datetime.now().date()
-        pedidos_hoy = Pedido.query.filter(
-            Pedido.negocio_id == negocio_id,
-            func.date(Pedido.fecha_pedido) == hoy
-        ).count()
-        
-        # Ventas de hoy (solo confirmados/entregados)
-        ventas_hoy = db.session.query(
-            func.sum(Pedido.total)
-        ).filter(
-            Pedido.negocio_id == negocio_id,
-            func.date(Pedido.fecha_pedido) == hoy,
-            Pedido.estado.in_(['confirmado', 'preparando', 'enviado', 'entregado'])
-        ).scalar() or 0
+        return jsonify({"success": True, "stats": stats}), 200
+        
+    except Exception as e:
+        logger.error(f"Error en estadísticas: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+# ==========================================
+# VENTAS POR PRODUCTO / CATEGORÍA
+# ==========================================
+@pedidos_api_bp.route('/pedidos/negocio/<int:negocio_id>/ventas-productos', methods=['GET'])
+@cross_origin()
+def ventas_por_producto(negocio_id):
+    """
+    Más vendidos del negocio desde las líneas normalizadas (pedido_items).
+    
+    GET /api/pedidos/negocio/{id}/ventas-productos?agrupar=producto|categoria&desde=YYYY-MM-DD&hasta=YYYY-MM-DD&limite=20
+    Las fechas son días en hora Colombia (inclusive).
+    """
+    try:
+        agrupar = request.args.get('agrupar', 'producto')
+        if agrupar not in ('producto', 'categoria'):
+            return jsonify({"success": False, "error": "agrupar debe ser producto o categoria"}), 400
+        limite = max(1, min(request.args.get('limite', 20, type=int), 100))
+        
+        desde_str = request.args.get('desde')
+        hasta_str = request.args.get('hasta')
+        desde = datetime.strptime(desde_str, '%Y-%m-%d').date() if desde_str else None
+        hasta = datetime.strptime(hasta_str, '%Y-%m-%d').date() if hasta_str else None
+    except ValueError:
+        return jsonify({"success": False, "error": "Fechas inválidas (YYYY-MM-DD)"}), 400
+    
+    try:
+        inicio, fin = rango_utc_dias(desde, hasta)
+        filas = PedidoItem.resumen_ventas(negocio_id, desde=inicio, hasta=fin, agrupar=agrupar, limite=limite)
+        
+        resultados = []
+        for fila in filas:
+            d = dict(fila._mapping)
+            d['unidades'] = int(d['unidades'] or 0)
+            d['ingresos'] = float(d['ingresos'] or 0)
+            resultados.append(d)
         
         return jsonify({
             "success": True,
-            "stats": {
-                "total_pedidos": total_pedidos,
-                "total_ventas": total_ventas,
-                "por_estado": por_estado,
-                "hoy": {
-                    "pedidos": pedidos_hoy,
-                    "ventas": float(ventas_hoy)
-                }
-            }
+            "agrupar": agrupar,
+            "desde": desde_str,
+            "hasta": hasta_str,
+            "resultados": resultados
         }), 200
         
     except Exception as e:
-        logger.error(f"Error en estadísticas: {e}")
+        logger.error(f"Error en ventas por producto: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
 
@@ -416,42 +593,62 @@ def historial_pedido(pedido_id):
 @cross_origin()
 def buscar_pedido():
     """
-    Busca un pedido por código o teléfono del cliente.
+    Busca pedidos por código, teléfono, correo o nombre del cliente.
     
     GET /api/pedidos/buscar?codigo=PED-2024-0001
-    GET /api/pedidos/buscar?telefono=3001234567&negocio_id=4
+    GET /api/pedidos/buscar?codigo=0001&negocio_id=4          (código parcial)
+    GET /api/pedidos/buscar?telefono=+57 300 123 4567&negocio_id=4
+    GET /api/pedidos/buscar?correo=juan@email.com&negocio_id=4
+    GET /api/pedidos/buscar?nombre=juan&negocio_id=4
+    
+    Todas las variantes usan índices: código exacto (único), teléfono y correo
+    normalizados, y trigramas para código parcial y nombre.
     """
     try:
-        codigo = request.args.get('codigo')
+        codigo = (request.args.get('codigo') or '').strip()
         telefono = request.args.get('telefono')
+        correo = request.args.get('correo')
+        nombre = (request.args.get('nombre') or '').strip()
         negocio_id = request.args.get('negocio_id', type=int)
         
         if codigo:
-            pedido = Pedido.query.filter_by(codigo_pedido=codigo).first()
+            pedido = Pedido.query.filter_by(codigo_pedido=codigo.upper()).first()
             if pedido:
                 return jsonify({
                     "success": True,
                     "pedido": pedido.to_dict()
                 }), 200
-            else:
+            if not negocio_id or len(codigo) < MIN_CARACTERES_BUSQUEDA:
                 return jsonify({"success": False, "error": "Pedido no encontrado"}), 404
         
-        if telefono:
-            query = Pedido.query.filter(
-                Pedido.datos_comprador['telefono'].astext == telefono
-            )
-            if negocio_id:
-                query = query.filter_by(negocio_id=negocio_id)
-            
-            pedidos = query.order_by(Pedido.fecha_pedido.desc()).limit(10).all()
-            
+        if telefono and not normalizar_telefono(telefono):
+            return jsonify({"success": False, "error": "Teléfono inválido"}), 400
+        if correo and not normalizar_correo(correo):
+            return jsonify({"success": False, "error": "Correo inválido"}), 400
+        
+        if nombre and (not negocio_id or len(nombre) < MIN_CARACTERES_BUSQUEDA):
             return jsonify({
-                "success": True,
-                "pedidos": [p.to_dict_lista() for p in pedidos],
-                "total": len(pedidos)
-            }), 200
+                "success": False,
+                "error": f"La búsqueda por nombre requiere negocio_id y al menos {MIN_CARACTERES_BUSQUEDA} letras"
+            }), 400
+        
+        if not (codigo or telefono or correo or nombre):
+            return jsonify({"success": False, "error": "Proporciona código, teléfono, correo o nombre"}), 400
         
-        return jsonify({"success": False, "error": "Proporciona código o teléfono"}), 400
+        pedidos = Pedido.buscar(
+            negocio_id=negocio_id,
+            telefono=telefono,
+            correo=correo,
+            nombre=nombre or None,
+            codigo_parcial=codigo or None,
+            limite=10
+        )
+        
+        return jsonify({
+            "success": True,
+            "pedidos": [p.to_dict_lista() for p in pedidos],
+            "total": len(pedidos)
+        }), 200
         
     except Exception as e:
         logger.error(f"Error buscando pedido: {e}")
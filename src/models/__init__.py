@@ -12,7 +12,7 @@ from src.models.database import db, init_app, DATABASE_URL
 # ==========================================
 from .usuarios import Usuario
 from .servicio import Servicio
-from .notification import Notification
+from .notification import Notification, NotificacionNoLeidas
 from .message import Message
 from .etapa import Etapa
 from .foto import Foto
@@ -61,13 +61,18 @@ from src.models.colombia_data.monetization_management import MonetizationManagem
 # ==========================================
 from src.models.compradores.comprador import Comprador
 from src.models.compradores.direccion import DireccionComprador
-from src.models.compradores.pedido import Pedido, PedidoHistorial
+from src.models.compradores.pedido import Pedido, PedidoHistorial, PedidoItem, PedidoResumenDiario
 
 # ==========================================
 # MODELO DE RECUPERACIÓN DE CONTRASEÑA
 # ==========================================
 from .password_reset_token import PasswordResetToken
 
+# ==========================================
+# CONTADORES DE SECUENCIA
+# ==========================================
+from .contador_secuencia import ContadorSecuencia
+
 # ==========================================
 # MODELOS DE ADMINISTRACIÓN
 # ==========================================
@@ -86,6 +91,7 @@ __all__ = [
     "Usuario",
     "Servicio",
     "Notification",
+    "NotificacionNoLeidas",
     "Message",
     "Etapa",
     "Foto",
@@ -124,10 +130,15 @@ __all__ = [
     "DireccionComprador",
     "Pedido",
     "PedidoHistorial",
+    "PedidoItem",
+    "PedidoResumenDiario",
     
     # Password Reset
     "PasswordResetToken",
     
+    # Contadores
+    "ContadorSecuencia",
+    
     # Administración
     "Administrador"
 ]
\ No newline at end of file
@@ -6,9 +6,33 @@ ACTUALIZADO: Inventario PRO v2.3 - Sistema de Badges con badges_data JSON
 
 import sqlalchemy as sa
 from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from src.models.database import db
 from datetime import datetime, timedelta
+from decimal import Decimal
 import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Colombia no tiene horario de verano: UTC-5 fijo
+OFFSET_COLOMBIA = timedelta(hours=-5)
+
+
+def dia_colombia(fecha_utc):
+    """Día calendario en Colombia de una fecha guardada en UTC."""
+    return (fecha_utc + OFFSET_COLOMBIA).date()
+
+
+def rango_utc_dias(desde=None, hasta=None):
+    """
+    Convierte días calendario de Colombia (inclusive) a límites UTC naive
+    [inicio, fin) comparables con las columnas fecha. None deja el extremo abierto.
+    """
+    inicio = datetime.combine(desde, datetime.min.time()) - OFFSET_COLOMBIA if desde else None
+    fin = datetime.combine(hasta + timedelta(days=1), datetime.min.time()) - OFFSET_COLOMBIA if hasta else None
+    return inicio, fin
 
 
 # ==========================================
@@ -20,8 +44,17 @@ class TransaccionOperativa(db.Model):
     Almacena VENTAS, COMPRAS, GASTOS e INGRESOS.
     """
     __tablename__ = 'transacciones_operativas'
+    __table_args__ = (
+        # Reporte paginado por keyset (fecha, id_transaccion), con y sin filtro de tipo
+        sa.Index('ix_transacciones_negocio_fecha_id', 'negocio_id', 'fecha', 'id_transaccion'),
+        sa.Index('ix_transacciones_negocio_tipo_fecha_id', 'negocio_id', 'tipo', 'fecha', 'id_transaccion'),
+        # Particionada por mes sobre fecha (ver asegurar_particiones_transacciones).
+        # La PK debe incluir la llave de partición; la idempotencia de id_cliente
+        # vive en transacciones_id_cliente porque un índice único aquí también la necesitaría.
+        {'postgresql_partition_by': 'RANGE (fecha)'}
+    )
 
-    id_transaccion = sa.Column(sa.Integer, primary_key=True)
+    id_transaccion = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
     
     negocio_id = sa.Column(
         sa.Integer,
@@ -48,8 +81,9 @@ class TransaccionOperativa(db.Model):
     categoria = sa.Column(sa.String(100), index=True)
     metodo_pago = sa.Column(sa.String(50))
     referencia_guia = sa.Column(sa.String(100))
-    fecha = sa.Column(sa.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    fecha = sa.Column(sa.DateTime, default=datetime.utcnow, nullable=False, index=True, primary_key=True)
     notas = sa.Column(sa.Text, nullable=True)
+    id_cliente = sa.Column(sa.String(64), nullable=True)  # ID generado por el POS offline
 
     negocio = relationship("Negocio", foreign_keys=[negocio_id])
     usuario = relationship("Usuario", foreign_keys=[usuario_id])
@@ -66,6 +100,7 @@ class TransaccionOperativa(db.Model):
         self.metodo_pago = kwargs.get('metodo_pago', 'Efectivo')
         self.referencia_guia = kwargs.get('referencia_guia')
         self.notas = kwargs.get('notas')
+        self.id_cliente = kwargs.get('id_cliente')
 
     def to_dict(self):
         return {
@@ -83,7 +118,8 @@ class TransaccionOperativa(db.Model):
             "fecha": self.fecha.strftime('%Y-%m-%d %H:%M:%S') if self.fecha else None,
             "negocio_id": self.negocio_id,
             "usuario_id": self.usuario_id,
-            "sucursal_id": self.sucursal_id
+            "sucursal_id": self.sucursal_id,
+            "id_cliente": self.id_cliente
         }
     
     def serialize(self):
@@ -93,12 +129,314 @@ class TransaccionOperativa(db.Model):
         return f'<Transaccion {self.tipo} - ${self.monto} - {self.concepto[:30]}>'
 
 
+# ==========================================
+# PARTICIONES MENSUALES DE TRANSACCIONES
+# ==========================================
+PARTICIONES_MESES_ADELANTE = 3
+PARTICION_TRANSACCIONES_DEFAULT = 'transacciones_operativas_default'
+
+
+def _inicio_mes(fecha):
+    return fecha.replace(day=1)
+
+
+def _mes_siguiente(inicio_mes):
+    return (inicio_mes + timedelta(days=32)).replace(day=1)
+
+
+def nombre_particion_transacciones(inicio_mes):
+    return f"transacciones_operativas_p{inicio_mes.year:04d}_{inicio_mes.month:02d}"
+
+
+def transacciones_particionada(conn):
+    """True si transacciones_operativas ya es una tabla particionada."""
+    return conn.execute(sa.text("""
+        SELECT 1 FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = 'transacciones_operativas'
+    """)).first() is not None
+
+
+def asegurar_particiones_transacciones(conn=None, meses_adelante=PARTICIONES_MESES_ADELANTE, desde=None):
+    """
+    Crea las particiones mensuales que falten desde el mes de `desde` (por defecto
+    el actual, en UTC) hasta `meses_adelante` meses después. Idempotente.
+    `conn` puede ser una Connection o la sesión; devuelve los nombres creados.
+    """
+    conn = conn if conn is not None else db.session
+    if not transacciones_particionada(conn):
+        return []
+
+    existentes = set(conn.execute(sa.text("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = 'transacciones_operativas'
+    """)).scalars())
+
+    creadas = []
+    base = desde or datetime.utcnow()
+    mes = _inicio_mes(base.date() if isinstance(base, datetime) else base)
+    for _ in range(meses_adelante + 1):
+        siguiente = _mes_siguiente(mes)
+        nombre = nombre_particion_transacciones(mes)
+        if nombre not in existentes:
+            # Savepoint: si la partición DEFAULT ya tiene filas del rango, solo se omite ese mes
+            try:
+                with conn.begin_nested():
+                    conn.execute(sa.text(
+                        f"CREATE TABLE IF NOT EXISTS {nombre} PARTITION OF transacciones_operativas "
+                        f"FOR VALUES FROM ('{mes.isoformat()}') TO ('{siguiente.isoformat()}')"
+                    ))
+                creadas.append(nombre)
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo crear la partición {nombre}: {e}")
+        mes = siguiente
+    return creadas
+
+
+def desprender_particiones_transacciones(antes_de, conn=None):
+    """
+    Archivado: desprende (DETACH) las particiones mensuales que terminan antes de
+    `antes_de` (date). Las tablas quedan intactas fuera del padre para exportarlas
+    o eliminarlas; el rollup diario conserva sus totales. Devuelve los nombres.
+    """
+    conn = conn if conn is not None else db.session
+    limite = _inicio_mes(antes_de)
+    particiones = conn.execute(sa.text("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = 'transacciones_operativas'
+          AND c.relname LIKE 'transacciones_operativas_p%'
+    """)).scalars().all()
+
+    desprendidas = []
+    for nombre in sorted(particiones):
+        anio, mes = nombre.rsplit('_p', 1)[1].split('_')
+        if _mes_siguiente(datetime(int(anio), int(mes), 1).date()) <= limite:
+            conn.execute(sa.text(f"ALTER TABLE transacciones_operativas DETACH PARTITION {nombre}"))
+            desprendidas.append(nombre)
+    return desprendidas
+
+
+@sa.event.listens_for(TransaccionOperativa.__table__, 'after_create')
+def _crear_particiones_iniciales(target, connection, **kw):
+    """Con db.create_all la tabla nace particionada: crea DEFAULT y los meses próximos."""
+    if connection.dialect.name != 'postgresql':
+        return
+    connection.execute(sa.text(
+        f"CREATE TABLE IF NOT EXISTS {PARTICION_TRANSACCIONES_DEFAULT} "
+        f"PARTITION OF transacciones_operativas DEFAULT"
+    ))
+    asegurar_particiones_transacciones(connection)
+
+
+# ==========================================
+# MODELO: REGISTRO DE ID_CLIENTE (IDEMPOTENCIA POS)
+# ==========================================
+class TransaccionIdCliente(db.Model):
+    """
+    Una fila por operación del POS offline ya aplicada: (negocio_id, id_cliente).
+    Tabla pequeña sin particionar que garantiza la aplicación única de cada
+    operación sincronizada, sin importar la fecha que traiga.
+    """
+    __tablename__ = 'transacciones_id_cliente'
+
+    negocio_id = sa.Column(
+        sa.Integer,
+        sa.ForeignKey('negocios.id_negocio', ondelete='CASCADE'),
+        primary_key=True
+    )
+    id_cliente = sa.Column(sa.String(64), primary_key=True)
+    id_transaccion = sa.Column(sa.Integer, nullable=True)
+    fecha = sa.Column(sa.DateTime, nullable=True)  # llave de partición de la transacción
+    fecha_registro = sa.Column(sa.DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        return {
+            "negocio_id": self.negocio_id,
+            "id_cliente": self.id_cliente,
+            "id_transaccion": self.id_transaccion,
+            "fecha": self.fecha.isoformat() if self.fecha else None
+        }
+
+
+# ==========================================
+# MODELO: RESUMEN FINANCIERO DIARIO (ROLLUP)
+# ==========================================
+class ResumenFinancieroDiario(db.Model):
+    """
+    Agregado diario de transacciones_operativas (cantidad y suma de montos).
+    Se mantiene de forma incremental desde el camino de escritura con
+    INSERT ... ON CONFLICT DO UPDATE; reconstruir() lo recalcula desde cero.
+    El día se calcula en hora de Colombia.
+    """
+    __tablename__ = 'resumen_financiero_diario'
+    __table_args__ = (
+        sa.UniqueConstraint(
+            'negocio_id', 'dia', 'sucursal_id', 'tipo', 'categoria', 'metodo_pago',
+            name='uq_resumen_financiero_diario'
+        ),
+    )
+    
+    id = sa.Column(sa.Integer, primary_key=True)
+    negocio_id = sa.Column(
+        sa.Integer,
+        sa.ForeignKey('negocios.id_negocio', ondelete='CASCADE'),
+        nullable=False
+    )
+    # Sin FK y NOT NULL (0 = sin sucursal) para que la clave única funcione con ON CONFLICT
+    sucursal_id = sa.Column(sa.Integer, nullable=False, default=0)
+    dia = sa.Column(sa.Date, nullable=False)
+    tipo = sa.Column(sa.String(50), nullable=False)
+    categoria = sa.Column(sa.String(100), nullable=False, default='')
+    metodo_pago = sa.Column(sa.String(50), nullable=False, default='')
+    cantidad = sa.Column(sa.Integer, nullable=False, default=0)
+    total = sa.Column(sa.Numeric(15, 2), nullable=False, default=0)
+    
+    @classmethod
+    def acumular(cls, transacciones):
+        """
+        Suma al rollup un lote de transacciones (objetos TransaccionOperativa o dicts)
+        dentro de la transacción de BD actual. Un solo statement por lote.
+        """
+        def valor(t, campo):
+            return t.get(campo) if isinstance(t, dict) else getattr(t, campo, None)
+        
+        grupos = {}
+        for t in transacciones:
+            clave = (
+                valor(t, 'negocio_id'),
+                dia_colombia(valor(t, 'fecha') or datetime.utcnow()),
+                valor(t, 'sucursal_id') or 0,
+                (valor(t, 'tipo') or '').upper(),
+                valor(t, 'categoria') or '',
+                valor(t, 'metodo_pago') or ''
+            )
+            cantidad, total = grupos.get(clave, (0, Decimal('0')))
+            grupos[clave] = (cantidad + 1, total + Decimal(str(valor(t, 'monto') or 0)))
+        
+        if not grupos:
+            return 0
+        
+        # Orden fijo de claves para evitar deadlocks entre escrituras concurrentes
+        filas = [
+            {
+                'negocio_id': k[0], 'dia': k[1], 'sucursal_id': k[2], 'tipo': k[3],
+                'categoria': k[4], 'metodo_pago': k[5], 'cantidad': v[0], 'total': v[1]
+            }
+            for k, v in sorted(grupos.items(), key=lambda kv: tuple(str(x) for x in kv[0]))
+        ]
+        tabla = cls.__table__
+        stmt = pg_insert(tabla).values(filas)
+        stmt = stmt.on_conflict_do_update(
+            constraint='uq_resumen_financiero_diario',
+            set_={
+                'cantidad': tabla.c.cantidad + stmt.excluded.cantidad,
+                'total': tabla.c.total + stmt.excluded.total
+            }
+        )
+        db.session.execute(stmt)
+        return len(filas)
+    
+    @classmethod
+    def reconstruir(cls, negocio_id=None):
+        """
+        Recalcula el rollup desde transacciones_operativas (backfill).
+        Bloquea escrituras concurrentes al rollup mientras dura la transacción,
+        para que ninguna transacción quede contada dos veces ni se pierda.
+        """
+        db.session.execute(sa.text(
+            "LOCK TABLE resumen_financiero_diario IN SHARE ROW EXCLUSIVE MODE"
+        ))
+        filtro = "WHERE negocio_id = :negocio_id" if negocio_id else ""
+        params = {'negocio_id': negocio_id} if negocio_id else {}
+        
+        db.session.execute(sa.text(f"DELETE FROM resumen_financiero_diario {filtro}"), params)
+        resultado = db.session.execute(sa.text(f"""
+            INSERT INTO resumen_financiero_diario
+                (negocio_id, dia, sucursal_id, tipo, categoria, metodo_pago, cantidad, total)
+            SELECT negocio_id,
+                   CAST(fecha - INTERVAL '5 hours' AS DATE) AS dia,
+                   COALESCE(sucursal_id, 0),
+                   UPPER(tipo),
+                   COALESCE(categoria, ''),
+                   COALESCE(metodo_pago, ''),
+                   COUNT(*),
+                   COALESCE(SUM(monto), 0)
+            FROM transacciones_operativas
+            {filtro}
+            GROUP BY 1, 2, 3, 4, 5, 6
+        """), params)
+        return resultado.rowcount
+    
+    @classmethod
+    def totales_por_tipo(cls, negocio_id, desde=None, hasta=None, sucursal_id=None):
+        """Devuelve [(tipo, cantidad, total)] del rango de días (inclusive)."""
+        query = db.session.query(
+            cls.tipo,
+            sa.func.sum(cls.cantidad),
+            sa.func.sum(cls.total)
+        ).filter(cls.negocio_id == negocio_id)
+        if desde:
+            query = query.filter(cls.dia >= desde)
+        if hasta:
+            query = query.filter(cls.dia <= hasta)
+        if sucursal_id:
+            query = query.filter(cls.sucursal_id == sucursal_id)
+        return query.group_by(cls.tipo).all()
+    
+    @classmethod
+    def serie_diaria(cls, negocio_id, desde=None, hasta=None, sucursal_id=None):
+        """Devuelve [(dia, tipo, cantidad, total)] ordenado por día."""
+        query = db.session.query(
+            cls.dia,
+            cls.tipo,
+            sa.func.sum(cls.cantidad),
+            sa.func.sum(cls.total)
+        ).filter(cls.negocio_id == negocio_id)
+        if desde:
+            query = query.filter(cls.dia >= desde)
+        if hasta:
+            query = query.filter(cls.dia <= hasta)
+        if sucursal_id:
+            query = query.filter(cls.sucursal_id == sucursal_id)
+        return query.group_by(cls.dia, cls.tipo).order_by(cls.dia).all()
+    
+    def to_dict(self):
+        return {
+            "negocio_id": self.negocio_id,
+            "sucursal_id": self.sucursal_id or None,
+            "dia": self.dia.isoformat() if self.dia else None,
+            "tipo": self.tipo,
+            "categoria": self.categoria,
+            "metodo_pago": self.metodo_pago,
+            "cantidad": self.cantidad,
+            "total": float(self.total or 0)
+        }
+
+
 # ==========================================
 # MODELO: ALERTA OPERATIVA
 # ==========================================
 class AlertaOperativa(db.Model):
     """Modelo para alertas de stock crítico y recordatorios."""
     __tablename__ = 'alertas_operativas'
+    __table_args__ = (
+        # Listado de pendientes/vencidas por negocio
+        sa.Index(
+            'ix_alertas_negocio_pendientes',
+            'negocio_id', 'fecha_programada',
+            postgresql_where=sa.text('completada = false')
+        ),
+        # Worker de vencimientos: solo las que aún no se han notificado
+        sa.Index(
+            'ix_alertas_por_notificar',
+            'fecha_programada',
+            postgresql_where=sa.text('completada = false AND fecha_notificada IS NULL')
+        ),
+    )
     
     id_alerta = sa.Column(sa.Integer, primary_key=True)
     
@@ -120,6 +458,7 @@ class AlertaOperativa(db.Model):
     completada = sa.Column(sa.Boolean, default=False, nullable=False)
     fecha_programada = sa.Column(sa.DateTime, nullable=False)
     fecha_completada = sa.Column(sa.DateTime, nullable=True)
+    fecha_notificada = sa.Column(sa.DateTime, nullable=True)
     fecha_creacion = sa.Column(sa.DateTime, default=datetime.utcnow, nullable=False)
     
     negocio = relationship("Negocio", foreign_keys=[negocio_id])
@@ -129,6 +468,56 @@ class AlertaOperativa(db.Model):
         self.completada = True
         self.fecha_completada = datetime.utcnow()
     
+    @property
+    def vencida(self):
+        return not self.completada and self.fecha_programada is not None \
+            and self.fecha_programada <= datetime.utcnow()
+    
+    @classmethod
+    def procesar_vencidas(cls, limite=200):
+        """
+        Toma un lote de alertas vencidas sin notificar (FOR UPDATE SKIP LOCKED,
+        así varios workers no se pisan), crea una notificación 'recordatorio'
+        por cada una, la publica a los streams abiertos y las marca como
+        notificadas. El commit es del llamador. Devuelve la cantidad procesada.
+        """
+        from src.models.colombia_data.negocio import Negocio
+        from src.models.notification import Notification
+
+        ahora = datetime.utcnow()
+        filas = db.session.query(cls, Negocio.usuario_id).join(
+            Negocio, Negocio.id_negocio == cls.negocio_id
+        ).filter(
+            cls.completada.is_(False),
+            cls.fecha_notificada.is_(None),
+            cls.fecha_programada <= ahora
+        ).order_by(cls.fecha_programada.asc()).limit(limite).with_for_update(
+            of=cls, skip_locked=True
+        ).all()
+
+        nuevas = []
+        for alerta, dueno_id in filas:
+            nuevas.append(Notification(
+                user_id=alerta.usuario_id or dueno_id,
+                negocio_id=alerta.negocio_id,
+                type='recordatorio',
+                titulo=f'Alerta: {alerta.tarea[:80]}',
+                message=alerta.tarea,
+                referencia_tipo='alerta',
+                referencia_id=alerta.id_alerta,
+                prioridad='alta' if (alerta.prioridad or '').upper() == 'ALTA' else 'media',
+                extra_data={
+                    'tipo_alerta': alerta.tipo,
+                    'prioridad': alerta.prioridad,
+                    'fecha_programada': alerta.fecha_programada.isoformat()
+                }
+            ))
+            alerta.fecha_notificada = ahora
+
+        db.session.add_all(nuevas)
+        Notification.publicar(nuevas)
+        return len(filas)
+    
     def to_dict(self):
         return {
             "id": self.id_alerta,
@@ -138,7 +527,9 @@ class AlertaOperativa(db.Model):
             "completada": self.completada,
             "fecha_programada": self.fecha_programada.isoformat() if self.fecha_programada else None,
             "fecha_completada": self.fecha_completada.isoformat() if self.fecha_completada else None,
+            "fecha_notificada": self.fecha_notificada.isoformat() if self.fecha_notificada else None,
             "fecha_creacion": self.fecha_creacion.isoformat() if self.fecha_creacion else None,
+            "vencida": self.vencida,
             "negocio_id": self.negocio_id,
             "usuario_id": self.usuario_id
         }
@@ -268,6 +659,80 @@ class ProductoEstadisticas(db.Model):
     ingresos = sa.Column(sa.Numeric(12, 2), default=0)
     created_at = sa.Column(sa.DateTime, default=datetime.utcnow)
     
+    CONTADORES = ('visitas', 'agregados_carrito', 'compras', 'ingresos')
+    
+    @classmethod
+    def acumular(cls, filas, conn=None):
+        """
+        Suma contadores a las filas diarias con un único INSERT ... ON CONFLICT DO UPDATE.
+        `filas`: dicts con producto_id, negocio_id, fecha y cualquiera de CONTADORES.
+        """
+        acumulado = {}
+        for f in filas:
+            clave = (f['producto_id'], f['fecha'])
+            actual = acumulado.setdefault(clave, {
+                'producto_id': f['producto_id'],
+                'negocio_id': f['negocio_id'],
+                'fecha': f['fecha'],
+                'visitas': 0,
+                'agregados_carrito': 0,
+                'compras': 0,
+                'ingresos': Decimal('0')
+            })
+            for campo in cls.CONTADORES:
+                if f.get(campo):
+                    actual[campo] += Decimal(str(f[campo])) if campo == 'ingresos' else int(f[campo])
+        if not acumulado:
+            return 0
+        
+        # Orden estable de llaves para que dos flushes concurrentes no se bloqueen en cruz
+        valores = [acumulado[k] for k in sorted(acumulado)]
+        stmt = pg_insert(cls.__table__).values(valores)
+        stmt = stmt.on_conflict_do_update(
+            constraint='uq_producto_fecha',
+            set_={
+                campo: sa.func.coalesce(getattr(cls.__table__.c, campo), 0) + getattr(stmt.excluded, campo)
+                for campo in cls.CONTADORES
+            }
+        )
+        (conn if conn is not None else db.session).execute(stmt)
+        return len(valores)
+    
+    @classmethod
+    def recalcular_ventanas(cls, negocio_id=None, hoy=None):
+        """
+        Recalcula en una sola sentencia visitas_7_dias, ventas_30_dias y
+        velocidad_venta (unidades/día en 30 días) de todos los productos.
+        Solo escribe las filas cuyo valor cambia. Devuelve las filas actualizadas.
+        """
+        hoy = hoy or dia_colombia(datetime.utcnow())
+        resultado = db.session.execute(sa.text("""
+            UPDATE productos_catalogo p
+            SET visitas_7_dias = v.visitas_7,
+                ventas_30_dias = v.ventas_30,
+                velocidad_venta = v.velocidad
+            FROM (
+                SELECT pc.id_producto,
+                       COALESCE(s.visitas_7, 0) AS visitas_7,
+                       COALESCE(s.ventas_30, 0) AS ventas_30,
+                       LEAST(ROUND(COALESCE(s.ventas_30, 0) / 30.0, 2), 999.99) AS velocidad
+                FROM productos_catalogo pc
+                LEFT JOIN (
+                    SELECT producto_id,
+                           SUM(visitas) FILTER (WHERE fecha > :hoy - 7) AS visitas_7,
+                           SUM(compras) AS ventas_30
+                    FROM producto_estadisticas
+                    WHERE fecha > :hoy - 30 AND fecha <= :hoy
+                    GROUP BY producto_id
+                ) s ON s.producto_id = pc.id_producto
+                WHERE (CAST(:negocio_id AS INTEGER) IS NULL OR pc.negocio_id = :negocio_id)
+            ) v
+            WHERE p.id_producto = v.id_producto
+              AND (p.visitas_7_dias, p.ventas_30_dias, p.velocidad_venta)
+                  IS DISTINCT FROM (v.visitas_7, v.ventas_30, v.velocidad)
+        """), {'hoy': hoy, 'negocio_id': negocio_id})
+        return resultado.rowcount
+    
     def to_dict(self):
         return {
             "id": self.id,
@@ -284,9 +749,12 @@ class ProductoEstadisticas(db.Model):
 # MODELO: HISTORIAL DE PRECIOS
 # ==========================================
 class ProductoPreciosHistorico(db.Model):
-    """Historial de precios para badge de 'precio más bajo'."""
+    """Historial de precios para badge de 'precio más bajo' (una fila por producto y día)."""
     __tablename__ = 'producto_precios_historico'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        sa.UniqueConstraint('producto_id', 'fecha', name='uq_precio_producto_fecha'),
+        {'extend_existing': True}
+    )
     
     id = sa.Column(sa.Integer, primary_key=True)
     producto_id = sa.Column(
@@ -305,6 +773,42 @@ class ProductoPreciosHistorico(db.Model):
     fecha = sa.Column(sa.Date, nullable=False, index=True)
     created_at = sa.Column(sa.DateTime, default=datetime.utcnow)
     
+    @classmethod
+    def registrar_lote(cls, productos):
+        """
+        Guarda el precio vigente de cada producto en la fila del día (Colombia):
+        un único INSERT ... ON CONFLICT DO UPDATE, el último cambio del día gana.
+        Los productos deben tener id (llamar después del flush).
+        """
+        ahora = datetime.utcnow()
+        hoy = dia_colombia(ahora)
+        filas = {}
+        for p in productos:
+            if p.id_producto is None or p.precio is None:
+                continue
+            filas[p.id_producto] = {
+                'producto_id': p.id_producto,
+                'negocio_id': p.negocio_id,
+                'precio': p.precio,
+                'precio_original': p.precio_original,
+                'fecha': hoy,
+                'created_at': ahora
+            }
+        if not filas:
+            return 0
+        
+        stmt = pg_insert(cls.__table__).values([filas[k] for k in sorted(filas)])
+        stmt = stmt.on_conflict_do_update(
+            constraint='uq_precio_producto_fecha',
+            set_={
+                'precio': stmt.excluded.precio,
+                'precio_original': stmt.excluded.precio_original,
+                'created_at': stmt.excluded.created_at
+            }
+        )
+        db.session.execute(stmt)
+        return len(filas)
+    
     def to_dict(self):
         return {
             "id": self.id,
@@ -321,7 +825,24 @@ class ProductoPreciosHistorico(db.Model):
 class ProductoReview(db.Model):
     """Reviews de productos para badge de 'mejor valorado'."""
     __tablename__ = 'producto_reviews'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Listado público: solo aprobadas, keyset (fecha, id) por producto
+        sa.Index(
+            'ix_reviews_producto_aprobadas',
+            'producto_id', 'fecha', 'id',
+            postgresql_where=sa.text('aprobado = true')
+        ),
+        # Cola de moderación: solo pendientes
+        sa.Index(
+            'ix_reviews_producto_pendientes',
+            'producto_id', 'fecha',
+            postgresql_where=sa.text('aprobado IS NULL')
+        ),
+        {'extend_existing': True}
+    )
+    
+    # aprobado: NULL = pendiente, True = aprobada, False = rechazada
+    ESTADOS_MODERACION = {'pendientes': None, 'aprobadas': True, 'rechazadas': False}
     
     id = sa.Column(sa.Integer, primary_key=True)
     producto_id = sa.Column(
@@ -341,10 +862,85 @@ class ProductoReview(db.Model):
     titulo = sa.Column(sa.String(150))
     comentario = sa.Column(sa.Text)
     verificado = sa.Column(sa.Boolean, default=False)
-    aprobado = sa.Column(sa.Boolean, default=False)
+    aprobado = sa.Column(sa.Boolean, nullable=True)
     fecha = sa.Column(sa.DateTime, default=datetime.utcnow)
     created_at = sa.Column(sa.DateTime, default=datetime.utcnow)
     
+    # ==========================================
+    # AGREGADOS INCREMENTALES EN EL PRODUCTO
+    # ==========================================
+    # Solo las reviews aprobadas cuentan. Cada transición hace un UPDATE
+    # condicional sobre la review (aprobado cambia de verdad o no pasa nada)
+    # y, si aplicó, un único UPDATE atómico con el delta sobre el producto.
+    @staticmethod
+    def _ajustar_agregados(producto_id, delta_suma, delta_total):
+        db.session.execute(sa.text("""
+            UPDATE productos_catalogo
+            SET rating_suma = COALESCE(rating_suma, 0) + :delta_suma,
+                total_reviews = COALESCE(total_reviews, 0) + :delta_total,
+                rating_promedio = CASE
+                    WHEN COALESCE(total_reviews, 0) + :delta_total > 0
+                    THEN ROUND(CAST(COALESCE(rating_suma, 0) + :delta_suma AS NUMERIC)
+                               / (COALESCE(total_reviews, 0) + :delta_total), 1)
+                    ELSE 0
+                END,
+                fecha_actualizacion = (clock_timestamp() AT TIME ZONE 'UTC')
+            WHERE id_producto = :producto_id
+        """), {'producto_id': producto_id, 'delta_suma': delta_suma, 'delta_total': delta_total})
+    
+    @classmethod
+    def aprobar(cls, id_review):
+        """Aprueba la review y suma su rating al producto. False si ya estaba aprobada."""
+        fila = db.session.execute(
+            sa.update(cls.__table__)
+            .where(cls.__table__.c.id == id_review, cls.__table__.c.aprobado.isnot(True))
+            .values(aprobado=True)
+            .returning(cls.__table__.c.producto_id, cls.__table__.c.rating)
+        ).first()
+        if not fila:
+            return False
+        cls._ajustar_agregados(fila.producto_id, fila.rating, 1)
+        return True
+    
+    @classmethod
+    def rechazar(cls, id_review):
+        """
+        Marca la review como rechazada (pendiente o aprobada). Solo resta su
+        rating del producto si estaba aprobada. False si ya estaba rechazada.
+        """
+        fila = db.session.execute(sa.text("""
+            UPDATE producto_reviews r
+            SET aprobado = false
+            FROM (SELECT id, aprobado FROM producto_reviews WHERE id = :id_review FOR UPDATE) previo
+            WHERE r.id = previo.id AND r.aprobado IS DISTINCT FROM false
+            RETURNING r.producto_id, r.rating, previo.aprobado AS estaba_aprobada
+        """), {'id_review': id_review}).first()
+        if not fila:
+            return False
+        if fila.estaba_aprobada:
+            cls._ajustar_agregados(fila.producto_id, -fila.rating, -1)
+        return True
+    
+    @property
+    def estado_moderacion(self):
+        if self.aprobado is None:
+            return 'pendiente'
+        return 'aprobada' if self.aprobado else 'rechazada'
+    
+    @classmethod
+    def eliminar(cls, id_review):
+        """Borra la review; si estaba aprobada la descuenta del producto."""
+        fila = db.session.execute(
+            sa.delete(cls.__table__)
+            .where(cls.__table__.c.id == id_review)
+            .returning(cls.__table__.c.producto_id, cls.__table__.c.rating, cls.__table__.c.aprobado)
+        ).first()
+        if not fila:
+            return False
+        if fila.aprobado:
+            cls._ajustar_agregados(fila.producto_id, -fila.rating, -1)
+        return True
+    
     def to_dict(self):
         return {
             "id": self.id,
@@ -355,10 +951,249 @@ class ProductoReview(db.Model):
             "comentario": self.comentario,
             "verificado": self.verificado,
             "aprobado": self.aprobado,
+            "estado_moderacion": self.estado_moderacion,
             "fecha": self.fecha.isoformat() if self.fecha else None
         }
 
 
+# ==========================================
+# MODELO: ESTADO DE PROCESOS BATCH (MARCAS DE AGUA)
+# ==========================================
+class EstadoProcesoBatch(db.Model):
+    """Última posición procesada por cada job incremental."""
+    __tablename__ = 'estado_procesos_batch'
+    
+    nombre = sa.Column(sa.String(50), primary_key=True)
+    ultimo_id = sa.Column(sa.BigInteger, nullable=False, default=0)
+    fecha_ejecucion = sa.Column(sa.DateTime, default=datetime.utcnow, nullable=False)
+    
+    @classmethod
+    def obtener_marca(cls, nombre):
+        """Lee y bloquea la marca de agua (un solo job a la vez)."""
+        db.session.execute(
+            pg_insert(cls.__table__).values(nombre=nombre, ultimo_id=0, fecha_ejecucion=datetime.utcnow())
+            .on_conflict_do_nothing(index_elements=['nombre'])
+        )
+        return db.session.execute(
+            sa.select(cls.__table__.c.ultimo_id).where(cls.__table__.c.nombre == nombre).with_for_update()
+        ).scalar()
+    
+    @classmethod
+    def guardar_marca(cls, nombre, ultimo_id):
+        db.session.execute(
+            sa.update(cls.__table__).where(cls.__table__.c.nombre == nombre)
+            .values(ultimo_id=ultimo_id, fecha_ejecucion=datetime.utcnow())
+        )
+
+
+# ==========================================
+# MODELO: CO-COMPRAS (PRODUCTOS RELACIONADOS)
+# ==========================================
+class ProductoCoocurrencia(db.Model):
+    """
+    Matriz dispersa de co-compra por negocio: cuántos pedidos contienen a la vez
+    producto_a y producto_b. La diagonal (a = b) guarda cuántos pedidos contienen
+    el producto, para normalizar el puntaje.
+    """
+    __tablename__ = 'productos_coocurrencia'
+    
+    producto_a = sa.Column(sa.Integer, primary_key=True)
+    producto_b = sa.Column(sa.Integer, primary_key=True)
+    negocio_id = sa.Column(sa.Integer, nullable=False)
+    conteo = sa.Column(sa.Integer, nullable=False, default=0)
+
+
+class ProductoRelacionado(db.Model):
+    """Top-K de productos comprados junto a cada producto (lectura directa por PK)."""
+    __tablename__ = 'productos_relacionados'
+    
+    PROCESO = 'productos_relacionados'
+    TOP_K = 12
+    # Un pedido más reciente que esto puede tener una transacción aún sin
+    # confirmar con id menor; la marca de agua no lo pasa hasta que madure
+    MARGEN_PEDIDOS_SEG = 300
+    
+    producto_id = sa.Column(
+        sa.Integer,
+        sa.ForeignKey('productos_catalogo.id_producto', ondelete='CASCADE'),
+        primary_key=True
+    )
+    posicion = sa.Column(sa.SmallInteger, primary_key=True)
+    relacionado_id = sa.Column(
+        sa.Integer,
+        sa.ForeignKey('productos_catalogo.id_producto', ondelete='CASCADE'),
+        nullable=False
+    )
+    puntaje = sa.Column(sa.Float, nullable=False)
+    conteo = sa.Column(sa.Integer, nullable=False)
+    
+    @classmethod
+    def procesar_pedidos(cls, desde_id, hasta_id, k=TOP_K):
+        """
+        Suma a la matriz los pedidos con id en (desde_id, hasta_id] y recalcula
+        el top-K solo de los productos afectados. Todo en SQL por conjuntos:
+        los ítems salen de pedido_items y se cruzan por pedido.
+        Devuelve la cantidad de productos cuyo top-K se recalculó.
+        """
+        params = {'desde_id': desde_id, 'hasta_id': hasta_id, 'k': k}
+        
+        # 1) Pares (a, b) por pedido, incluida la diagonal, sumados a la matriz
+        db.session.execute(sa.text("""
+            CREATE TEMP TABLE IF NOT EXISTS tmp_items_pedido (
+                id_pedido INTEGER, negocio_id INTEGER, producto_id INTEGER
+            ) ON COMMIT DROP
+        """))
+        db.session.execute(sa.text("TRUNCATE tmp_items_pedido"))
+        db.session.execute(sa.text("""
+            INSERT INTO tmp_items_pedido (id_pedido, negocio_id, producto_id)
+            SELECT DISTINCT i.pedido_id, i.negocio_id, i.producto_id
+            FROM pedido_items i
+            JOIN pedidos ped ON ped.id_pedido = i.pedido_id
+            JOIN productos_catalogo pc
+              ON pc.id_producto = i.producto_id AND pc.negocio_id = i.negocio_id
+            WHERE i.pedido_id > :desde_id AND i.pedido_id <= :hasta_id
+              AND ped.estado <> 'cancelado'
+        """), params)
+        
+        db.session.execute(sa.text("""
+            INSERT INTO productos_coocurrencia (producto_a, producto_b, negocio_id, conteo)
+            SELECT a.producto_id, b.producto_id, a.negocio_id, COUNT(*)
+            FROM tmp_items_pedido a
+            JOIN tmp_items_pedido b ON b.id_pedido = a.id_pedido
+            GROUP BY a.producto_id, b.producto_id, a.negocio_id
+            ORDER BY a.producto_id, b.producto_id
+            ON CONFLICT (producto_a, producto_b)
+            DO UPDATE SET conteo = productos_coocurrencia.conteo + EXCLUDED.conteo
+        """))
+        
+        # 2) Afectados: productos de los pedidos nuevos y sus vecinos (su
+        #    frecuencia cambió, así que cambia el puntaje en las listas vecinas)
+        db.session.execute(sa.text("""
+            CREATE TEMP TABLE IF NOT EXISTS tmp_afectados (producto_id INTEGER PRIMARY KEY) ON COMMIT DROP
+        """))
+        db.session.execute(sa.text("TRUNCATE tmp_afectados"))
+        db.session.execute(sa.text("""
+            INSERT INTO tmp_afectados (producto_id)
+            SELECT DISTINCT c.producto_a
+            FROM productos_coocurrencia c
+            WHERE c.producto_b IN (SELECT DISTINCT producto_id FROM tmp_items_pedido)
+            ON CONFLICT DO NOTHING
+        """))
+        
+        # 3) Top-K por similitud coseno: conteo / sqrt(frec_a * frec_b)
+        db.session.execute(sa.text("""
+            DELETE FROM productos_relacionados
+            WHERE producto_id IN (SELECT producto_id FROM tmp_afectados)
+        """))
+        db.session.execute(sa.text("""
+            INSERT INTO productos_relacionados (producto_id, posicion, relacionado_id, puntaje, conteo)
+            SELECT producto_a, posicion, producto_b, puntaje, conteo
+            FROM (
+                SELECT c.producto_a, c.producto_b, c.conteo,
+                       c.conteo / sqrt(CAST(fa.conteo AS FLOAT) * fb.conteo) AS puntaje,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY c.producto_a
+                           ORDER BY c.conteo / sqrt(CAST(fa.conteo AS FLOAT) * fb.conteo) DESC,
+                                    c.conteo DESC, c.producto_b
+                       ) AS posicion
+                FROM productos_coocurrencia c
+                JOIN tmp_afectados t ON t.producto_id = c.producto_a
+                JOIN productos_coocurrencia fa ON fa.producto_a = c.producto_a AND fa.producto_b = c.producto_a
+                JOIN productos_coocurrencia fb ON fb.producto_a = c.producto_b AND fb.producto_b = c.producto_b
+                JOIN productos_catalogo pb ON pb.id_producto = c.producto_b
+                WHERE c.producto_a <> c.producto_b
+            ) ranking
+            WHERE posicion <= :k
+        """), params)
+        
+        return db.session.execute(sa.text("SELECT COUNT(*) FROM tmp_afectados")).scalar()
+    
+    @classmethod
+    def ejecutar_incremental(cls, tamano_lote=5000, k=TOP_K):
+        """
+        Procesa los pedidos nuevos desde la última ejecución en lotes por id,
+        confirmando cada lote junto con su marca de agua. Devuelve (pedidos, productos).
+        
+        Los ids se asignan al insertar pero se vuelven visibles al confirmar, así
+        que un checkout lento puede aparecer detrás de la marca. Como la matriz
+        suma (no se puede reprocesar), la marca solo avanza sobre pedidos con más
+        de MARGEN_PEDIDOS_SEG y se detiene antes del primer pedido más reciente.
+        """
+        from src.models.compradores.pedido import Pedido
+        
+        total_pedidos, total_productos = 0, 0
+        corte = datetime.utcnow() - timedelta(seconds=cls.MARGEN_PEDIDOS_SEG)
+        while True:
+            desde_id = EstadoProcesoBatch.obtener_marca(cls.PROCESO)
+            primer_reciente = db.session.execute(
+                sa.select(sa.func.min(Pedido.id_pedido))
+                .where(Pedido.id_pedido > desde_id, Pedido.fecha_pedido >= corte)
+            ).scalar()
+            query = sa.select(Pedido.id_pedido).where(
+                Pedido.id_pedido > desde_id,
+                Pedido.fecha_pedido < corte
+            )
+            if primer_reciente is not None:
+                query = query.where(Pedido.id_pedido < primer_reciente)
+            ids = db.session.execute(
+                query.order_by(Pedido.id_pedido).limit(tamano_lote)
+            ).scalars().all()
+            if not ids:
+                db.session.commit()
+                break
+            
+            hasta_id = ids[-1]
+            total_productos += cls.procesar_pedidos(desde_id, hasta_id, k=k)
+            EstadoProcesoBatch.guardar_marca(cls.PROCESO, hasta_id)
+            db.session.commit()
+            total_pedidos += len(ids)
+            
+            if len(ids) < tamano_lote:
+                break
+        return total_pedidos, total_productos
+
+
+# ==========================================
+# MODELO: PRODUCTOS ELIMINADOS (TOMBSTONES)
+# ==========================================
+class ProductoEliminado(db.Model):
+    """Tombstones de productos eliminados para el feed de cambios (sync delta)."""
+    __tablename__ = 'productos_eliminados'
+    __table_args__ = (
+        sa.Index('ix_productos_eliminados_negocio_fecha', 'negocio_id', 'fecha_eliminacion', 'id'),
+        {'extend_existing': True}
+    )
+    
+    id = sa.Column(sa.Integer, primary_key=True)
+    producto_id = sa.Column(sa.Integer, nullable=False)  # Sin FK: el producto ya no existe
+    negocio_id = sa.Column(
+        sa.Integer, 
+        sa.ForeignKey('negocios.id_negocio', ondelete='CASCADE'), 
+        nullable=False
+    )
+    sucursal_id = sa.Column(sa.Integer, nullable=True)
+    fecha_eliminacion = sa.Column(sa.DateTime, default=datetime.utcnow, nullable=False)
+    
+    @classmethod
+    def registrar(cls, producto):
+        """Agrega a la sesión el tombstone de un producto que se va a eliminar."""
+        tombstone = cls(
+            producto_id=producto.id_producto,
+            negocio_id=producto.negocio_id,
+            sucursal_id=producto.sucursal_id
+        )
+        db.session.add(tombstone)
+        return tombstone
+    
+    def to_dict(self):
+        return {
+            "id": self.producto_id,
+            "id_producto": self.producto_id,
+            "sucursal_id": self.sucursal_id,
+            "fecha_eliminacion": self.fecha_eliminacion.isoformat() if self.fecha_eliminacion else None
+        }
+
+
 # ==========================================
 # MODELO: PRODUCTO CATÁLOGO (INVENTARIO PRO v2.3)
 # ==========================================
@@ -385,7 +1220,13 @@ class ProductoCatalogo(db.Model):
     - badge_personalizado (texto libre max 20 chars)
     """
     __tablename__ = 'productos_catalogo'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Búsqueda por nombre dentro del negocio (formulario de control operativo)
+        sa.Index('ix_productos_catalogo_negocio_nombre', 'negocio_id', 'nombre'),
+        # Feed de cambios (sync delta) por negocio
+        sa.Index('ix_productos_catalogo_negocio_actualizacion', 'negocio_id', 'fecha_actualizacion', 'id_producto'),
+        {'extend_existing': True}
+    )
 
     # ==========================================
     # IDENTIFICACIÓN
@@ -442,6 +1283,7 @@ class ProductoCatalogo(db.Model):
     visitas_7_dias = sa.Column(sa.Integer, default=0)
     rating_promedio = sa.Column(sa.Numeric(2, 1), default=0)
     total_reviews = sa.Column(sa.Integer, default=0)
+    rating_suma = sa.Column(sa.Integer, default=0, nullable=False, server_default='0')  # suma de ratings aprobados
     velocidad_venta = sa.Column(sa.Numeric(5, 2), default=0)
     
     # ==========================================
@@ -656,6 +1498,189 @@ class ProductoCatalogo(db.Model):
         elif tipo == 'RESTA':
             self.stock = max(0, self.stock - cantidad)
     
+    @classmethod
+    def aplicar_items_lote(cls, negocio_id, usuario_id, sucursal_id, items, tipo_op, nota=None):
+        """
+        Aplica en lote los cambios de stock de una operación con varios items.
+
+        Una sola consulta IN (bloqueada con FOR UPDATE en orden de id para evitar
+        deadlocks), un UPDATE ... FROM unnest y un INSERT multi-fila de MovimientoStock.
+        El número de viajes a la BD no depende de la cantidad de items.
+
+        Args:
+            items: lista de dicts con id/id_producto, cantidad/qty y costo opcional
+            tipo_op: COMPRA/INGRESO suman stock, VENTA/GASTO lo restan
+
+        Returns:
+            dict: {'procesados': [...], 'omitidos': [...]}
+        """
+        procesados, omitidos = [], []
+
+        if tipo_op in ('COMPRA', 'INGRESO'):
+            signo, tipo_mov = 1, 'entrada'
+        elif tipo_op in ('VENTA', 'GASTO'):
+            signo, tipo_mov = -1, 'salida'
+        else:
+            return {'procesados': procesados, 'omitidos': omitidos}
+
+        # Agrupar cantidades por producto (un mismo id puede venir repetido)
+        cantidades = {}
+        costos = {}
+        for item in items or []:
+            if not isinstance(item, dict):
+                continue
+            try:
+                id_producto = int(item.get('id') or item.get('id_producto') or 0)
+                cantidad = int(item.get('cantidad') or item.get('qty') or 0)
+            except (ValueError, TypeError):
+                omitidos.append({'item': item, 'motivo': 'datos_invalidos'})
+                continue
+            if not id_producto:
+                omitidos.append({'item': item, 'motivo': 'sin_id_producto'})
+                continue
+            if cantidad == 0:
+                continue
+            cantidades[id_producto] = cantidades.get(id_producto, 0) + cantidad
+            if item.get('costo') and signo > 0:
+                costos[id_producto] = float(item['costo'])
+
+        if not cantidades:
+            return {'procesados': procesados, 'omitidos': omitidos}
+
+        filas = db.session.execute(
+            sa.select(cls.id_producto, cls.stock, cls.costo)
+            .where(cls.negocio_id == negocio_id, cls.id_producto.in_(cantidades.keys()))
+            .order_by(cls.id_producto)
+            .with_for_update()
+        ).all()
+
+        ahora = datetime.utcnow()
+        updates = []
+        movimientos = []
+        for id_producto, stock, costo in filas:
+            stock_previo = stock or 0
+            stock_nuevo = max(0, stock_previo + signo * cantidades[id_producto])
+            updates.append({
+                'id_producto': id_producto,
+                'stock': stock_nuevo,
+                'costo': costos.get(id_producto, costo)
+            })
+            movimientos.append({
+                'producto_id': id_producto,
+                'usuario_id': usuario_id,
+                'negocio_id': negocio_id,
+                'sucursal_id': sucursal_id,
+                'tipo': tipo_mov,
+                'cantidad': stock_nuevo - stock_previo,
+                'stock_anterior': stock_previo,
+                'stock_nuevo': stock_nuevo,
+                'nota': (nota or f"{tipo_op} registrada")[:255],
+                'fecha': ahora
+            })
+            procesados.append({
+                'id_producto': id_producto,
+                'stock_anterior': stock_previo,
+                'stock_nuevo': stock_nuevo
+            })
+
+        encontrados = {fila.id_producto for fila in filas}
+        for id_producto in cantidades:
+            if id_producto not in encontrados:
+                omitidos.append({'id_producto': id_producto, 'motivo': 'no_encontrado'})
+
+        if updates:
+            db.session.execute(sa.text("""
+                UPDATE productos_catalogo p
+                SET stock = v.stock,
+                    costo = v.costo,
+                    fecha_actualizacion = (clock_timestamp() AT TIME ZONE 'UTC')
+                FROM unnest(
+                    CAST(:ids AS INTEGER[]),
+                    CAST(:stocks AS INTEGER[]),
+                    CAST(:costos AS DOUBLE PRECISION[])
+                ) AS v(id_producto, stock, costo)
+                WHERE p.id_producto = v.id_producto
+            """), {
+                'ids': [u['id_producto'] for u in updates],
+                'stocks': [u['stock'] for u in updates],
+                'costos': [u['costo'] for u in updates]
+            })
+            db.session.execute(sa.insert(MovimientoStock.__table__), movimientos)
+
+        return {'procesados': procesados, 'omitidos': omitidos}
+
+    @classmethod
+    def obtener_para_checkout(cls, negocio_id, ids):
+        """
+        Productos publicados del negocio para un checkout, en una sola consulta.
+        Las filas quedan bloqueadas en orden de id, así dos checkouts que
+        comparten productos se serializan en lugar de bloquearse mutuamente.
+        """
+        return cls.query.filter(
+            cls.id_producto.in_(ids),
+            cls.negocio_id == negocio_id,
+            cls.activo == True,
+            cls.estado_publicacion == True
+        ).order_by(cls.id_producto).with_for_update(of=cls).all()
+
+    @classmethod
+    def _mover_stock_reserva(cls, cantidades, signo, nota):
+        """
+        UPDATE único sobre {id_producto: cantidad}. Al descontar solo toca las
+        filas con stock >= cantidad (la condición se reevalúa tras esperar el
+        bloqueo, así que no hay sobreventa). Registra los MovimientoStock y
+        toca fecha_actualizacion para que /catalogo/cambios entregue el stock nuevo.
+        """
+        if not cantidades:
+            return []
+        ids = sorted(cantidades)
+        filas = db.session.execute(sa.text("""
+            UPDATE productos_catalogo p
+            SET stock = p.stock + :signo * v.cantidad,
+                fecha_actualizacion = (clock_timestamp() AT TIME ZONE 'UTC')
+            FROM unnest(CAST(:ids AS INTEGER[]), CAST(:cantidades AS INTEGER[])) AS v(id_producto, cantidad)
+            WHERE p.id_producto = v.id_producto
+              AND (:signo > 0 OR p.stock >= v.cantidad)
+            RETURNING p.id_producto, p.stock, v.cantidad, p.usuario_id, p.negocio_id, p.sucursal_id
+        """), {
+            'signo': signo,
+            'ids': ids,
+            'cantidades': [cantidades[i] for i in ids]
+        }).all()
+
+        if filas:
+            ahora = datetime.utcnow()
+            db.session.execute(sa.insert(MovimientoStock.__table__), [
+                {
+                    'producto_id': f.id_producto,
+                    'usuario_id': f.usuario_id,
+                    'negocio_id': f.negocio_id,
+                    'sucursal_id': f.sucursal_id,
+                    'tipo': 'entrada' if signo > 0 else 'salida',
+                    'cantidad': signo * f.cantidad,
+                    'stock_anterior': f.stock - signo * f.cantidad,
+                    'stock_nuevo': f.stock,
+                    'nota': (nota or 'Reserva de pedido')[:255],
+                    'fecha': ahora
+                }
+                for f in filas
+            ])
+        return filas
+
+    @classmethod
+    def reservar_stock(cls, cantidades, nota=None):
+        """
+        Descuenta el stock de un pedido. Devuelve los ids sin stock suficiente;
+        si la lista no está vacía el llamador debe hacer rollback de la transacción.
+        """
+        filas = cls._mover_stock_reserva(cantidades, -1, nota)
+        return sorted(set(cantidades) - {f.id_producto for f in filas})
+
+    @classmethod
+    def liberar_stock(cls, cantidades, nota=None):
+        """Devuelve al inventario el stock reservado por un pedido."""
+        cls._mover_stock_reserva(cantidades, 1, nota)
+
     def necesita_reabastecimiento(self):
         """Verifica si el stock está bajo el mínimo"""
         return self.stock <= self.stock_minimo
@@ -681,6 +1706,25 @@ class ProductoCatalogo(db.Model):
         """Calcula la ganancia por unidad"""
         return round(self.precio - self.costo, 2)
     
+    def actualizar_precio(self, nuevo_precio):
+        """
+        Asigna el precio y, si cambió, actualiza precio_historico_min de forma
+        incremental (mínimo entre el histórico, el precio anterior y el nuevo),
+        sin recorrer el historial. Devuelve True si hubo cambio; el llamador
+        registra el día con ProductoPreciosHistorico.registrar_lote tras el flush.
+        """
+        nuevo_precio = float(nuevo_precio)
+        anterior = self.precio
+        self.precio = nuevo_precio
+        if anterior is None or float(anterior) == nuevo_precio:
+            return False
+        
+        candidatos = [float(anterior), nuevo_precio]
+        if self.precio_historico_min is not None:
+            candidatos.append(float(self.precio_historico_min))
+        self.precio_historico_min = min(candidatos)
+        return True
+    
     # ==========================================
     # PROPIEDADES PARA MULTIMEDIA
     # ==========================================
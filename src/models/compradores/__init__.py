@@ -6,11 +6,13 @@ Descripción: Modelos para gestión de compradores, direcciones y pedidos
 
 from .comprador import Comprador
 from .direccion import DireccionComprador
-from .pedido import Pedido, PedidoHistorial
+from .pedido import Pedido, PedidoHistorial, PedidoItem, PedidoResumenDiario
 
 __all__ = [
     'Comprador',
     'DireccionComprador', 
     'Pedido',
-    'PedidoHistorial'
+    'PedidoHistorial',
+    'PedidoItem',
+    'PedidoResumenDiario'
 ]
\ No newline at end of file
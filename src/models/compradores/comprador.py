@@ -16,9 +16,26 @@ from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy.dialects.postgresql import JSONB
 from src.models.database import db
+import re
 import uuid
 
 
+# Normalización usada para búsquedas indexadas. Debe coincidir con las
+# expresiones de las columnas generadas (ver SQL_TELEFONO_NORMALIZADO).
+SQL_TELEFONO_NORMALIZADO = "right(regexp_replace(coalesce({col}, ''), '[^0-9]', '', 'g'), 10)"
+SQL_CORREO_NORMALIZADO = "lower(btrim({col}))"
+
+
+def normalizar_telefono(telefono):
+    """Solo dígitos, últimos 10 (quita el indicativo +57 y separadores)."""
+    return re.sub(r'[^0-9]', '', telefono or '')[-10:]
+
+
+def normalizar_correo(correo):
+    """Correo sin espacios en los extremos y en minúsculas."""
+    return (correo or '').strip().lower()
+
+
 class Comprador(db.Model):
     """
     Modelo de Comprador - Usuarios que compran en las tiendas.
@@ -43,6 +60,18 @@ class Comprador(db.Model):
     apellidos = db.Column(db.String(100))
     correo = db.Column(db.String(150), unique=True, nullable=False, index=True)
     telefono = db.Column(db.String(20), nullable=False, index=True)
+    
+    # Columnas generadas por PostgreSQL para búsquedas exactas indexadas
+    telefono_normalizado = db.Column(
+        db.String(20),
+        db.Computed(SQL_TELEFONO_NORMALIZADO.format(col='telefono'), persisted=True),
+        index=True
+    )
+    correo_normalizado = db.Column(
+        db.String(150),
+        db.Computed(SQL_CORREO_NORMALIZADO.format(col='correo'), persisted=True),
+        index=True
+    )
     password_hash = db.Column(db.String(255))  # NULL si es invitado
     
     # Identificación (opcional, para facturación)
@@ -287,16 +316,19 @@ class Comprador(db.Model):
     # ==========================================
     @classmethod
     def buscar_por_correo(cls, correo):
-        """Busca un comprador por correo."""
-        return cls.query.filter_by(correo=correo.lower().strip()).first()
+        """Busca un comprador por correo (sin distinguir mayúsculas ni espacios)."""
+        correo_limpio = normalizar_correo(correo)
+        if not correo_limpio:
+            return None
+        return cls.query.filter(cls.correo_normalizado == correo_limpio).first()
     
     @classmethod
     def buscar_por_telefono(cls, telefono):
-        """Busca un comprador por teléfono."""
-        telefono_limpio = ''.join(filter(str.isdigit, telefono))
-        return cls.query.filter(
-            cls.telefono.contains(telefono_limpio[-10:])
-        ).first()
+        """Busca un comprador por teléfono (solo dígitos, sin indicativo)."""
+        telefono_limpio = normalizar_telefono(telefono)
+        if not telefono_limpio:
+            return None
+        return cls.query.filter(cls.telefono_normalizado == telefono_limpio).first()
     
     @classmethod
     def buscar_por_token(cls, token):
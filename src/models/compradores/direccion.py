@@ -5,11 +5,30 @@ Descripción: Direcciones de envío de los compradores
 Versión: 2.0 - Optimizado para checkout
 """
 
+import hashlib
+import re
+import unicodedata
 from datetime import datetime
-from sqlalchemy.dialects.postgresql import JSONB
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
 from src.models.database import db
 
 
+def normalizar_direccion(*partes):
+    """
+    Texto comparable de una dirección: sin tildes, en minúsculas y solo con
+    letras y números separados por un espacio ("Cra. 10 #20-30" == "cra 10 20 30").
+    """
+    texto = unicodedata.normalize('NFKD', ' '.join(p for p in partes if p))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(re.findall(r'[a-z0-9]+', texto.lower()))
+
+
+def calcular_hash_direccion(*partes):
+    """sha256 (hex) de la dirección normalizada."""
+    return hashlib.sha256(normalizar_direccion(*partes).encode('utf-8')).hexdigest()
+
+
 class DireccionComprador(db.Model):
     """
     Modelo de Dirección de Comprador.
@@ -25,6 +44,17 @@ class DireccionComprador(db.Model):
     - Punto de recogida
     """
     __tablename__ = 'direcciones_comprador'
+    __table_args__ = (
+        # Reusar o crear en el checkout es un solo INSERT ... ON CONFLICT sobre esta llave
+        db.UniqueConstraint('comprador_id', 'hash_direccion', name='uq_direcciones_comprador_hash'),
+    )
+    
+    # Campos que identifican el lugar de entrega (alias, referencias o
+    # coordenadas distintas no hacen otra dirección)
+    CAMPOS_HASH = (
+        'nombre_establecimiento', 'direccion', 'complemento',
+        'barrio', 'localidad', 'ciudad', 'departamento'
+    )
     
     # ==========================================
     # TIPOS DE DIRECCIÓN
@@ -95,6 +125,7 @@ class DireccionComprador(db.Model):
     # ==========================================
     es_principal = db.Column(db.Boolean, default=False)
     activo = db.Column(db.Boolean, default=True)
+    hash_direccion = db.Column(db.String(64))  # ver CAMPOS_HASH y calcular_hash_direccion()
     
     # ==========================================
     # TIMESTAMPS
@@ -124,6 +155,12 @@ class DireccionComprador(db.Model):
             kwargs['tipo_direccion'] = 'residencia'
         
         super(DireccionComprador, self).__init__(**kwargs)
+        self.actualizar_hash()
+    
+    def actualizar_hash(self):
+        """Recalcula hash_direccion a partir de CAMPOS_HASH."""
+        self.hash_direccion = calcular_hash_direccion(*(getattr(self, c) for c in self.CAMPOS_HASH))
+        return self.hash_direccion
     
     # ==========================================
     # PROPIEDADES
@@ -284,20 +321,6 @@ class DireccionComprador(db.Model):
                 'tipo': 'residencia'
             }
         """
-        # Parsear dirección completa si viene todo junto
-        direccion_texto = direccion_data.get('direccion_completa', '')
-        
-        # Si viene dirección completa pero no los campos individuales,
-        # intentar extraer ciudad y departamento del final
-        if direccion_texto and not direccion_data.get('ciudad'):
-            partes = direccion_texto.split(',')
-            if len(partes) >= 2:
-                # Última parte es departamento, penúltima es ciudad
-                direccion_data['departamento'] = partes[-1].strip()
-                direccion_data['ciudad'] = partes[-2].strip()
-                # El resto es la dirección
-                direccion_texto = ', '.join(partes[:-2])
-        
         # Determinar si es primera dirección (para hacerla principal)
         es_primera = cls.query.filter_by(
             comprador_id=comprador_id,
@@ -306,25 +329,95 @@ class DireccionComprador(db.Model):
         
         direccion = cls(
             comprador_id=comprador_id,
-            tipo_direccion=direccion_data.get('tipo', 'residencia'),
-            direccion=direccion_texto or direccion_data.get('direccion', ''),
-            ciudad=direccion_data.get('ciudad', ''),
-            departamento=direccion_data.get('departamento', ''),
-            barrio=direccion_data.get('barrio'),
-            localidad=direccion_data.get('localidad'),
-            complemento=direccion_data.get('complemento'),
-            referencias=direccion_data.get('referencias'),
-            codigo_postal=direccion_data.get('codigo_postal'),
-            alias=direccion_data.get('alias'),
-            nombre_establecimiento=direccion_data.get('nombre_establecimiento'),
-            datos_especiales=direccion_data.get('datos_especiales', {}),
-            latitud=direccion_data.get('latitud'),
-            longitud=direccion_data.get('longitud'),
-            es_principal=es_primera
+            es_principal=es_primera,
+            **cls._campos_desde_checkout(direccion_data)
         )
         
         return direccion
     
+    @classmethod
+    def obtener_o_crear_desde_checkout(cls, comprador_id, direccion_data):
+        """
+        Reusa la dirección del comprador con el mismo hash o la crea, en un
+        solo INSERT ... ON CONFLICT sobre (comprador_id, hash_direccion).
+        Una dirección desactivada que coincida se reactiva.
+        
+        El comprador ya debe tener id (hacer flush si es nuevo).
+        
+        Returns:
+            tuple: (DireccionComprador, creada)
+        """
+        nueva = cls(comprador_id=comprador_id, **cls._campos_desde_checkout(direccion_data))
+        tabla = cls.__table__
+        
+        # Solo lo que trae el checkout; el resto toma los defaults de la columna
+        valores = {
+            c.key: getattr(nueva, c.key)
+            for c in tabla.columns
+            if c.key not in ('id_direccion', 'es_principal') and getattr(nueva, c.key) is not None
+        }
+        sin_activas = ~sa.exists().where(
+            tabla.c.comprador_id == comprador_id,
+            tabla.c.activo.is_(True)
+        )
+        
+        stmt = pg_insert(tabla).values(es_principal=sin_activas, **valores)
+        stmt = stmt.on_conflict_do_update(
+            constraint='uq_direcciones_comprador_hash',
+            set_={
+                'activo': True,
+                # Una dirección reactivada es principal si no queda otra activa
+                'es_principal': sa.case(
+                    (tabla.c.activo.is_(True), tabla.c.es_principal),
+                    else_=stmt.excluded.es_principal
+                ),
+                'fecha_actualizacion': datetime.utcnow()
+            }
+        ).returning(
+            tabla.c.id_direccion,
+            sa.literal_column('xmax = 0').label('creada')
+        )
+        id_direccion, creada = db.session.execute(stmt).one()
+        
+        direccion = db.session.get(cls, id_direccion, populate_existing=True)
+        return direccion, bool(creada)
+    
+    @staticmethod
+    def _campos_desde_checkout(direccion_data):
+        """Campos del modelo a partir de los datos de dirección del checkout."""
+        # Parsear dirección completa si viene todo junto
+        direccion_texto = direccion_data.get('direccion_completa', '')
+        ciudad = direccion_data.get('ciudad', '')
+        departamento = direccion_data.get('departamento', '')
+        
+        # Si viene dirección completa pero no los campos individuales,
+        # intentar extraer ciudad y departamento del final
+        if direccion_texto and not ciudad:
+            partes = direccion_texto.split(',')
+            if len(partes) >= 2:
+                # Última parte es departamento, penúltima es ciudad
+                departamento = partes[-1].strip()
+                ciudad = partes[-2].strip()
+                # El resto es la dirección
+                direccion_texto = ', '.join(partes[:-2])
+        
+        return {
+            'tipo_direccion': direccion_data.get('tipo', 'residencia'),
+            'direccion': direccion_texto or direccion_data.get('direccion', ''),
+            'ciudad': ciudad,
+            'departamento': departamento,
+            'barrio': direccion_data.get('barrio'),
+            'localidad': direccion_data.get('localidad'),
+            'complemento': direccion_data.get('complemento'),
+            'referencias': direccion_data.get('referencias'),
+            'codigo_postal': direccion_data.get('codigo_postal'),
+            'alias': direccion_data.get('alias'),
+            'nombre_establecimiento': direccion_data.get('nombre_establecimiento'),
+            'datos_especiales': direccion_data.get('datos_especiales', {}),
+            'latitud': direccion_data.get('latitud'),
+            'longitud': direccion_data.get('longitud')
+        }
+    
     @classmethod
     def get_tipos_direccion(cls):
         """Retorna los tipos de dirección disponibles."""
@@ -350,6 +443,29 @@ class DireccionComprador(db.Model):
         return f'<DireccionComprador {self.id_direccion}: {self.direccion_corta}>'
 
 
+@sa.event.listens_for(DireccionComprador, 'before_update')
+def _actualizar_hash_direccion(mapper, connection, target):
+    """
+    Mantiene hash_direccion al editar la dirección desde el panel del comprador.
+    
+    Si otra dirección del mismo comprador ya tiene ese hash, esta queda con hash
+    NULL, como los duplicados que dejó la migración: el checkout sigue reusando
+    la existente y el flush no choca con uq_direcciones_comprador_hash.
+    """
+    hash_nuevo = calcular_hash_direccion(*(getattr(target, c) for c in DireccionComprador.CAMPOS_HASH))
+    if hash_nuevo == target.hash_direccion:
+        return
+    tabla = DireccionComprador.__table__
+    ocupado = connection.execute(
+        sa.select(tabla.c.id_direccion).where(
+            tabla.c.comprador_id == target.comprador_id,
+            tabla.c.hash_direccion == hash_nuevo,
+            tabla.c.id_direccion != target.id_direccion
+        ).limit(1)
+    ).first()
+    target.hash_direccion = None if ocupado else hash_nuevo
+
+
 # ==========================================
 # NOTAS DE USO
 # ==========================================
@@ -6,8 +6,19 @@ Versión: 2.0 - Actualizado para checkout con WhatsApp
 """
 
 from datetime import datetime
-from sqlalchemy.dialects.postgresql import JSONB
+from decimal import Decimal, InvalidOperation
+import json
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
+from sqlalchemy.orm.attributes import set_committed_value
 from src.models.database import db
+from src.models.compradores.comprador import (
+    SQL_CORREO_NORMALIZADO,
+    SQL_TELEFONO_NORMALIZADO,
+    normalizar_correo,
+    normalizar_telefono
+)
+from src.utils.cursores import codificar_cursor, decodificar_cursor
 
 
 class Pedido(db.Model):
@@ -18,6 +29,22 @@ class Pedido(db.Model):
     en una tienda del ecosistema Trayectoria.
     """
     __tablename__ = 'pedidos'
+    __table_args__ = (
+        # Bandeja de pedidos: keyset por (fecha_pedido, id_pedido) con o sin estado
+        db.Index('ix_pedidos_negocio_estado_fecha_id', 'negocio_id', 'estado', 'fecha_pedido', 'id_pedido'),
+        db.Index('ix_pedidos_negocio_fecha_id', 'negocio_id', 'fecha_pedido', 'id_pedido'),
+        # Búsqueda de pedidos por nombre del comprador y código parcial
+        db.Index(
+            'ix_pedidos_comprador_nombre_trgm',
+            sa.text("lower(datos_comprador->>'nombre') gin_trgm_ops"),
+            postgresql_using='gin'
+        ),
+        db.Index(
+            'ix_pedidos_codigo_trgm',
+            sa.text('codigo_pedido gin_trgm_ops'),
+            postgresql_using='gin'
+        ),
+    )
     
     # ==========================================
     # ESTADOS DEL PEDIDO
@@ -33,6 +60,28 @@ class Pedido(db.Model):
         'devuelto': {'label': 'Devuelto', 'color': '#64748b', 'icon': '↩️'}
     }
     
+    # Transiciones permitidas en los cambios masivos: avanzar en el flujo
+    # (se puede saltar pasos), cancelar antes de entregar o devolver lo enviado
+    TRANSICIONES = {
+        'pendiente': ('confirmado', 'preparando', 'enviado', 'en_camino', 'entregado', 'cancelado'),
+        'confirmado': ('preparando', 'enviado', 'en_camino', 'entregado', 'cancelado'),
+        'preparando': ('enviado', 'en_camino', 'entregado', 'cancelado'),
+        'enviado': ('en_camino', 'entregado', 'cancelado', 'devuelto'),
+        'en_camino': ('entregado', 'cancelado', 'devuelto'),
+        'entregado': ('devuelto',),
+        'cancelado': (),
+        'devuelto': ()
+    }
+    
+    # Fecha de seguimiento que se marca al entrar a cada estado
+    FECHA_POR_ESTADO = {
+        'confirmado': 'fecha_confirmacion',
+        'preparando': 'fecha_preparacion',
+        'enviado': 'fecha_envio',
+        'entregado': 'fecha_entrega',
+        'cancelado': 'fecha_cancelacion'
+    }
+    
     ESTADOS_PAGO = {
         'pendiente': {'label': 'Pendiente', 'color': '#f59e0b'},
         'pagado': {'label': 'Pagado', 'color': '#10b981'},
@@ -75,6 +124,18 @@ class Pedido(db.Model):
     datos_comprador = db.Column(JSONB, nullable=False)
     # {nombre, correo, telefono, documento}
     
+    # Generadas desde el snapshot para buscar por índice (ver Comprador)
+    telefono_normalizado = db.Column(
+        db.String(20),
+        db.Computed(SQL_TELEFONO_NORMALIZADO.format(col="datos_comprador->>'telefono'"), persisted=True),
+        index=True
+    )
+    correo_normalizado = db.Column(
+        db.String(150),
+        db.Computed(SQL_CORREO_NORMALIZADO.format(col="datos_comprador->>'correo'"), persisted=True),
+        index=True
+    )
+    
     datos_envio = db.Column(JSONB, nullable=False)
     # {tipo, ciudad, departamento, direccion, barrio, referencias, etc.}
     
@@ -101,6 +162,9 @@ class Pedido(db.Model):
     # ==========================================
     metodo_pago = db.Column(db.String(50))
     estado_pago = db.Column(db.String(30), default='pendiente')
+    
+    # True mientras el pedido tenga stock descontado del catálogo (checkout v3.2+)
+    stock_reservado = db.Column(db.Boolean, default=False, nullable=False, server_default=sa.false())
     referencia_pago = db.Column(db.String(100))  # ID de transacción
     
     # ==========================================
@@ -154,6 +218,13 @@ class Pedido(db.Model):
         order_by='PedidoHistorial.fecha.desc()'
     )
     
+    items = db.relationship(
+        'PedidoItem',
+        backref='pedido',
+        lazy='dynamic',
+        cascade='all, delete-orphan'
+    )
+    
     # ==========================================
     # PROPIEDADES
     # ==========================================
@@ -216,18 +287,21 @@ class Pedido(db.Model):
         estado_anterior = self.estado
         self.estado = nuevo_estado
         
+        # Las unidades de pedidos cancelados/devueltos no cuentan como vendidas
+        cuenta_antes = estado_anterior not in PedidoItem.ESTADOS_SIN_VENTA
+        cuenta_despues = nuevo_estado not in PedidoItem.ESTADOS_SIN_VENTA
+        if cuenta_antes != cuenta_despues and self.id_pedido:
+            PedidoItem.ajustar_total_ventas(self.id_pedido, 1 if cuenta_despues else -1)
+        
+        if nuevo_estado == 'cancelado':
+            self.liberar_stock()
+        
+        if estado_anterior != nuevo_estado:
+            PedidoResumenDiario.mover(self, estado_anterior, nuevo_estado)
+        
         # Actualizar fecha según el estado
-        ahora = datetime.utcnow()
-        if nuevo_estado == 'confirmado':
-            self.fecha_confirmacion = ahora
-        elif nuevo_estado == 'preparando':
-            self.fecha_preparacion = ahora
-        elif nuevo_estado == 'enviado':
-            self.fecha_envio = ahora
-        elif nuevo_estado == 'entregado':
-            self.fecha_entrega = ahora
-        elif nuevo_estado == 'cancelado':
-            self.fecha_cancelacion = ahora
+        if nuevo_estado in self.FECHA_POR_ESTADO:
+            setattr(self, self.FECHA_POR_ESTADO[nuevo_estado], datetime.utcnow())
         
         # Registrar en historial
         historial = PedidoHistorial(
@@ -249,6 +323,161 @@ class Pedido(db.Model):
         self.motivo_cancelacion = motivo
         self.cambiar_estado('cancelado', usuario_id, f"Cancelado: {motivo}")
     
+    def liberar_stock(self):
+        """
+        Devuelve al catálogo el stock reservado en el checkout. El cambio de
+        stock_reservado es condicional, así que dos cancelaciones concurrentes
+        no liberan dos veces. Devuelve True si liberó.
+        """
+        if not self.id_pedido:
+            return False
+        liberados = Pedido.liberar_stock_pedidos(
+            [self.id_pedido], nota=f"Cancelación pedido {self.codigo_pedido}"
+        )
+        if not liberados:
+            return False
+        set_committed_value(self, 'stock_reservado', False)
+        return True
+    
+    @classmethod
+    def liberar_stock_pedidos(cls, pedido_ids, nota=None):
+        """
+        Libera en bloque el stock reservado de varios pedidos (ver liberar_stock).
+        Devuelve los ids que tenían stock reservado.
+        """
+        from src.models.colombia_data.contabilidad.operaciones_y_catalogo import ProductoCatalogo
+        
+        tabla = cls.__table__
+        liberados = db.session.execute(
+            sa.update(tabla)
+            .where(tabla.c.id_pedido.in_(pedido_ids), tabla.c.stock_reservado == True)
+            .values(stock_reservado=False)
+            .returning(tabla.c.id_pedido)
+        ).scalars().all()
+        if not liberados:
+            return []
+        
+        cantidades = dict(db.session.execute(
+            sa.select(PedidoItem.producto_id, sa.func.sum(PedidoItem.cantidad))
+            .where(PedidoItem.pedido_id.in_(liberados), PedidoItem.producto_id.isnot(None))
+            .group_by(PedidoItem.producto_id)
+        ).all())
+        ProductoCatalogo.liberar_stock(
+            {producto_id: int(cantidad) for producto_id, cantidad in cantidades.items()},
+            nota=nota or f"Cancelación de {len(liberados)} pedidos"
+        )
+        return liberados
+    
+    @classmethod
+    def cambiar_estado_masivo(cls, negocio_id, pedido_ids, nuevo_estado, usuario_id=None, comentario=None):
+        """
+        Mueve varios pedidos del negocio a nuevo_estado en la transacción actual.
+        
+        La transición se valida en el propio UPDATE (estado actual dentro de los
+        que permiten pasar a nuevo_estado según TRANSICIONES), con las filas
+        bloqueadas en orden de id. Aplica los mismos efectos que cambiar_estado
+        (rollup diario, total_ventas, stock, historial) en bloque.
+        
+        Returns:
+            tuple: (movidos, rechazados) donde movidos es una lista de dicts
+            {id, codigo, negocio_id, estado_anterior, total} y rechazados
+            {id_pedido: estado_actual o None si no existe en el negocio}
+        """
+        if nuevo_estado not in cls.ESTADOS:
+            raise ValueError(f"Estado inválido: {nuevo_estado}")
+        
+        ids = sorted(set(pedido_ids))
+        previos = [e for e, siguientes in cls.TRANSICIONES.items() if nuevo_estado in siguientes]
+        tabla = cls.__table__
+        ahora = datetime.utcnow()
+        
+        objetivo = (
+            sa.select(tabla.c.id_pedido, tabla.c.estado)
+            .where(
+                tabla.c.negocio_id == negocio_id,
+                tabla.c.id_pedido.in_(ids),
+                sa.func.coalesce(tabla.c.estado, 'pendiente').in_(previos)
+            )
+            .order_by(tabla.c.id_pedido)
+            .with_for_update()
+            .cte('objetivo')
+        )
+        valores = {'estado': nuevo_estado}
+        if nuevo_estado in cls.FECHA_POR_ESTADO:
+            valores[cls.FECHA_POR_ESTADO[nuevo_estado]] = ahora
+        if nuevo_estado == 'cancelado' and comentario:
+            valores['motivo_cancelacion'] = comentario
+        
+        filas = db.session.execute(
+            sa.update(tabla)
+            .where(tabla.c.id_pedido == objetivo.c.id_pedido)
+            .values(**valores)
+            .returning(
+                tabla.c.id_pedido,
+                tabla.c.codigo_pedido,
+                tabla.c.negocio_id,
+                tabla.c.fecha_pedido,
+                tabla.c.total,
+                objetivo.c.estado.label('estado_anterior')
+            )
+        ).all()
+        
+        movidos = [
+            {
+                'id': f.id_pedido,
+                'codigo': f.codigo_pedido,
+                'negocio_id': f.negocio_id,
+                'estado_anterior': f.estado_anterior or 'pendiente',
+                'total': f.total
+            }
+            for f in sorted(filas, key=lambda f: f.id_pedido)
+        ]
+        
+        rechazados = {}
+        pendientes = set(ids) - {m['id'] for m in movidos}
+        if pendientes:
+            actuales = dict(db.session.execute(
+                sa.select(tabla.c.id_pedido, sa.func.coalesce(tabla.c.estado, 'pendiente'))
+                .where(tabla.c.negocio_id == negocio_id, tabla.c.id_pedido.in_(pendientes))
+            ).all())
+            rechazados = {pedido_id: actuales.get(pedido_id) for pedido_id in sorted(pendientes)}
+        
+        if not movidos:
+            return movidos, rechazados
+        
+        # Mismos efectos que cambiar_estado, en un statement cada uno
+        PedidoResumenDiario.acumular(
+            [(f.negocio_id, f.fecha_pedido, f.estado_anterior or 'pendiente', -1, -(f.total or 0)) for f in filas]
+            + [(f.negocio_id, f.fecha_pedido, nuevo_estado, 1, f.total or 0) for f in filas]
+        )
+        
+        cuenta_despues = nuevo_estado not in PedidoItem.ESTADOS_SIN_VENTA
+        cruzan = [
+            m['id'] for m in movidos
+            if (m['estado_anterior'] not in PedidoItem.ESTADOS_SIN_VENTA) != cuenta_despues
+        ]
+        if cruzan:
+            PedidoItem.ajustar_total_ventas(cruzan, 1 if cuenta_despues else -1)
+        
+        if nuevo_estado == 'cancelado':
+            cls.liberar_stock_pedidos([m['id'] for m in movidos])
+        
+        db.session.execute(
+            sa.insert(PedidoHistorial.__table__).values([
+                {
+                    'pedido_id': m['id'],
+                    'estado_anterior': m['estado_anterior'],
+                    'estado_nuevo': nuevo_estado,
+                    'comentario': comentario,
+                    'usuario_id': usuario_id,
+                    'fecha': ahora
+                }
+                for m in movidos
+            ])
+        )
+        
+        return movidos, rechazados
+    
     def marcar_pagado(self, referencia=None):
         """Marca el pedido como pagado."""
         self.estado_pago = 'pagado'
@@ -345,20 +574,116 @@ class Pedido(db.Model):
     # ==========================================
     # MÉTODOS DE CLASE
     # ==========================================
+    @staticmethod
+    def prefijo_codigo(slug):
+        """Prefijo de los códigos de pedido de una tienda: 3 primeros caracteres del slug."""
+        return (slug or 'PED')[:3].upper()
+    
     @classmethod
     def generar_codigo(cls, negocio_id, prefijo='PED'):
-        """Genera un código único para el pedido."""
-        año = datetime.utcnow().strftime('%Y')
-        
-        # Contar pedidos del negocio en este año
-        count = cls.query.filter(
-            cls.negocio_id == negocio_id,
-            cls.codigo_pedido.like(f'{prefijo}-{año}-%')
-        ).count()
+        """Genera un código único para el pedido (contador por negocio, prefijo y año)."""
+        from src.models.contador_secuencia import ContadorSecuencia
         
-        secuencial = count + 1
+        año = datetime.utcnow().year
+        secuencial = ContadorSecuencia.siguiente(negocio_id, prefijo, año)
         return f"{prefijo}-{año}-{secuencial:04d}"
     
+    @staticmethod
+    def codificar_cursor(pedido):
+        """Cursor opaco con la posición (fecha_pedido, id_pedido) de un pedido."""
+        return codificar_cursor([pedido.fecha_pedido.isoformat(), pedido.id_pedido])
+    
+    @staticmethod
+    def decodificar_cursor(cursor):
+        """Devuelve (fecha_pedido, id_pedido) o lanza ValueError."""
+        try:
+            fecha, id_pedido = decodificar_cursor(cursor)
+            return datetime.fromisoformat(fecha), int(id_pedido)
+        except Exception:
+            raise ValueError("Cursor inválido")
+    
+    @classmethod
+    def consulta_bandeja(cls, negocio_id, estado=None):
+        """Pedidos de un negocio, opcionalmente de un estado (usa los índices compuestos)."""
+        query = cls.query.filter(cls.negocio_id == negocio_id)
+        if estado:
+            query = query.filter(cls.estado == estado)
+        return query
+    
+    @staticmethod
+    def _patron_ilike(texto):
+        """%texto% con los comodines de LIKE escapados."""
+        escapado = texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return f"%{escapado}%"
+    
+    @classmethod
+    def buscar(cls, negocio_id=None, telefono=None, correo=None, nombre=None, codigo_parcial=None, limite=10):
+        """
+        Búsqueda de pedidos resuelta por índices: teléfono y correo por igualdad
+        sobre las columnas normalizadas; nombre del comprador y código parcial
+        por trigramas (requieren negocio_id).
+        """
+        telefono_limpio = normalizar_telefono(telefono) if telefono else None
+        correo_limpio = normalizar_correo(correo) if correo else None
+        # Un valor que normaliza a '' coincidiría con todos los pedidos sin dato
+        if (telefono and not telefono_limpio) or (correo and not correo_limpio):
+            return []
+        
+        query = cls.query
+        if negocio_id:
+            query = query.filter(cls.negocio_id == negocio_id)
+        if telefono_limpio:
+            query = query.filter(cls.telefono_normalizado == telefono_limpio)
+        if correo_limpio:
+            query = query.filter(cls.correo_normalizado == correo_limpio)
+        if nombre:
+            query = query.filter(
+                sa.func.lower(cls.datos_comprador['nombre'].astext).like(cls._patron_ilike(nombre.lower()))
+            )
+        if codigo_parcial:
+            query = query.filter(cls.codigo_pedido.ilike(cls._patron_ilike(codigo_parcial)))
+        return query.order_by(cls.fecha_pedido.desc(), cls.id_pedido.desc()).limit(limite).all()
+    
+    @classmethod
+    def listar_keyset(cls, negocio_id, estado=None, limite=50, cursor=None, orden='desc'):
+        """
+        Página de la bandeja de pedidos por keyset sobre (fecha_pedido, id_pedido).
+        Devuelve (pedidos, hay_mas); el costo no crece con la profundidad de la página.
+        """
+        query = cls.consulta_bandeja(negocio_id, estado)
+        clave = db.tuple_(cls.fecha_pedido, cls.id_pedido)
+        
+        if orden == 'asc':
+            if cursor:
+                query = query.filter(clave > db.tuple_(*cursor))
+            query = query.order_by(cls.fecha_pedido.asc(), cls.id_pedido.asc())
+        else:
+            if cursor:
+                query = query.filter(clave < db.tuple_(*cursor))
+            query = query.order_by(cls.fecha_pedido.desc(), cls.id_pedido.desc())
+        
+        pedidos = query.limit(limite + 1).all()
+        return pedidos[:limite], len(pedidos) > limite
+    
+    @classmethod
+    def contar_bandeja(cls, negocio_id, estado=None, estimado=False):
+        """
+        Total de la bandeja. Exacto: COUNT(*) resuelto con el índice compuesto.
+        Estimado: filas que calcula el planner (sin tocar la tabla), suficiente
+        para un badge o para el número de páginas de una tienda grande.
+        """
+        query = cls.consulta_bandeja(negocio_id, estado)
+        if not estimado:
+            return query.order_by(None).count()
+        
+        # EXPLAIN con parámetros ligados, nunca con valores interpolados en el SQL
+        conexion = db.session.connection()
+        compilado = query.with_entities(cls.id_pedido).statement.compile(dialect=conexion.dialect)
+        plan = conexion.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compilado}", compilado.params).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    
     # ★ NUEVO: Alias para compatibilidad
     @classmethod
     def generar_numero_pedido(cls, negocio_id, prefijo='PED'):
@@ -368,15 +693,24 @@ class Pedido(db.Model):
     @classmethod
     def crear_pedido(cls, comprador, direccion, negocio_data, productos, 
                      subtotal, costo_envio, total, metodo_pago, 
-                     notas_cliente=None, metodo_contacto='whatsapp', origen='web'):  # ★ NUEVO parámetro
-        """Crea un nuevo pedido."""
+                     notas_cliente=None, metodo_contacto='whatsapp', origen='web',  # ★ NUEVO parámetro
+                     codigo=None):
+        """
+        Crea un nuevo pedido.
+        
+        codigo: código ya reservado con generar_codigo(). El checkout lo pide
+        antes de bloquear productos (ver ContadorSecuencia.siguiente).
+        """
         
         # Generar código
-        prefijo = negocio_data.get('slug', 'PED')[:3].upper()
-        codigo = cls.generar_codigo(negocio_data['id'], prefijo)
+        if codigo is None:
+            codigo = cls.generar_codigo(negocio_data['id'], cls.prefijo_codigo(negocio_data.get('slug')))
         
+        ahora = datetime.utcnow()
         pedido = cls(
             codigo_pedido=codigo,
+            estado='pendiente',
+            fecha_pedido=ahora,
             comprador_id=comprador.id_comprador if comprador else None,
             negocio_id=negocio_data['id'],
             direccion_id=direccion.id_direccion if hasattr(direccion, 'id_direccion') else None,
@@ -397,6 +731,16 @@ class Pedido(db.Model):
         
         db.session.add(pedido)
         
+        # Rollup diario de la bandeja (día Colombia de la creación)
+        PedidoResumenDiario.acumular([
+            (negocio_data['id'], ahora, pedido.estado or 'pendiente', 1, total)
+        ])
+        
+        # Líneas normalizadas para analítica de ventas
+        for item in PedidoItem.desde_productos(productos, negocio_data['id'], ahora):
+            item.pedido = pedido
+            db.session.add(item)
+        
         # Actualizar estadísticas del comprador
         if comprador and hasattr(comprador, 'registrar_compra'):
             comprador.registrar_compra(total)
@@ -407,6 +751,14 @@ class Pedido(db.Model):
         return f'<Pedido {self.codigo_pedido}: {self.estado}>'
 
 
+# Los índices de trigramas (nombre del comprador, código parcial) requieren pg_trgm
+sa.event.listen(
+    Pedido.__table__,
+    'before_create',
+    sa.DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+)
+
+
 class PedidoHistorial(db.Model):
     """
     Historial de cambios de estado del pedido.
@@ -439,4 +791,306 @@ class PedidoHistorial(db.Model):
         }
     
     def __repr__(self):
-        return f'<PedidoHistorial {self.estado_anterior} -> {self.estado_nuevo}>'
\ No newline at end of file
+        return f'<PedidoHistorial {self.estado_anterior} -> {self.estado_nuevo}>'
+
+
+class PedidoResumenDiario(db.Model):
+    """
+    Rollup de pedidos por negocio, día de creación (hora Colombia) y estado actual.
+    
+    Se suma al crear el pedido y se mueve de estado en cambiar_estado(), así las
+    estadísticas de la bandeja leen unas pocas filas en lugar de todos los pedidos.
+    """
+    __tablename__ = 'pedidos_resumen_diario'
+    __table_args__ = (
+        db.PrimaryKeyConstraint('negocio_id', 'dia', 'estado', name='pk_pedidos_resumen_diario'),
+    )
+    
+    negocio_id = db.Column(db.Integer, nullable=False)
+    dia = db.Column(db.Date, nullable=False)
+    estado = db.Column(db.String(50), nullable=False)
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    
+    @classmethod
+    def acumular(cls, movimientos):
+        """
+        Suma [(negocio_id, fecha_pedido_utc, estado, cantidad, total)] al rollup
+        dentro de la transacción actual, en un solo statement.
+        """
+        from src.models.colombia_data.contabilidad.operaciones_y_catalogo import dia_colombia
+        
+        grupos = {}
+        for negocio_id, fecha, estado, cantidad, total in movimientos:
+            clave = (negocio_id, dia_colombia(fecha or datetime.utcnow()), estado or 'pendiente')
+            c, t = grupos.get(clave, (0, Decimal('0')))
+            grupos[clave] = (c + cantidad, t + Decimal(str(total or 0)))
+        if not grupos:
+            return 0
+        
+        # Orden fijo de claves para evitar deadlocks entre escrituras concurrentes
+        filas = [
+            {'negocio_id': k[0], 'dia': k[1], 'estado': k[2], 'cantidad': v[0], 'total': v[1]}
+            for k, v in sorted(grupos.items())
+        ]
+        tabla = cls.__table__
+        stmt = pg_insert(tabla).values(filas)
+        stmt = stmt.on_conflict_do_update(
+            constraint='pk_pedidos_resumen_diario',
+            set_={
+                'cantidad': tabla.c.cantidad + stmt.excluded.cantidad,
+                'total': tabla.c.total + stmt.excluded.total
+            }
+        )
+        db.session.execute(stmt)
+        return len(filas)
+    
+    @classmethod
+    def mover(cls, pedido, estado_anterior, estado_nuevo):
+        """Pasa un pedido de un estado a otro en su día de creación."""
+        cls.acumular([
+            (pedido.negocio_id, pedido.fecha_pedido, estado_anterior or 'pendiente', -1, -(pedido.total or 0)),
+            (pedido.negocio_id, pedido.fecha_pedido, estado_nuevo, 1, pedido.total or 0)
+        ])
+    
+    @classmethod
+    def reconstruir(cls, negocio_id=None):
+        """Recalcula el rollup desde pedidos (backfill / conciliación)."""
+        db.session.execute(sa.text(
+            "LOCK TABLE pedidos_resumen_diario IN SHARE ROW EXCLUSIVE MODE"
+        ))
+        filtro = "WHERE negocio_id = :negocio_id" if negocio_id else ""
+        params = {'negocio_id': negocio_id} if negocio_id else {}
+        
+        db.session.execute(sa.text(f"DELETE FROM pedidos_resumen_diario {filtro}"), params)
+        resultado = db.session.execute(sa.text(f"""
+            INSERT INTO pedidos_resumen_diario (negocio_id, dia, estado, cantidad, total)
+            SELECT negocio_id,
+                   CAST(fecha_pedido - INTERVAL '5 hours' AS DATE),
+                   COALESCE(estado, 'pendiente'),
+                   COUNT(*),
+                   COALESCE(SUM(total), 0)
+            FROM pedidos
+            {filtro}
+            GROUP BY 1, 2, 3
+        """), params)
+        return resultado.rowcount
+    
+    @classmethod
+    def filas(cls, negocio_id, desde=None, hasta=None):
+        """[(dia, estado, cantidad, total)] del rango de días Colombia (inclusive)."""
+        query = db.session.query(cls.dia, cls.estado, cls.cantidad, cls.total).filter(
+            cls.negocio_id == negocio_id,
+            cls.cantidad != 0
+        )
+        if desde:
+            query = query.filter(cls.dia >= desde)
+        if hasta:
+            query = query.filter(cls.dia <= hasta)
+        return query.order_by(cls.dia).all()
+
+
+class PedidoItem(db.Model):
+    """
+    Línea de un pedido, normalizada desde Pedido.productos (JSONB).
+    
+    Permite agregar ventas por producto o categoría con GROUP BY indexados
+    en lugar de desanidar el JSON de cada pedido.
+    """
+    __tablename__ = 'pedido_items'
+    __table_args__ = (
+        db.Index('ix_pedido_items_negocio_producto_fecha', 'negocio_id', 'producto_id', 'fecha'),
+        db.Index('ix_pedido_items_negocio_fecha', 'negocio_id', 'fecha'),
+    )
+    
+    ESTADOS_SIN_VENTA = ('cancelado', 'devuelto')
+    
+    # SELECT que desanida Pedido.productos con la misma lógica de desde_productos()
+    SQL_DESANIDAR = """
+        SELECT ped.id_pedido, ped.negocio_id,
+               CAST(substring(COALESCE(item->>'producto_id', item->>'id') FROM '^[0-9]+$') AS INTEGER),
+               LEFT(NULLIF(item->>'nombre', ''), 200),
+               LEFT(NULLIF(item->>'categoria', ''), 100),
+               COALESCE(CAST(substring(item->>'cantidad' FROM '^[0-9]+$') AS INTEGER), 1),
+               COALESCE(CAST(substring(COALESCE(item->>'precio_unitario', item->>'precio') FROM '^[0-9]+(?:\\.[0-9]+)?$') AS NUMERIC(12, 2)), 0),
+               COALESCE(
+                   CAST(substring(item->>'subtotal' FROM '^[0-9]+(?:\\.[0-9]+)?$') AS NUMERIC(12, 2)),
+                   COALESCE(CAST(substring(COALESCE(item->>'precio_unitario', item->>'precio') FROM '^[0-9]+(?:\\.[0-9]+)?$') AS NUMERIC(12, 2)), 0)
+                   * COALESCE(CAST(substring(item->>'cantidad' FROM '^[0-9]+$') AS INTEGER), 1)
+               ),
+               COALESCE(ped.fecha_pedido, ped.fecha_creacion, NOW())
+        FROM pedidos ped
+        CROSS JOIN LATERAL jsonb_array_elements(
+            CASE WHEN jsonb_typeof(ped.productos) = 'array' THEN ped.productos ELSE '[]'::jsonb END
+        ) item
+        WHERE jsonb_typeof(item) = 'object'
+    """
+    
+    id_item = db.Column(db.Integer, primary_key=True)
+    pedido_id = db.Column(
+        db.Integer,
+        db.ForeignKey('pedidos.id_pedido', ondelete='CASCADE'),
+        nullable=False,
+        index=True
+    )
+    negocio_id = db.Column(db.Integer, nullable=False)
+    producto_id = db.Column(db.Integer)  # None si el ítem no venía del catálogo
+    
+    nombre = db.Column(db.String(200))
+    categoria = db.Column(db.String(100))
+    cantidad = db.Column(db.Integer, nullable=False, default=1)
+    precio_unitario = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    subtotal = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    
+    fecha = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # = Pedido.fecha_pedido
+    
+    @staticmethod
+    def _entero(valor, defecto=None):
+        try:
+            return int(valor)
+        except (TypeError, ValueError):
+            return defecto
+    
+    @staticmethod
+    def _decimal(valor):
+        try:
+            return Decimal(str(valor))
+        except (InvalidOperation, TypeError, ValueError):
+            return Decimal('0')
+    
+    @classmethod
+    def desde_productos(cls, productos, negocio_id, fecha):
+        """Construye las líneas a partir del JSON de productos del checkout."""
+        items = []
+        for p in productos or []:
+            if not isinstance(p, dict):
+                continue
+            cantidad = cls._entero(p.get('cantidad'), 1)
+            precio = cls._decimal(p.get('precio_unitario', p.get('precio', 0)))
+            subtotal = p.get('subtotal')
+            items.append(cls(
+                negocio_id=negocio_id,
+                producto_id=cls._entero(p.get('producto_id', p.get('id'))),
+                nombre=(p.get('nombre') or '')[:200] or None,
+                categoria=(p.get('categoria') or '')[:100] or None,
+                cantidad=cantidad,
+                precio_unitario=precio,
+                subtotal=cls._decimal(subtotal) if subtotal is not None else precio * cantidad,
+                fecha=fecha
+            ))
+        return items
+    
+    @classmethod
+    def backfill(cls, desde_id, hasta_id):
+        """
+        Crea las líneas de los pedidos con id en (desde_id, hasta_id] que aún
+        no las tengan, desanidando Pedido.productos. Devuelve filas insertadas.
+        """
+        resultado = db.session.execute(sa.text(f"""
+            INSERT INTO pedido_items
+                (pedido_id, negocio_id, producto_id, nombre, categoria, cantidad, precio_unitario, subtotal, fecha)
+            {cls.SQL_DESANIDAR}
+              AND ped.id_pedido > :desde_id AND ped.id_pedido <= :hasta_id
+              AND NOT EXISTS (SELECT 1 FROM pedido_items x WHERE x.pedido_id = ped.id_pedido)
+        """), {'desde_id': desde_id, 'hasta_id': hasta_id})
+        return resultado.rowcount
+    
+    @classmethod
+    def ajustar_total_ventas(cls, pedido_id, signo=1):
+        """
+        Suma (o resta) las unidades del pedido a ProductoCatalogo.total_ventas.
+        Acepta un id o una lista de ids (cambios masivos).
+        """
+        ids = list(pedido_id) if isinstance(pedido_id, (list, tuple, set)) else [pedido_id]
+        db.session.flush()
+        db.session.execute(sa.text("""
+            UPDATE productos_catalogo p
+            SET total_ventas = GREATEST(COALESCE(p.total_ventas, 0) + :signo * i.unidades, 0),
+                fecha_actualizacion = (clock_timestamp() AT TIME ZONE 'UTC')
+            FROM (
+                SELECT producto_id, SUM(cantidad) AS unidades
+                FROM pedido_items
+                WHERE pedido_id = ANY(CAST(:ids AS INTEGER[])) AND producto_id IS NOT NULL
+                GROUP BY producto_id
+            ) i
+            WHERE p.id_producto = i.producto_id
+        """), {'ids': ids, 'signo': signo})
+    
+    @classmethod
+    def recalcular_total_ventas(cls, negocio_id=None):
+        """Reconstruye total_ventas desde pedido_items (conciliación). Devuelve filas tocadas."""
+        resultado = db.session.execute(sa.text("""
+            UPDATE productos_catalogo p
+            SET total_ventas = v.unidades
+            FROM (
+                SELECT pc.id_producto, COALESCE((
+                    SELECT SUM(i.cantidad)
+                    FROM pedido_items i
+                    JOIN pedidos ped ON ped.id_pedido = i.pedido_id
+                    WHERE i.negocio_id = pc.negocio_id
+                      AND i.producto_id = pc.id_producto
+                      AND ped.estado NOT IN :excluidos
+                ), 0) AS unidades
+                FROM productos_catalogo pc
+                WHERE (CAST(:negocio_id AS INTEGER) IS NULL OR pc.negocio_id = :negocio_id)
+            ) v
+            WHERE p.id_producto = v.id_producto
+              AND COALESCE(p.total_ventas, 0) <> v.unidades
+        """).bindparams(sa.bindparam('excluidos', expanding=True)),
+            {'negocio_id': negocio_id, 'excluidos': list(cls.ESTADOS_SIN_VENTA)})
+        return resultado.rowcount
+    
+    @classmethod
+    def resumen_ventas(cls, negocio_id, desde=None, hasta=None, agrupar='producto', limite=20):
+        """
+        Unidades e ingresos por producto o por categoría en [desde, hasta) (UTC).
+        Excluye pedidos cancelados/devueltos. Ordenado por unidades vendidas.
+        """
+        from src.models.colombia_data.contabilidad.operaciones_y_catalogo import ProductoCatalogo
+        
+        if agrupar == 'categoria':
+            clave = sa.func.coalesce(ProductoCatalogo.categoria, cls.categoria, 'Sin categoría')
+            columnas = [clave.label('categoria')]
+        else:
+            clave = cls.producto_id
+            columnas = [cls.producto_id, sa.func.max(cls.nombre).label('nombre')]
+        
+        query = db.session.query(
+            *columnas,
+            sa.func.sum(cls.cantidad).label('unidades'),
+            sa.func.sum(cls.subtotal).label('ingresos'),
+            sa.func.count(sa.distinct(cls.pedido_id)).label('pedidos')
+        ).join(
+            Pedido, Pedido.id_pedido == cls.pedido_id
+        ).filter(
+            cls.negocio_id == negocio_id,
+            Pedido.estado.notin_(cls.ESTADOS_SIN_VENTA)
+        )
+        if agrupar == 'categoria':
+            query = query.outerjoin(ProductoCatalogo, ProductoCatalogo.id_producto == cls.producto_id)
+        else:
+            query = query.filter(cls.producto_id.isnot(None))
+        if desde:
+            query = query.filter(cls.fecha >= desde)
+        if hasta:
+            query = query.filter(cls.fecha < hasta)
+        
+        return query.group_by(clave).order_by(
+            sa.func.sum(cls.cantidad).desc()
+        ).limit(limite).all()
+    
+    def to_dict(self):
+        return {
+            'id_item': self.id_item,
+            'pedido_id': self.pedido_id,
+            'producto_id': self.producto_id,
+            'nombre': self.nombre,
+            'categoria': self.categoria,
+            'cantidad': self.cantidad,
+            'precio_unitario': float(self.precio_unitario or 0),
+            'subtotal': float(self.subtotal or 0),
+            'fecha': self.fecha.isoformat() if self.fecha else None
+        }
+    
+    def __repr__(self):
+        return f'<PedidoItem {self.pedido_id}:{self.producto_id} x{self.cantidad}>'
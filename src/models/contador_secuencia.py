@@ -0,0 +1,71 @@
+"""
+BizFlow Studio - Modelo de Contadores de Secuencia
+Números consecutivos por (negocio, prefijo, periodo) para códigos de pedido
+y otros identificadores legibles.
+"""
+
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, BigInteger, DateTime, PrimaryKeyConstraint
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from src.models.database import db
+
+
+class ContadorSecuencia(db.Model):
+    """
+    Un contador por (negocio_id, prefijo, periodo). Cada número sale de un solo
+    INSERT ... ON CONFLICT DO UPDATE ... RETURNING, sin contar filas.
+
+    Los números se confirman en su propia transacción: si el pedido que lo pidió
+    hace rollback el número se pierde (hay huecos), pero el bloqueo de la fila
+    dura solo esa sentencia y dos peticiones concurrentes nunca reciben el mismo.
+
+    Se eligió una conexión aparte (y no la sesión) para que el bloqueo del
+    contador no dure toda la transacción del checkout, ni una secuencia de
+    PostgreSQL por alcance porque habría que crear una por negocio y año. Esa
+    conexión sale del pool, así que quien la pida NO debe tener bloqueos
+    tomados: el checkout reserva el código antes de obtener_para_checkout.
+    """
+    __tablename__ = "contadores_secuencia"
+    __table_args__ = (
+        PrimaryKeyConstraint('negocio_id', 'prefijo', 'periodo', name='pk_contadores_secuencia'),
+    )
+
+    # negocio_id = 0 para contadores globales; periodo = 0 si no reinicia por año
+    GLOBAL = 0
+
+    # ==========================================
+    # COLUMNAS
+    # ==========================================
+    negocio_id = Column(Integer, nullable=False)
+    prefijo = Column(String(30), nullable=False)
+    periodo = Column(Integer, nullable=False, default=0)
+    valor = Column(BigInteger, nullable=False, default=0)
+    fecha_actualizacion = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    # ==========================================
+    # MÉTODOS DE CLASE
+    # ==========================================
+    @classmethod
+    def siguiente(cls, negocio_id, prefijo, periodo=0):
+        """Reserva y devuelve el siguiente número del contador (empieza en 1)."""
+        tabla = cls.__table__
+        stmt = pg_insert(tabla).values(
+            negocio_id=negocio_id,
+            prefijo=prefijo,
+            periodo=periodo,
+            valor=1,
+            fecha_actualizacion=datetime.utcnow()
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint='pk_contadores_secuencia',
+            set_={
+                'valor': tabla.c.valor + 1,
+                'fecha_actualizacion': stmt.excluded.fecha_actualizacion
+            }
+        ).returning(tabla.c.valor)
+
+        with db.engine.begin() as conn:
+            return conn.execute(stmt).scalar()
+
+    def __repr__(self):
+        return f"<ContadorSecuencia {self.negocio_id}/{self.prefijo}/{self.periodo}={self.valor}>"
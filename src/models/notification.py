@@ -6,11 +6,16 @@ Soporta:
   - Notificaciones Sistema → Negocio (operativas)
 """
 
+import hashlib
+import json
 import logging
 from datetime import datetime
+import sqlalchemy as sa
 from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import relationship
 from src.models.database import db
+from src.utils.cursores import codificar_cursor, decodificar_cursor
 
 # Configurar logging
 logger = logging.getLogger(__name__)
@@ -24,6 +29,14 @@ if not logger.handlers:
     logger.addHandler(file_handler)
 
 
+def _tipos_por_categoria(tipos):
+    """{categoria: (tipo, ...)} a partir de TIPOS."""
+    agrupados = {}
+    for tipo, info in tipos.items():
+        agrupados.setdefault(info['categoria'], []).append(tipo)
+    return {categoria: tuple(lista) for categoria, lista in agrupados.items()}
+
+
 class Notification(db.Model):
     """
     Modelo unificado de notificaciones.
@@ -33,6 +46,28 @@ class Notification(db.Model):
     2. Negocio (sistema a negocio): negocio_id + user_id (del dueño)
     """
     __tablename__ = "notification"
+    __table_args__ = (
+        # Bandeja por keyset (timestamp, id): todas/por categoría y solo no leídas
+        db.Index('ix_notification_negocio_fecha_id', 'negocio_id', 'timestamp', 'id'),
+        db.Index(
+            'ix_notification_negocio_no_leidas',
+            'negocio_id', 'timestamp', 'id',
+            postgresql_where=sa.text('is_read = false')
+        ),
+        db.Index('ix_notification_usuario_fecha_id', 'user_id', 'timestamp', 'id'),
+        db.Index(
+            'ix_notification_usuario_no_leidas',
+            'user_id', 'timestamp', 'id',
+            postgresql_where=sa.text('is_read = false')
+        ),
+        # Una sola notificación por (tipo, destinatario, referencia) cuando se pide dedupe
+        db.Index(
+            'uq_notification_dedupe_key',
+            'dedupe_key',
+            unique=True,
+            postgresql_where=sa.text('dedupe_key IS NOT NULL')
+        ),
+    )
 
     # ==========================================
     # TIPOS DE NOTIFICACIÓN
@@ -62,6 +97,20 @@ class Notification(db.Model):
         'default_type': {'label': 'Notificación', 'icon': '🔔', 'color': '#64748b', 'categoria': 'sistema'}
     }
     
+    TIPOS_POR_CATEGORIA = _tipos_por_categoria(TIPOS)
+    
+    # Tipo de notificación al cambiar el estado de un pedido
+    TIPO_POR_ESTADO_PEDIDO = {
+        'confirmado': 'pedido_pagado',
+        'enviado': 'pedido_enviado',
+        'entregado': 'pedido_entregado',
+        'cancelado': 'pedido_cancelado'
+    }
+    
+    # Canal LISTEN/NOTIFY por el que se empujan las notificaciones nuevas (ver
+    # src/services/notificaciones_push_services.py)
+    CANAL_PUSH = 'notificaciones'
+    
     PRIORIDADES = {
         'alta': {'label': 'Alta', 'color': '#ef4444'},
         'media': {'label': 'Media', 'color': '#f59e0b'},
@@ -115,6 +164,7 @@ class Notification(db.Model):
     # DATOS EXTRA Y TIMESTAMPS
     # ==========================================
     extra_data = Column(JSON, nullable=True)
+    dedupe_key = Column(String(64), nullable=True)  # ver calcular_dedupe_key()
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     fecha_lectura = Column(DateTime, nullable=True)
     
@@ -251,9 +301,72 @@ class Notification(db.Model):
             logger.warning(f"No se pudo obtener user_id del negocio {negocio_id}: {e}")
         return None
 
+    @classmethod
+    def publicar(cls, notificaciones):
+        """
+        Empuja las notificaciones a los streams abiertos con pg_notify, en un
+        solo statement. Va dentro de la transacción actual: PostgreSQL lo
+        entrega al hacer commit y lo descarta si hay rollback.
+        """
+        db.session.flush()
+        payloads = [
+            json.dumps({
+                'negocio_id': n.negocio_id,
+                'user_id': n.user_id,
+                'notificacion': n.to_dict_mini()
+            }, default=str)
+            for n in notificaciones
+        ]
+        if not payloads:
+            return 0
+        db.session.execute(
+            sa.text("SELECT pg_notify(:canal, p) FROM unnest(CAST(:payloads AS TEXT[])) AS p"),
+            {'canal': cls.CANAL_PUSH, 'payloads': payloads}
+        )
+        return len(payloads)
+
     # ==========================================
     # MÉTODOS DE CLASE - CREAR NOTIFICACIONES SOCIALES
     # ==========================================
+    @staticmethod
+    def calcular_dedupe_key(tipo, destinatario, referencia):
+        """sha256 (hex) de tipo + destinatario + referencia."""
+        raw = f"{tipo}|{destinatario}|{referencia}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+    
+    @classmethod
+    def crear_si_no_existe(cls, referencia, **campos):
+        """
+        Crea la notificación solo si no hay otra con la misma dedupe_key
+        (tipo + user_id/negocio_id + referencia): un INSERT ... ON CONFLICT
+        DO NOTHING sobre el índice único parcial, sin consulta previa.
+        
+        Returns:
+            Notification con el id asignado, o None si era duplicada
+        """
+        campos.setdefault('type', 'default_type')
+        campos.setdefault('is_read', False)
+        campos.setdefault('timestamp', datetime.utcnow())
+        destinatario = campos.get('user_id') or f"negocio:{campos.get('negocio_id')}"
+        campos['dedupe_key'] = cls.calcular_dedupe_key(campos['type'], destinatario, referencia)
+        
+        tabla = cls.__table__
+        id_notif = db.session.execute(
+            pg_insert(tabla)
+            .values(**campos)
+            .on_conflict_do_nothing(
+                index_elements=[tabla.c.dedupe_key],
+                index_where=tabla.c.dedupe_key.isnot(None)
+            )
+            .returning(tabla.c.id)
+        ).scalar()
+        if id_notif is None:
+            return None
+        
+        notif = cls(id=id_notif, **campos)
+        cls.publicar([notif])
+        return notif
+
     @classmethod
     def create_notification(cls, user_id, sender_id, request_id, message, params=None, extra_data=None):
         """Método legacy para notificaciones sociales."""
@@ -271,6 +384,7 @@ class Notification(db.Model):
                 extra_data=extra_data
             )
             db.session.add(notification)
+            cls.publicar([notification])
             db.session.commit()
             logger.info(f"Notificación social creada: {notification}")
             return notification
@@ -337,6 +451,7 @@ class Notification(db.Model):
                 action_url=f'modulos_crear_tienda/pedidos.html?id={pedido.id_pedido}'
             )
             db.session.add(notif)
+            cls.publicar([notif])
             logger.info(f"Notificación de pedido creada: {pedido.codigo_pedido}")
             return notif
         except Exception as e:
@@ -367,6 +482,7 @@ class Notification(db.Model):
                 action_url=f'modulos_crear_tienda/inventario.html?id={producto.id_producto}'
             )
             db.session.add(notif)
+            cls.publicar([notif])
             logger.info(f"Notificación de stock bajo: {producto.nombre}")
             return notif
         except Exception as e:
@@ -376,14 +492,7 @@ class Notification(db.Model):
     @classmethod
     def crear_notificacion_cambio_estado_pedido(cls, pedido, estado_anterior, user_id=None):
         """Crea notificación cuando cambia el estado de un pedido."""
-        tipo_map = {
-            'confirmado': 'pedido_pagado',
-            'enviado': 'pedido_enviado',
-            'entregado': 'pedido_entregado',
-            'cancelado': 'pedido_cancelado'
-        }
-        
-        tipo = tipo_map.get(pedido.estado, 'sistema')
+        tipo = cls.TIPO_POR_ESTADO_PEDIDO.get(pedido.estado, 'sistema')
         
         try:
             if user_id is None:
@@ -410,12 +519,64 @@ class Notification(db.Model):
                 action_url=f'modulos_crear_tienda/pedidos.html?id={pedido.id_pedido}'
             )
             db.session.add(notif)
+            cls.publicar([notif])
             logger.info(f"Notificación de cambio de estado: {pedido.codigo_pedido}")
             return notif
         except Exception as e:
             logger.error(f"Error al crear notificación de estado: {e}", exc_info=True)
             raise
 
+    @classmethod
+    def crear_notificaciones_cambio_estado_lote(cls, negocio_id, movidos, estado_nuevo, estado_label=None, user_id=None):
+        """
+        Versión en bloque de crear_notificacion_cambio_estado_pedido para los
+        cambios masivos: un solo INSERT para todos los pedidos movidos.
+        
+        Args:
+            movidos: [{id, codigo, estado_anterior}] (ver Pedido.cambiar_estado_masivo)
+        """
+        if not movidos:
+            return 0
+        try:
+            if user_id is None:
+                user_id = cls._obtener_user_id_de_negocio(negocio_id)
+            
+            tipo = cls.TIPO_POR_ESTADO_PEDIDO.get(estado_nuevo, 'sistema')
+            estado_label = estado_label or estado_nuevo.capitalize()
+            ahora = datetime.utcnow()
+            
+            filas = [
+                {
+                    'user_id': user_id,
+                    'negocio_id': negocio_id,
+                    'type': tipo,
+                    'titulo': f'Pedido #{m["codigo"]} - {estado_label}',
+                    'message': f'Estado: {m["estado_anterior"]} → {estado_nuevo}',
+                    'referencia_tipo': 'pedido',
+                    'referencia_id': m['id'],
+                    'prioridad': 'media' if estado_nuevo != 'cancelado' else 'alta',
+                    'extra_data': {
+                        'codigo_pedido': m['codigo'],
+                        'estado_anterior': m['estado_anterior'],
+                        'estado_nuevo': estado_nuevo
+                    },
+                    'action_url': f'modulos_crear_tienda/pedidos.html?id={m["id"]}',
+                    'is_read': False,
+                    'timestamp': ahora
+                }
+                for m in movidos
+            ]
+            tabla = cls.__table__
+            ids = dict(db.session.execute(
+                sa.insert(tabla).values(filas).returning(tabla.c.referencia_id, tabla.c.id)
+            ).all())
+            cls.publicar([cls(id=ids[fila['referencia_id']], **fila) for fila in filas])
+            logger.info(f"Notificaciones de cambio de estado en bloque: {len(filas)} ({estado_nuevo})")
+            return len(filas)
+        except Exception as e:
+            logger.error(f"Error al crear notificaciones de estado en bloque: {e}", exc_info=True)
+            raise
+
     @classmethod
     def crear_notificacion_generica(cls, negocio_id, titulo, mensaje, 
                                      tipo='sistema', user_id=None,
@@ -439,6 +600,7 @@ class Notification(db.Model):
                 extra_data=extra_data
             )
             db.session.add(notif)
+            cls.publicar([notif])
             logger.info(f"Notificación genérica creada: {titulo}")
             return notif
         except Exception as e:
@@ -450,7 +612,16 @@ class Notification(db.Model):
     # ==========================================
     @classmethod
     def contar_no_leidas(cls, user_id=None, negocio_id=None):
-        """Cuenta notificaciones no leídas."""
+        """
+        Cuenta notificaciones no leídas. Por negocio o por usuario es una
+        lectura por llave primaria de NotificacionNoLeidas; la combinación
+        de ambos filtros (o ninguno) sigue contando sobre la tabla.
+        """
+        if negocio_id and not user_id:
+            return NotificacionNoLeidas.obtener(NotificacionNoLeidas.AMBITO_NEGOCIO, negocio_id)
+        if user_id and not negocio_id:
+            return NotificacionNoLeidas.obtener(NotificacionNoLeidas.AMBITO_USUARIO, user_id)
+        
         query = cls.query.filter_by(is_read=False)
         
         if user_id:
@@ -460,22 +631,59 @@ class Notification(db.Model):
         
         return query.count()
     
+    @staticmethod
+    def codificar_cursor(notificacion):
+        """Cursor opaco con la posición (is_read, timestamp, id) de una notificación."""
+        return codificar_cursor([bool(notificacion.is_read), notificacion.timestamp.isoformat(), notificacion.id])
+    
+    @staticmethod
+    def decodificar_cursor(cursor):
+        """Devuelve (is_read, timestamp, id) o lanza ValueError."""
+        try:
+            leida, fecha, id_notif = decodificar_cursor(cursor)
+            return bool(leida), datetime.fromisoformat(fecha), int(id_notif)
+        except Exception:
+            raise ValueError("Cursor inválido")
+    
     @classmethod
-    def obtener_recientes(cls, user_id=None, negocio_id=None, limite=20, solo_no_leidas=False):
-        """Obtiene notificaciones recientes."""
+    def _consulta_destinatario(cls, user_id=None, negocio_id=None):
         query = cls.query
-        
         if user_id:
             query = query.filter_by(user_id=user_id)
         if negocio_id:
             query = query.filter_by(negocio_id=negocio_id)
-        if solo_no_leidas:
-            query = query.filter_by(is_read=False)
+        return query
+    
+    @classmethod
+    def obtener_recientes(cls, user_id=None, negocio_id=None, limite=20, solo_no_leidas=False, cursor=None):
+        """
+        Obtiene notificaciones recientes: no leídas primero y luego leídas,
+        cada grupo de la más nueva a la más vieja, paginadas por keyset.
         
-        return query.order_by(
-            cls.is_read.asc(),  # No leídas primero
-            cls.timestamp.desc()
-        ).limit(limite).all()
+        Cada grupo se lee como un rango de índice (no leídas del índice
+        parcial, leídas del compuesto) y solo se pasa al de leídas cuando
+        se agotan las no leídas. Devuelve (notificaciones, hay_mas).
+        
+        Args:
+            cursor: (is_read, timestamp, id) de la última notificación vista
+        """
+        base = cls._consulta_destinatario(user_id, negocio_id)
+        grupos = [False] if solo_no_leidas else [False, True]
+        if cursor:
+            grupos = [leida for leida in grupos if leida >= cursor[0]]
+        
+        notificaciones = []
+        for leida in grupos:
+            query = base.filter(cls.is_read == leida)
+            if cursor and leida == cursor[0]:
+                query = query.filter(db.tuple_(cls.timestamp, cls.id) < db.tuple_(cursor[1], cursor[2]))
+            notificaciones += query.order_by(
+                cls.timestamp.desc(), cls.id.desc()
+            ).limit(limite + 1 - len(notificaciones)).all()
+            if len(notificaciones) > limite:
+                break
+        
+        return notificaciones[:limite], len(notificaciones) > limite
     
     @classmethod
     def marcar_todas_leidas(cls, user_id=None, negocio_id=None):
@@ -496,25 +704,162 @@ class Notification(db.Model):
         return count
     
     @classmethod
-    def obtener_por_categoria(cls, user_id=None, negocio_id=None, categoria=None, limite=20):
-        """Obtiene notificaciones filtradas por categoría."""
-        tipos_por_categoria = {}
-        for tipo, info in cls.TIPOS.items():
-            cat = info['categoria']
-            if cat not in tipos_por_categoria:
-                tipos_por_categoria[cat] = []
-            tipos_por_categoria[cat].append(tipo)
-        
-        query = cls.query
+    def obtener_por_categoria(cls, user_id=None, negocio_id=None, categoria=None, limite=20, cursor=None):
+        """
+        Obtiene notificaciones filtradas por categoría, de la más nueva a la
+        más vieja, paginadas por keyset (timestamp, id). Devuelve (notificaciones, hay_mas).
+        """
+        query = cls._consulta_destinatario(user_id, negocio_id)
         
-        if user_id:
-            query = query.filter_by(user_id=user_id)
-        if negocio_id:
-            query = query.filter_by(negocio_id=negocio_id)
-        if categoria and categoria in tipos_por_categoria:
-            query = query.filter(cls.type.in_(tipos_por_categoria[categoria]))
+        if categoria and categoria in cls.TIPOS_POR_CATEGORIA:
+            query = query.filter(cls.type.in_(cls.TIPOS_POR_CATEGORIA[categoria]))
+        if cursor:
+            query = query.filter(db.tuple_(cls.timestamp, cls.id) < db.tuple_(cursor[1], cursor[2]))
         
-        return query.order_by(cls.timestamp.desc()).limit(limite).all()
+        notificaciones = query.order_by(cls.timestamp.desc(), cls.id.desc()).limit(limite + 1).all()
+        return notificaciones[:limite], len(notificaciones) > limite
 
     def __repr__(self):
-        return f"<Notification id={self.id} type={self.type} negocio={self.negocio_id} is_read={self.is_read}>"
\ No newline at end of file
+        return f"<Notification id={self.id} type={self.type} negocio={self.negocio_id} is_read={self.is_read}>"
+
+
+# ==========================================
+# CONTADORES DE NO LEÍDAS (campanita)
+# ==========================================
+class NotificacionNoLeidas(db.Model):
+    """
+    Notificaciones no leídas por negocio y por usuario destinatario.
+    
+    Los mantienen triggers por sentencia sobre `notification` (ver
+    SQL_FUNCION_NO_LEIDAS), así que cualquier escritura (factories, marcar
+    leída/todas, eliminar, limpiar, INSERT o UPDATE en bloque) ajusta el
+    contador en la misma transacción. reconciliar() corrige desvíos.
+    """
+    __tablename__ = 'notificaciones_no_leidas'
+    
+    AMBITO_NEGOCIO = 'negocio'
+    AMBITO_USUARIO = 'usuario'
+    
+    ambito = Column(String(10), primary_key=True)
+    ambito_id = Column(Integer, primary_key=True)
+    no_leidas = Column(Integer, nullable=False, default=0)
+    
+    @classmethod
+    def obtener(cls, ambito, ambito_id):
+        """Lectura por llave primaria; 0 si no hay fila."""
+        valor = db.session.execute(
+            sa.select(cls.no_leidas).where(cls.ambito == ambito, cls.ambito_id == ambito_id)
+        ).scalar()
+        return max(valor or 0, 0)
+    
+    @classmethod
+    def reconciliar(cls):
+        """
+        Recalcula todos los contadores desde `notification` y corrige los que
+        difieran. Bloquea las escrituras de notificaciones mientras cuenta
+        (SHARE MODE) para no pisar incrementos en vuelo. Devuelve filas corregidas.
+        """
+        db.session.execute(sa.text("LOCK TABLE notification IN SHARE MODE"))
+        return db.session.execute(sa.text(f"""
+            WITH reales AS ({SQL_NO_LEIDAS_REALES}),
+            corregidos AS (
+                INSERT INTO notificaciones_no_leidas AS c (ambito, ambito_id, no_leidas)
+                SELECT r.ambito, r.ambito_id, r.no_leidas
+                FROM reales r
+                LEFT JOIN notificaciones_no_leidas x
+                       ON x.ambito = r.ambito AND x.ambito_id = r.ambito_id
+                WHERE x.no_leidas IS DISTINCT FROM r.no_leidas
+                ON CONFLICT (ambito, ambito_id) DO UPDATE SET no_leidas = EXCLUDED.no_leidas
+                RETURNING 1
+            ),
+            en_cero AS (
+                UPDATE notificaciones_no_leidas c
+                SET no_leidas = 0
+                WHERE c.no_leidas <> 0
+                  AND NOT EXISTS (
+                      SELECT 1 FROM reales r WHERE r.ambito = c.ambito AND r.ambito_id = c.ambito_id
+                  )
+                RETURNING 1
+            )
+            SELECT (SELECT COUNT(*) FROM corregidos) + (SELECT COUNT(*) FROM en_cero)
+        """)).scalar()
+    
+    def __repr__(self):
+        return f"<NotificacionNoLeidas {self.ambito}={self.ambito_id}: {self.no_leidas}>"
+
+
+# Conteo real por ámbito (reconciliación y carga inicial)
+SQL_NO_LEIDAS_REALES = """
+    SELECT 'negocio' AS ambito, negocio_id AS ambito_id, COUNT(*) AS no_leidas
+    FROM notification
+    WHERE NOT COALESCE(is_read, FALSE) AND negocio_id IS NOT NULL
+    GROUP BY negocio_id
+    UNION ALL
+    SELECT 'usuario', user_id, COUNT(*)
+    FROM notification
+    WHERE NOT COALESCE(is_read, FALSE) AND user_id IS NOT NULL
+    GROUP BY user_id
+"""
+
+def _sql_ajuste_no_leidas(*fuentes):
+    """
+    Upsert de los aportes de las tablas de transición [(tabla, signo)]:
+    cada fila no leída suma `signo` a su negocio y a su usuario.
+    """
+    aportes = "\n            UNION ALL".join(
+        f"""
+            SELECT 'negocio' AS ambito, negocio_id AS ambito_id, {signo} AS delta FROM {tabla}
+            WHERE NOT COALESCE(is_read, FALSE) AND negocio_id IS NOT NULL
+            UNION ALL
+            SELECT 'usuario', user_id, {signo} FROM {tabla}
+            WHERE NOT COALESCE(is_read, FALSE) AND user_id IS NOT NULL"""
+        for tabla, signo in fuentes
+    )
+    return f"""
+        INSERT INTO notificaciones_no_leidas AS c (ambito, ambito_id, no_leidas)
+        SELECT ambito, ambito_id, SUM(delta)
+        FROM ({aportes}
+        ) d
+        GROUP BY ambito, ambito_id
+        HAVING SUM(delta) <> 0
+        ORDER BY ambito, ambito_id
+        ON CONFLICT (ambito, ambito_id) DO UPDATE SET no_leidas = c.no_leidas + EXCLUDED.no_leidas;"""
+
+
+# Un upsert por sentencia (no por fila) usando las tablas de transición
+SQL_FUNCION_NO_LEIDAS = f"""
+CREATE OR REPLACE FUNCTION notificaciones_ajustar_no_leidas() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN{_sql_ajuste_no_leidas(('nuevas', 1))}
+    ELSIF TG_OP = 'DELETE' THEN{_sql_ajuste_no_leidas(('viejas', -1))}
+    ELSE{_sql_ajuste_no_leidas(('nuevas', 1), ('viejas', -1))}
+    END IF;
+    RETURN NULL;
+END;
+$$
+"""
+
+SQL_TRIGGERS_NO_LEIDAS = """
+CREATE TRIGGER tr_notification_no_leidas_ins AFTER INSERT ON notification
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE PROCEDURE notificaciones_ajustar_no_leidas();
+CREATE TRIGGER tr_notification_no_leidas_upd AFTER UPDATE ON notification
+    REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE PROCEDURE notificaciones_ajustar_no_leidas();
+CREATE TRIGGER tr_notification_no_leidas_del AFTER DELETE ON notification
+    REFERENCING OLD TABLE AS viejas
+    FOR EACH STATEMENT EXECUTE PROCEDURE notificaciones_ajustar_no_leidas();
+"""
+
+# Con db.create_all los triggers nacen con la tabla
+sa.event.listen(
+    Notification.__table__,
+    'after_create',
+    sa.DDL(SQL_FUNCION_NO_LEIDAS).execute_if(dialect='postgresql')
+)
+sa.event.listen(
+    Notification.__table__,
+    'after_create',
+    sa.DDL(SQL_TRIGGERS_NO_LEIDAS).execute_if(dialect='postgresql')
+)
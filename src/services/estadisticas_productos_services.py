@@ -0,0 +1,111 @@
+"""
+Ingesta de eventos de producto de la tienda (vistas y agregados al carrito).
+
+Los eventos se acumulan en memoria por (producto, día) y se escriben en
+producto_estadisticas con un upsert en bloque cuando el buffer crece o pasa
+el intervalo de vaciado. Un hilo daemon vacía cada intervalo aunque no lleguen
+más eventos, así un producto poco visitado no queda en memoria. Es analítica de mejor esfuerzo: si el proceso muere
+se pierden como máximo los eventos de un intervalo.
+"""
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+import sqlalchemy as sa
+from src.models.database import db
+from src.models.colombia_data.contabilidad.operaciones_y_catalogo import (
+    ProductoCatalogo,
+    ProductoEstadisticas,
+    dia_colombia
+)
+
+logger = logging.getLogger(__name__)
+
+TIPOS_EVENTO = {
+    'vista': 'visitas',
+    'carrito': 'agregados_carrito'
+}
+
+
+class BufferEventosProducto:
+    """Acumulador por proceso: {(producto_id, fecha): {campo: cantidad}}."""
+
+    def __init__(self, max_claves=500, intervalo_seg=30):
+        self.max_claves = max_claves
+        self.intervalo_seg = intervalo_seg
+        self._datos = {}
+        self._lock = threading.Lock()
+        self._ultimo_vaciado = time.monotonic()
+        self._app = None
+        self._hilo = None
+
+    def agregar(self, eventos):
+        """
+        Suma eventos ya validados [(producto_id, campo, cantidad)] del día actual.
+        Vacía el buffer si superó el tamaño o el intervalo. Devuelve filas escritas.
+        """
+        fecha = dia_colombia(datetime.utcnow())
+        with self._lock:
+            if self._app is None:
+                self._app = current_app._get_current_object()
+            # Arranque perezoso: el hilo nace en el worker (después del fork de gunicorn)
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._vaciar_periodico, name='vaciar-eventos-producto', daemon=True)
+                self._hilo.start()
+            for producto_id, campo, cantidad in eventos:
+                contadores = self._datos.setdefault((producto_id, fecha), {})
+                contadores[campo] = contadores.get(campo, 0) + cantidad
+            debe_vaciar = (
+                len(self._datos) >= self.max_claves
+                or time.monotonic() - self._ultimo_vaciado >= self.intervalo_seg
+            )
+        return self.vaciar() if debe_vaciar else 0
+
+    def vaciar(self):
+        """Escribe lo acumulado en un solo upsert. Devuelve filas escritas."""
+        with self._lock:
+            datos, self._datos = self._datos, {}
+            self._ultimo_vaciado = time.monotonic()
+        if not datos:
+            return 0
+
+        try:
+            ids = sorted({producto_id for producto_id, _ in datos})
+            with db.engine.begin() as conn:
+                # El negocio sale del catálogo, no del cliente; ids inexistentes se descartan
+                negocios = dict(conn.execute(
+                    sa.select(ProductoCatalogo.id_producto, ProductoCatalogo.negocio_id)
+                    .where(ProductoCatalogo.id_producto.in_(ids))
+                ).all())
+                filas = [
+                    {'producto_id': producto_id, 'negocio_id': negocios[producto_id], 'fecha': fecha, **contadores}
+                    for (producto_id, fecha), contadores in datos.items()
+                    if producto_id in negocios
+                ]
+                escritas = ProductoEstadisticas.acumular(filas, conn=conn)
+            logger.info(f"📊 Eventos de producto vaciados: {escritas} filas diarias")
+            return escritas
+        except Exception as e:
+            logger.error(f"❌ Error vaciando eventos de producto ({len(datos)} claves descartadas): {e}")
+            return 0
+
+    def _vaciar_periodico(self):
+        """Vacía cada intervalo_seg dentro del contexto de la app."""
+        while True:
+            time.sleep(self.intervalo_seg)
+            try:
+                with self._app.app_context():
+                    self.vaciar()
+            except Exception as e:
+                logger.error(f"❌ Error en el vaciado periódico de eventos de producto: {e}")
+
+    def vaciar_al_salir(self):
+        if self._app is not None and self._datos:
+            with self._app.app_context():
+                self.vaciar()
+
+
+buffer_eventos = BufferEventosProducto()
+atexit.register(buffer_eventos.vaciar_al_salir)
@@ -0,0 +1,128 @@
+"""
+Entrega push de notificaciones (SSE / long-poll) con LISTEN/NOTIFY.
+
+Notification.publicar() hace pg_notify en la transacción que crea la
+notificación. Cada proceso mantiene UNA conexión dedicada con LISTEN (no una
+por cliente) y reparte los mensajes en memoria a las colas de los streams
+abiertos de ese negocio o usuario; la base de datos no ve los sondeos.
+
+Modelo de workers: cada stream abierto ocupa un hilo mientras dura, así que
+gunicorn debe correr con `--worker-class gthread --threads N` (ver Procfile).
+Un worker sync atendería un solo stream y bloquearía el resto de la API.
+"""
+import json
+import logging
+import queue
+import select
+import threading
+import time
+from flask import current_app
+from src.models.database import db
+from src.models.notification import Notification
+
+logger = logging.getLogger(__name__)
+
+AMBITO_NEGOCIO = 'negocio'
+AMBITO_USUARIO = 'usuario'
+
+
+class CentralNotificaciones:
+    """Un LISTEN por proceso que reparte a {(ambito, id): {colas}}."""
+
+    def __init__(self, max_cola=100, espera_select_seg=30, reintento_seg=5):
+        self.max_cola = max_cola
+        self.espera_select_seg = espera_select_seg
+        self.reintento_seg = reintento_seg
+        self._suscriptores = {}
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._app = None
+
+    def suscribir(self, ambito, ambito_id):
+        """Registra una cola para (ambito, id) y arranca el listener si hace falta."""
+        cola = queue.Queue(maxsize=self.max_cola)
+        with self._lock:
+            if self._app is None:
+                self._app = current_app._get_current_object()
+            self._suscriptores.setdefault((ambito, ambito_id), set()).add(cola)
+            # Arranque perezoso: el hilo nace en el worker (después del fork de gunicorn)
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._escuchar, name='listen-notificaciones', daemon=True)
+                self._hilo.start()
+        return cola
+
+    def desuscribir(self, ambito, ambito_id, cola):
+        with self._lock:
+            colas = self._suscriptores.get((ambito, ambito_id))
+            if colas:
+                colas.discard(cola)
+                if not colas:
+                    del self._suscriptores[(ambito, ambito_id)]
+
+    def total_suscriptores(self):
+        with self._lock:
+            return sum(len(colas) for colas in self._suscriptores.values())
+
+    def repartir(self, payload):
+        """Entrega un payload de Notification.publicar a los streams interesados."""
+        try:
+            datos = json.loads(payload)
+        except ValueError:
+            logger.warning(f"⚠️ Payload de notificación inválido: {payload[:100]}")
+            return 0
+
+        claves = []
+        if datos.get('negocio_id'):
+            claves.append((AMBITO_NEGOCIO, datos['negocio_id']))
+        if datos.get('user_id'):
+            claves.append((AMBITO_USUARIO, datos['user_id']))
+
+        with self._lock:
+            colas = [cola for clave in claves for cola in self._suscriptores.get(clave, ())]
+
+        entregados = 0
+        for cola in colas:
+            try:
+                cola.put_nowait(datos['notificacion'])
+                entregados += 1
+            except queue.Full:
+                # Cliente que no consume (pestaña congelada): se le descarta el evento
+                logger.warning("⚠️ Cola de stream llena, notificación descartada")
+        return entregados
+
+    def _conectar(self):
+        """Conexión propia fuera del pool, en autocommit y con LISTEN."""
+        with self._app.app_context():
+            fairy = db.engine.raw_connection()
+            fairy.detach()
+        conexion = fairy.driver_connection
+        conexion.autocommit = True
+        with conexion.cursor() as cursor:
+            cursor.execute(f"LISTEN {Notification.CANAL_PUSH}")
+        return conexion
+
+    def _escuchar(self):
+        logger.info("📡 Listener de notificaciones iniciado")
+        while True:
+            conexion = None
+            try:
+                conexion = self._conectar()
+                while True:
+                    listos, _, _ = select.select([conexion], [], [], self.espera_select_seg)
+                    if not listos:
+                        continue
+                    conexion.poll()
+                    while conexion.notifies:
+                        self.repartir(conexion.notifies.pop(0).payload)
+            except Exception as e:
+                logger.error(f"❌ Listener de notificaciones caído, reintentando: {e}")
+                time.sleep(self.reintento_seg)
+            finally:
+                if conexion is not None:
+                    try:
+                        conexion.close()
+                    except Exception:
+                        pass
+
+
+central_notificaciones = CentralNotificaciones()
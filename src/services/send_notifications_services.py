@@ -7,7 +7,7 @@ from src.models.usuarios import Usuario  # Importar Usuario para validar que exi
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
-def send_contract_request_notification(user_id, message):
+def send_contract_request_notification(user_id, message, referencia=None):
     try:
         # Verificar los valores antes de proceder
         logger.debug(f"Verificando valores - user_id: {user_id}, message: {message}")
@@ -22,28 +22,22 @@ def send_contract_request_notification(user_id, message):
         
         logger.info(f"Usuario encontrado: {usuario.nombre}")  # Confirmar que encontramos al usuario
         
-        # Verificar si ya existe una notificación similar
-        existing_notification = Notification.query.filter_by(user_id=user_id, message=message).first()
+        # Crear la notificación salvo que ya exista (dedupe_key, sin consulta previa).
+        # Sin referencia explícita se deduplica por el mensaje, como antes.
+        notification = Notification.crear_si_no_existe(
+            referencia if referencia is not None else message,
+            user_id=user_id,
+            message=message
+        )
         
-        if existing_notification:
+        if notification is None:
             logger.warning(f"Ya existe una notificación para el usuario {user_id} con el mismo mensaje.")
             return  # Evita la duplicación
         
-        # Crear la notificación
-        notification = Notification(user_id=user_id, message=message)
-        logger.debug(f"Creando notificación para el usuario {user_id} con mensaje: {message}")
-        
-        # Agregar la notificación a la sesión de la base de datos
-        db.session.add(notification)
-        db.session.flush()  # Enviar a la base de datos sin confirmar aún
-        
         # Confirmar la transacción
         db.session.commit()
         
-        # Recuperar la notificación de la base de datos para verificar que se guardó correctamente
-        notification_in_db = Notification.query.filter_by(user_id=user_id).order_by(Notification.timestamp.desc()).first()
-        
-        logger.info(f"Notificación guardada: {notification_in_db}")
+        logger.info(f"Notificación guardada: {notification}")
         logger.info(f"Notificación enviada a usuario {user_id}: {message}")
     
     except Exception as e:
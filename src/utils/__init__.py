@@ -0,0 +1,3 @@
+"""
+Utilidades compartidas entre modelos y APIs (sin dependencias de Flask).
+"""
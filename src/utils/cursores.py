@@ -0,0 +1,24 @@
+"""
+Cursores opacos para paginación keyset.
+
+Un cursor es JSON compacto en base64 url-safe sin relleno. Cada endpoint
+decide qué guarda (la última posición entregada, el filtro con que se
+generó...) y valida la forma al decodificar; aquí solo está el formato.
+"""
+import base64
+import json
+
+
+def codificar_cursor(valores):
+    """Serializa valores JSON (lista o dict) como cursor opaco."""
+    raw = json.dumps(valores, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Devuelve los valores del cursor o lanza ValueError("Cursor inválido")."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        return json.loads(raw)
+    except Exception:
+        raise ValueError("Cursor inválido")
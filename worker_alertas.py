@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Worker de alertas vencidas: notifica las AlertaOperativa cuya fecha_programada ya llegó.
+
+Uso:
+    python worker_alertas.py               # bucle continuo (cada 60 s)
+    python worker_alertas.py --intervalo 30
+    python worker_alertas.py --una-vez     # un solo barrido (cron)
+
+Es seguro correr varias instancias: cada lote se toma con FOR UPDATE SKIP LOCKED.
+"""
+import argparse
+import time
+from src import create_app
+from src.models.database import db
+from src.models.colombia_data.contabilidad.operaciones_y_catalogo import AlertaOperativa
+
+
+def barrer(tamano_lote):
+    """Procesa lotes hasta vaciar las alertas vencidas; devuelve el total notificado."""
+    total = 0
+    while True:
+        try:
+            procesadas = AlertaOperativa.procesar_vencidas(limite=tamano_lote)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        total += procesadas
+        if procesadas < tamano_lote:
+            return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker de alertas operativas vencidas")
+    parser.add_argument('--intervalo', type=int, default=60, help="segundos entre barridos")
+    parser.add_argument('--lote', type=int, default=200, help="alertas por transacción")
+    parser.add_argument('--una-vez', action='store_true', help="un solo barrido y salir")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        print(f"⏳ [LOG]: Worker de alertas iniciado (intervalo {args.intervalo}s, lote {args.lote})")
+        while True:
+            try:
+                total = barrer(args.lote)
+                if total:
+                    print(f"✅ [EXITO]: {total} alertas vencidas notificadas")
+            except Exception as e:
+                print(f"❌ [ERROR CRÍTICO]: {e}")
+                if args.una_vez:
+                    raise
+            finally:
+                db.session.remove()
+
+            if args.una_vez:
+                break
+            time.sleep(args.intervalo)
+
+
+if __name__ == "__main__":
+    main()